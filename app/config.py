@@ -31,5 +31,89 @@ class Settings(BaseSettings):
     RUNPOD_API_KEY: str = os.getenv("RUNPOD_API_KEY", "")
     RUNPOD_ENDPOINT_ID: str = os.getenv("RUNPOD_ENDPOINT_ID", "")
     RUNPOD_TIMEOUT: int = int(os.getenv("RUNPOD_TIMEOUT", "600"))
+    # waitForResponse: how long process-image waits for the result before answering PROCESSING
+    SYNC_WAIT_TIMEOUT: float = float(os.getenv("SYNC_WAIT_TIMEOUT", "90"))
+    # Point at scripts/fake_runpod.py for local load tests
+    RUNPOD_API_BASE: str = os.getenv("RUNPOD_API_BASE", "https://api.runpod.ai/v2")
+    # Decode output images from webhook and status bodies as they arrive instead of buffering the JSON
+    STREAM_DECODE_OUTPUTS: bool = os.getenv("STREAM_DECODE_OUTPUTS", "true").lower() == "true"
+    # Outputs a worker uploads itself and returns by URL: "copy" streams them into our storage,
+    # "record" stores the worker's URL as is (it has to stay valid). Only hosts in
+    # OUTPUT_URL_HOSTS (comma-separated, subdomains included) are accepted, so outputs by URL
+    # are refused until it is set. Hosts resolving to private, loopback or link-local
+    # addresses are refused unless OUTPUT_URL_ALLOW_PRIVATE is set (local testing only).
+    OUTPUT_URL_MODE: str = os.getenv("OUTPUT_URL_MODE", "copy")
+    OUTPUT_URL_HOSTS: str = os.getenv("OUTPUT_URL_HOSTS", "")
+    OUTPUT_URL_ALLOW_PRIVATE: bool = os.getenv("OUTPUT_URL_ALLOW_PRIVATE", "false").lower() == "true"
+    OUTPUT_DOWNLOAD_MAX_REDIRECTS: int = int(os.getenv("OUTPUT_DOWNLOAD_MAX_REDIRECTS", "5"))
+    OUTPUT_DOWNLOAD_TIMEOUT: float = float(os.getenv("OUTPUT_DOWNLOAD_TIMEOUT", "60"))
+    OUTPUT_DOWNLOAD_CONNECTIONS: int = int(os.getenv("OUTPUT_DOWNLOAD_CONNECTIONS", "20"))
+    OUTPUT_DOWNLOAD_MAX_MB: int = int(os.getenv("OUTPUT_DOWNLOAD_MAX_MB", "100"))
+    # How long a non-terminal RunPod status answer is reused
+    JOB_STATUS_CACHE_TTL: float = float(os.getenv("JOB_STATUS_CACHE_TTL", "2"))
+    DEADLINE_SWEEP_INTERVAL: int = int(os.getenv("DEADLINE_SWEEP_INTERVAL", "60"))
+    # POST /process-batch: most items per request, and RunPod submissions in flight per batch
+    BATCH_MAX_ITEMS: int = int(os.getenv("BATCH_MAX_ITEMS", "20"))
+    BATCH_SUBMIT_CONCURRENCY: int = int(os.getenv("BATCH_SUBMIT_CONCURRENCY", "4"))
+    # Recent completed jobs per workflow kept for completion estimates
+    ETA_WINDOW: int = int(os.getenv("ETA_WINDOW", "100"))
+
+    # Workflow profiles (JSON list); built-in defaults are used if it is missing
+    WORKFLOWS_FILE: str = os.getenv("WORKFLOWS_FILE", "workflows.json")
+    WORKFLOWS_RELOAD_INTERVAL: float = float(os.getenv("WORKFLOWS_RELOAD_INTERVAL", "5"))
+
+    # Endpoint pool routing
+    ENDPOINT_HEALTH_INTERVAL: float = float(os.getenv("ENDPOINT_HEALTH_INTERVAL", "10"))
+    ENDPOINT_FAILURE_THRESHOLD: int = int(os.getenv("ENDPOINT_FAILURE_THRESHOLD", "3"))
+    ENDPOINT_COOLDOWN: float = float(os.getenv("ENDPOINT_COOLDOWN", "60"))
+
+    # Warm-worker scheduler; off by default because warming costs GPU time
+    WARM_SCHEDULER_ENABLED: bool = os.getenv("WARM_SCHEDULER_ENABLED", "false").lower() == "true"
+    WARM_MODE: str = os.getenv("WARM_MODE", "keepalive")  # "keepalive" or "min_workers"
+    WARM_BUSY_THRESHOLD: float = float(os.getenv("WARM_BUSY_THRESHOLD", "5"))  # requests/hour
+    WARM_LEAD_MINUTES: int = int(os.getenv("WARM_LEAD_MINUTES", "15"))
+    WARM_PROFILE_DAYS: int = int(os.getenv("WARM_PROFILE_DAYS", "14"))
+    WARM_MIN_WORKERS: int = int(os.getenv("WARM_MIN_WORKERS", "1"))
+    WARM_KEEPALIVE_INTERVAL: int = int(os.getenv("WARM_KEEPALIVE_INTERVAL", "60"))
+    WARM_KEEPALIVE_COST_SECONDS: float = float(os.getenv("WARM_KEEPALIVE_COST_SECONDS", "5"))
+    WARM_KEEPALIVE_PAYLOAD: str = os.getenv("WARM_KEEPALIVE_PAYLOAD", '{"input": {"keepalive": true}}')
+    WARM_BUDGET_WORKER_HOURS: float = float(os.getenv("WARM_BUDGET_WORKER_HOURS", "4"))  # per UTC day
+    COLD_START_DELAY_MS: int = int(os.getenv("COLD_START_DELAY_MS", "10000"))
+
+    # Per-job tracing: recent traces stay in memory; persisting and OTLP export are opt-in
+    TRACE_BUFFER_SIZE: int = int(os.getenv("TRACE_BUFFER_SIZE", "1000"))
+    TRACE_STORE_DB: bool = os.getenv("TRACE_STORE_DB", "false").lower() == "true"
+    OTLP_ENDPOINT: str = os.getenv("OTLP_ENDPOINT", "")  # e.g. http://collector:4318
+
+    # Logging; LOG_LEVELS overrides per logger, e.g. "app.routers.images=DEBUG,httpx=WARNING"
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_LEVELS: str = os.getenv("LOG_LEVELS", "")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")  # "json" or "text"
+    # Fraction of DEBUG records kept; 1 keeps them all, so LOG_LEVEL=DEBUG shows everything
+    LOG_DEBUG_SAMPLE_RATE: float = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1"))
+    LOG_MAX_FIELD_LENGTH: int = int(os.getenv("LOG_MAX_FIELD_LENGTH", "2000"))
+
+    # Event loop monitoring; lag is sampled every interval, stalls past the threshold log a stack
+    LOOP_MONITOR_INTERVAL: float = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.1"))
+    LOOP_BLOCK_THRESHOLD: float = float(os.getenv("LOOP_BLOCK_THRESHOLD", "0.1"))
+    LOOP_ASYNCIO_DEBUG: bool = os.getenv("LOOP_ASYNCIO_DEBUG", "false").lower() == "true"
+
+    # Request profiler and memory snapshots for admins; off unless enabled
+    PROFILER_ENABLED: bool = os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+    PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_INTERVAL: float = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "profiles")
+    PROFILE_TOKEN_TTL: int = int(os.getenv("PROFILE_TOKEN_TTL", "300"))
+
+    # Webhook/status traffic recording for scripts/replay_traffic.py; off unless a file is set
+    TRAFFIC_RECORD_FILE: str = os.getenv("TRAFFIC_RECORD_FILE", "")
+
+    # CPU work kept off the event loop: threads for base64, processes for Pillow (0 runs Pillow in the threads)
+    CODEC_THREADS: int = int(os.getenv("CODEC_THREADS", "4"))
+    IMAGE_PROCESSES: int = int(os.getenv("IMAGE_PROCESSES", "2"))
+
+    # Status write-behind settings
+    STATUS_FLUSH_INTERVAL: float = float(os.getenv("STATUS_FLUSH_INTERVAL", "0.02"))
+    STATUS_MAX_BATCH: int = int(os.getenv("STATUS_MAX_BATCH", "200"))
 
 settings = Settings()
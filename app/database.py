@@ -1,17 +1,30 @@
-from sqlalchemy import create_engine, Column, String, Boolean, DateTime, ForeignKey, Float, Integer, event
+from sqlalchemy import create_engine, Column, String, Boolean, DateTime, ForeignKey, Float, Integer, BigInteger, Text, Index, event, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from sqlalchemy.exc import OperationalError, DBAPIError
+from sqlalchemy.pool import QueuePool
 import datetime
 import uuid
 import time
 
 from app.config import settings
+from app.utils.metrics import DB_CONNECTION_HOLD_SECONDS, DB_POOL_CHECKOUT_WAIT_SECONDS, Gauge
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT_SECONDS.observe(time.perf_counter() - start)
 
 def get_engine(url, max_retries=3):
     # Configure engine with connection pooling
     engine = create_engine(
         url,
+        poolclass=InstrumentedQueuePool,
         pool_pre_ping=True,  # Verify connections before using them
         pool_recycle=280,    # Recycle connections before 5 min timeout
         pool_size=5,         # Maximum number of connections to keep
@@ -33,11 +46,22 @@ def get_engine(url, max_retries=3):
                     if attempt == max_retries - 1:
                         raise
     
+    @event.listens_for(engine, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info['checked_out_at'] = time.perf_counter()
+
+    @event.listens_for(engine, 'checkin')
+    def on_checkin(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop('checked_out_at', None)
+        if checked_out_at is not None:
+            DB_CONNECTION_HOLD_SECONDS.observe(time.perf_counter() - checked_out_at)
+
     return engine
 
 # Create PostgreSQL engine with connection pooling and retry handling
 engine = get_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Gauge("db_pool_checked_out", "Database connections currently checked out", function=lambda: engine.pool.checkedout())
 
 Base = declarative_base()
 
@@ -68,8 +92,19 @@ class DBUser(Base):
     runpod_requests = relationship("DBRunPodRequest", back_populates="user")
 
 
+# Statuses a request can still move out of; terminal rows are never polled
+ACTIVE_REQUEST_STATUSES = ("pending", "submitted", "processing")
+
+
 class DBRunPodRequest(Base):
     __tablename__ = "runpod_requests"
+    __table_args__ = (
+        # Partial index so pending/poll lookups only touch in-flight rows
+        Index("ix_runpod_requests_active_status",
+              "status",
+              postgresql_where=text(
+                  "status IN ('pending', 'submitted', 'processing')")),
+    )
 
     id = Column(String,
                 primary_key=True,
@@ -81,16 +116,42 @@ class DBRunPodRequest(Base):
     status = Column(
         String,
         default="pending")  # pending, submitted, processing, completed, failed
-    runpod_job_id = Column(String, nullable=True)
+    runpod_job_id = Column(String, nullable=True, unique=True, index=True)
+    endpoint_id = Column(String, nullable=True)  # RunPod endpoint the job was routed to
+    # Latency breakdown in milliseconds: RunPod queue wait and GPU time, plus
+    # our own time-to-job-id, input upload and completion handling
+    delay_time_ms = Column(Integer, nullable=True)
+    execution_time_ms = Column(Integer, nullable=True)
+    ingest_ms = Column(Integer, nullable=True)
+    upload_ms = Column(Integer, nullable=True)
+    completion_ms = Column(Integer, nullable=True)
     input_image_url = Column(String)
     output_image_url = Column(String, nullable=True)
+    # Requests created together by POST /process-batch, and their position in it
+    batch_id = Column(String, nullable=True, index=True)
+    batch_index = Column(Integer, nullable=True)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     submitted_at = Column(DateTime, nullable=True)
-    completed_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True, index=True)
 
     user = relationship("DBUser", back_populates="runpod_requests")
 
 
+class DBJobSpan(Base):
+    """One timed step of a job, e.g. the RunPod submit or the output upload"""
+    __tablename__ = "job_spans"
+
+    span_id = Column(String, primary_key=True)
+    trace_id = Column(String, index=True)
+    parent_span_id = Column(String, nullable=True)
+    job_id = Column(String, nullable=True, index=True)  # RunPod job ID
+    request_id = Column(String, nullable=True)  # runpod_requests.id
+    name = Column(String)
+    start_time_ns = Column(BigInteger)
+    end_time_ns = Column(BigInteger)
+    attributes = Column(Text, nullable=True)  # JSON object
+
+
 class DBImage(Base):
     __tablename__ = "images"
 
@@ -0,0 +1,46 @@
+import time
+
+from app.utils.metrics import (HTTP_REQUESTS, HTTP_REQUEST_SECONDS, end_request_timings,
+                               server_timing_header, start_request_timings)
+
+
+class MetricsMiddleware:
+    """Counts and times every HTTP request by route template and adds a Server-Timing header.
+
+    Plain ASGI rather than BaseHTTPMiddleware so streaming responses and
+    background tasks are not buffered or delayed.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        timings, token = start_request_timings()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                entries = timings + [("app", time.perf_counter() - start)]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing_header(entries).encode("latin-1")))
+                # Lets cross-origin pages read the timings in devtools and the Resource Timing API
+                headers.append((b"timing-allow-origin", b"*"))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            end_request_timings(token)
+            # FastAPI records the matched route in the scope; use its template
+            # so path parameters don't explode the label set
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUESTS.inc(method=scope["method"], route=route, status=status)
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, method=scope["method"], route=route)
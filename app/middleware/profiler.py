@@ -0,0 +1,43 @@
+import asyncio
+import time
+from datetime import datetime
+
+from app.services.profiler import RequestSampler, profiler
+
+
+class ProfilerMiddleware:
+    """Runs selected requests under the sampling profiler.
+
+    Only installed when PROFILER_ENABLED is set, so unprofiled deployments
+    don't pay even for the header check.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = next((value.decode("latin-1") for key, value in scope["headers"] if key == b"x-profile"), None)
+        if not profiler.should_profile(token):
+            await self.app(scope, receive, send)
+            return
+
+        route = scope["path"].strip("/").replace("/", "_") or "root"
+        name = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{scope['method']}-{route}"
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", [])) + [
+                    (b"x-profile-id", f"{name}.folded".encode("latin-1"))]}
+            await send(message)
+
+        sampler = RequestSampler(asyncio.current_task())
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            samples = sampler.stop()
+            await asyncio.to_thread(profiler.save, name, samples, time.perf_counter() - started)
@@ -0,0 +1,167 @@
+import asyncio
+import base64
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from app.utils.json_stream import StreamedImage
+from app.utils.log import IMAGE_KEYS
+
+logger = logging.getLogger(__name__)
+
+# Inbound traffic worth replaying: RunPod callbacks and client status polls
+RECORDED_PATHS = ("/api/images/webhook/runpod", "/api/images/job-status/")
+
+# "$synthetic-base64:<length>" stands in for an image of that many base64 characters
+SYNTHETIC_PREFIX = "$synthetic-base64:"
+_SYNTHETIC = re.compile(re.escape(SYNTHETIC_PREFIX) + r"(\d+)$")
+_BASE64_RUN = re.compile(r"^[A-Za-z0-9+/]{256,}={0,2}$")
+
+_synthetic_cache: Dict[int, str] = {}
+_files: Dict[str, "RecordingFile"] = {}
+
+
+def strip_images(value: Any, key: Optional[str] = None) -> Any:
+    """Copy of a payload with every image replaced by a size marker"""
+    if isinstance(value, dict):
+        return {k: strip_images(v, str(k)) for k, v in value.items()}
+    if isinstance(value, list):
+        return [strip_images(v, key) for v in value]
+    if isinstance(value, StreamedImage):
+        # Decoded while the body streamed in; record the base64 length it arrived as
+        return f"{value.prefix or ''}{SYNTHETIC_PREFIX}{(value.size + 2) // 3 * 4}"
+    if isinstance(value, str) and len(value) >= 256:
+        prefix, _, data = value.rpartition(",") if value.startswith("data:") else ("", "", value)
+        if (key and key.lower() in IMAGE_KEYS) or _BASE64_RUN.match(data):
+            return f"{prefix}{',' if prefix else ''}{SYNTHETIC_PREFIX}{len(data)}"
+    return value
+
+
+def synthetic_base64(length: int) -> str:
+    """Valid base64 of exactly `length` characters; random, so it doesn't compress"""
+    if length not in _synthetic_cache:
+        encoded = base64.b64encode(os.urandom((length + 3) // 4 * 3)).decode()
+        _synthetic_cache[length] = encoded[:length]
+    return _synthetic_cache[length]
+
+
+def fill_images(value: Any) -> Any:
+    """Inverse of strip_images: size markers become synthetic base64 of the same size"""
+    if isinstance(value, dict):
+        return {k: fill_images(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [fill_images(v) for v in value]
+    if isinstance(value, str) and SYNTHETIC_PREFIX in value:
+        prefix, _, marker = value.rpartition(",")
+        match = _SYNTHETIC.match(marker)
+        if match:
+            return f"{prefix}{',' if prefix else ''}{synthetic_base64(int(match.group(1)))}"
+    return value
+
+
+class RecordingFile:
+    """A JSON-lines recording shared by everything that writes to the same path"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, entry: dict):
+        line = json.dumps(entry) + "\n"
+        with self._lock, open(self.path, "a") as f:
+            f.write(line)
+
+
+def recording_file(path: str) -> RecordingFile:
+    if path not in _files:
+        _files[path] = RecordingFile(path)
+    return _files[path]
+
+
+class RunPodStatusRecorder:
+    """RunPodService status listener that records RunPod's answers.
+
+    They are written with "source": "runpod" next to the inbound traffic, so
+    a replay's fake RunPod can give the API the status answers it got in
+    production instead of IN_PROGRESS for every job.
+    """
+
+    def __init__(self, path: str):
+        self.file = recording_file(path)
+
+    def __call__(self, job_id: str, data: dict):
+        # Stripped now: the caller discards streamed images once it is done
+        entry = {"ts": time.time(), "source": "runpod", "method": "GET", "path": f"status/{job_id}",
+                 "status": 200, "body": strip_images(data)}
+        future = asyncio.get_running_loop().run_in_executor(None, self.file.append, entry)
+        future.add_done_callback(self._log_failure)
+
+    @staticmethod
+    def _log_failure(future):
+        if not future.cancelled() and future.exception():
+            logger.warning("Recording a RunPod status failed: %s", future.exception())
+
+
+class TrafficRecorderMiddleware:
+    """Appends RunPod webhooks and job-status polls to a JSON-lines file.
+
+    Each line has the arrival time, method, path, status and duration; webhook
+    bodies are kept with images swapped for size markers, so a recording is
+    small and holds no user images. scripts/replay_traffic.py plays a
+    recording back against a local instance. Only installed when
+    TRAFFIC_RECORD_FILE is set, together with RunPodStatusRecorder.
+    """
+
+    def __init__(self, app, path: str):
+        self.app = app
+        self.file = recording_file(path)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(RECORDED_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        arrived = time.time()
+        started = time.perf_counter()
+        chunks = []
+        status = 500
+
+        async def receive_and_keep():
+            message = await receive()
+            if message["type"] == "http.request":
+                chunks.append(message.get("body", b""))
+            return message
+
+        async def send_and_note(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive_and_keep, send_and_note)
+        finally:
+            entry = {
+                "ts": arrived,
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": scope["query_string"].decode("latin-1"),
+                "status": status,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+            }
+            try:
+                await asyncio.to_thread(self._write, entry, b"".join(chunks))
+            except Exception as e:
+                logger.warning("Recording %s failed: %s", scope["path"], e)
+
+    def _write(self, entry: dict, body: bytes):
+        if body:
+            try:
+                entry["body"] = strip_images(json.loads(body))
+            except ValueError:
+                entry["body_bytes"] = len(body)
+        self.file.append(entry)
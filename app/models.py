@@ -9,6 +9,15 @@ class Workflow(BaseModel):
     description: str
     preview_image: Optional[str] = None
 
+class WorkflowProfile(Workflow):
+    """A workflow plus how its jobs are executed on RunPod"""
+    endpoint_id: Optional[str] = None  # Falls back to RUNPOD_ENDPOINT_ID
+    endpoint_ids: List[str] = []  # Pool to balance across; overrides endpoint_id
+    max_input_resolution: int = 2048  # Longest side of the input, in pixels
+    timeout: Optional[int] = None  # Seconds; falls back to RUNPOD_TIMEOUT
+    input_mode: str = "base64"  # "base64" sends the image inline, "url" sends its storage URL
+    priority: int = 0  # Negative values are submitted as RunPod low-priority jobs
+
 class UserBase(BaseModel):
     email: EmailStr
     username: str
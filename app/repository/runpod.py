@@ -1,13 +1,50 @@
 
+import logging
+import uuid
 from sqlalchemy.orm import Session
 from datetime import datetime
-from app.database import DBRunPodRequest
+from app.database import DBRunPodRequest, ACTIVE_REQUEST_STATUSES
 
-from typing import Optional
-from sqlalchemy import update
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import insert, update, case, extract, func
+
+logger = logging.getLogger(__name__)
+
+# Statuses a request may be in for each target status; completed/failed are terminal
+STATUS_TRANSITIONS = {
+    "submitted": ("pending",),
+    "processing": ("pending", "submitted"),
+    "completed": ("pending", "submitted", "processing"),
+    "failed": ("pending", "submitted", "processing"),
+}
+
+
+# Columns a status transition may set alongside the status itself
+TRANSITION_COLUMNS = (
+    "output_image_url", "runpod_job_id", "endpoint_id",
+    "delay_time_ms", "execution_time_ms", "ingest_ms", "upload_ms", "completion_ms",
+)
+# Timings reported by the latency breakdown
+LATENCY_COLUMNS = ("ingest_ms", "upload_ms", "delay_time_ms", "execution_time_ms", "completion_ms")
+
+
+def _transition_statement(status: str):
+    if status not in STATUS_TRANSITIONS:
+        raise ValueError(f"Invalid target status: {status}")
+    values = {"status": status}
+    if status == "submitted":
+        values["submitted_at"] = datetime.utcnow()
+    elif status in ["completed", "failed"]:
+        values["completed_at"] = datetime.utcnow()
+    stmt = (
+        update(DBRunPodRequest)
+        .where(DBRunPodRequest.status.in_(STATUS_TRANSITIONS[status]))
+        .execution_options(synchronize_session=False)
+    )
+    return stmt, values
 
 def create_request(db: Session, workflow_id: str, input_image_url: str, user_id: Optional[str] = None, anonymous_user_id: Optional[str] = None):
-    print(f"[create_request] Creating request with user_id={user_id}, workflow_id={workflow_id}, anonymous_user_id={anonymous_user_id}")
+    logger.debug("Creating request with user_id=%s workflow_id=%s anonymous_user_id=%s", user_id, workflow_id, anonymous_user_id)
     db_request = DBRunPodRequest(
         user_id=user_id,
         workflow_id=workflow_id,
@@ -19,9 +56,45 @@ def create_request(db: Session, workflow_id: str, input_image_url: str, user_id:
     db.refresh(db_request)
     return db_request
 
+def create_batch_requests(db: Session, batch_id: str, items: List[dict], user_id: Optional[str] = None,
+                          anonymous_user_id: Optional[str] = None) -> List[str]:
+    """Inserts one request per item (workflow_id, input_image_url) with a single INSERT.
+
+    Returns the new request ids in item order.
+    """
+    now = datetime.utcnow()
+    rows = [{
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "anonymous_user_id": anonymous_user_id,
+        "workflow_id": item["workflow_id"],
+        "input_image_url": item["input_image_url"],
+        "status": "pending",
+        "batch_id": batch_id,
+        "batch_index": index,
+        "created_at": now,
+    } for index, item in enumerate(items)]
+    db.execute(insert(DBRunPodRequest), rows)
+    db.commit()
+    return [row["id"] for row in rows]
+
+def get_batch_requests(db: Session, batch_id: str):
+    """A batch's requests in submission order"""
+    return (
+        db.query(DBRunPodRequest.id,
+                 DBRunPodRequest.batch_index,
+                 DBRunPodRequest.workflow_id,
+                 DBRunPodRequest.runpod_job_id,
+                 DBRunPodRequest.status,
+                 DBRunPodRequest.output_image_url)
+        .filter(DBRunPodRequest.batch_id == batch_id)
+        .order_by(DBRunPodRequest.batch_index)
+        .all()
+    )
+
 def associate_anonymous_requests(db: Session, anonymous_user_id: str, user_id: str) -> int:
     """Associates RunPod requests from an anonymous ID to a user ID."""
-    print(f"[associate_anonymous_requests] Associating requests from {anonymous_user_id} to user {user_id}")
+    logger.info("Associating requests from %s to user %s", anonymous_user_id, user_id)
     stmt = (
         update(DBRunPodRequest)
         .where(DBRunPodRequest.anonymous_user_id == anonymous_user_id)
@@ -35,21 +108,39 @@ def associate_anonymous_requests(db: Session, anonymous_user_id: str, user_id: s
 def get_request(db: Session, request_id: str):
     return db.query(DBRunPodRequest).filter(DBRunPodRequest.id == request_id).first()
 
-def update_request_status(db: Session, request_id: str, status: str, output_url: str = None, runpod_job_id: str = None):
-    request = get_request(db, request_id)
-    if request:
-        request.status = status
-        if output_url:
-            request.output_image_url = output_url
-        if runpod_job_id:
-            request.runpod_job_id = runpod_job_id
-        if status == "submitted":
-            request.submitted_at = datetime.utcnow()
-        elif status in ["completed", "failed"]:
-            request.completed_at = datetime.utcnow()
-        db.commit()
-        db.refresh(request)
-    return request
+def update_request_status(db: Session, request_id: str, status: str, output_url: str = None, **columns) -> bool:
+    """Applies a guarded status transition in a single UPDATE.
+
+    `columns` may set any of TRANSITION_COLUMNS; None values are skipped.
+    Returns False if the request does not exist or has already moved past `status`.
+    """
+    stmt, values = _transition_statement(status)
+    if output_url:
+        values["output_image_url"] = output_url
+    for column_name, value in columns.items():
+        if column_name not in TRANSITION_COLUMNS:
+            raise ValueError(f"Not a transition column: {column_name}")
+        if value is not None:
+            values[column_name] = value
+    result = db.execute(stmt.where(DBRunPodRequest.id == request_id).values(**values))
+    db.commit()
+    return result.rowcount > 0
+
+def apply_status_transitions(db: Session, status: str, updates: Dict[str, dict], by_job_id: bool = False) -> int:
+    """Moves many requests to `status` with one UPDATE statement.
+
+    `updates` maps a request id (or RunPod job id when `by_job_id`) to values
+    for any of TRANSITION_COLUMNS on that row. Does not commit.
+    """
+    key_column = DBRunPodRequest.runpod_job_id if by_job_id else DBRunPodRequest.id
+    stmt, values = _transition_statement(status)
+    for column_name in TRANSITION_COLUMNS:
+        per_row = {key: row[column_name] for key, row in updates.items() if row.get(column_name) is not None}
+        if per_row:
+            column = getattr(DBRunPodRequest, column_name)
+            values[column_name] = case(per_row, value=key_column, else_=column)
+    result = db.execute(stmt.where(key_column.in_(list(updates))).values(**values))
+    return result.rowcount
 
 def get_request_by_job_id(db: Session, job_id: str):
     return db.query(DBRunPodRequest).filter(DBRunPodRequest.runpod_job_id == job_id).first()
@@ -57,6 +148,10 @@ def get_request_by_job_id(db: Session, job_id: str):
 def get_pending_requests(db: Session):
     return db.query(DBRunPodRequest).filter(DBRunPodRequest.status == "pending").all()
 
+def get_active_requests(db: Session):
+    """Requests that have not reached a terminal status yet"""
+    return db.query(DBRunPodRequest).filter(DBRunPodRequest.status.in_(ACTIVE_REQUEST_STATUSES)).all()
+
 def get_requests_by_user(db: Session, user_id: str, skip: int = 0, limit: int = 100):
     """Gets RunPod requests for a specific user, ordered by creation date."""
     return (
@@ -67,3 +162,60 @@ def get_requests_by_user(db: Session, user_id: str, skip: int = 0, limit: int =
         .limit(limit)
         .all()
     )
+
+def get_hourly_request_counts(db: Session, since: datetime) -> Dict[int, int]:
+    """Number of requests created since `since`, keyed by UTC hour of day"""
+    hour = extract("hour", DBRunPodRequest.created_at)
+    rows = (
+        db.query(hour, func.count(DBRunPodRequest.id))
+        .filter(DBRunPodRequest.created_at >= since)
+        .group_by(hour)
+        .all()
+    )
+    return {int(h): count for h, count in rows}
+
+def get_latency_breakdown(db: Session, since: datetime) -> List[dict]:
+    """Per-workflow p50/p95/p99 of each latency component for requests completed since `since`.
+
+    Uses ordered-set aggregates, so this needs PostgreSQL.
+    """
+    total_ms = func.extract("epoch", DBRunPodRequest.completed_at - DBRunPodRequest.created_at) * 1000
+    components = [(name, getattr(DBRunPodRequest, name)) for name in LATENCY_COLUMNS] + [("total_ms", total_ms)]
+    percentiles = (50, 95, 99)
+
+    aggregates = [
+        func.percentile_cont(pct / 100).within_group(column).label(f"{name}_p{pct}")
+        for name, column in components for pct in percentiles
+    ]
+    rows = (
+        db.query(DBRunPodRequest.workflow_id, func.count(DBRunPodRequest.id).label("jobs"), *aggregates)
+        .filter(DBRunPodRequest.status == "completed")
+        .filter(DBRunPodRequest.completed_at >= since)
+        .group_by(DBRunPodRequest.workflow_id)
+        .all()
+    )
+
+    breakdown = []
+    for row in rows:
+        entry = {"workflow_id": row.workflow_id, "jobs": row.jobs}
+        for name, _ in components:
+            entry[name] = {
+                f"p{pct}": (round(value) if value is not None else None)
+                for pct in percentiles
+                for value in [getattr(row, f"{name}_p{pct}")]
+            }
+        breakdown.append(entry)
+    return breakdown
+
+def get_recent_job_timings(db: Session, limit: int) -> List[Tuple[str, int, int]]:
+    """(workflow_id, delay_time_ms, execution_time_ms) of the most recently completed requests"""
+    return (
+        db.query(DBRunPodRequest.workflow_id,
+                 DBRunPodRequest.delay_time_ms,
+                 DBRunPodRequest.execution_time_ms)
+        .filter(DBRunPodRequest.status == "completed")
+        .filter(DBRunPodRequest.execution_time_ms.isnot(None))
+        .order_by(DBRunPodRequest.completed_at.desc())
+        .limit(limit)
+        .all()
+    )
@@ -0,0 +1,21 @@
+from sqlalchemy.orm import Session
+from typing import List
+
+from app.database import DBJobSpan
+
+def add_spans(db: Session, spans: List[dict]) -> None:
+    """Insert finished spans in one round trip"""
+    if not spans:
+        return
+    db.bulk_insert_mappings(DBJobSpan, spans)
+    db.commit()
+
+def get_spans_for_job(db: Session, job_id: str) -> List[DBJobSpan]:
+    """All spans of the trace that `job_id` belongs to, in start order"""
+    trace_ids = db.query(DBJobSpan.trace_id).filter(DBJobSpan.job_id == job_id).distinct()
+    return (
+        db.query(DBJobSpan)
+        .filter(DBJobSpan.trace_id.in_(trace_ids))
+        .order_by(DBJobSpan.start_time_ns)
+        .all()
+    )
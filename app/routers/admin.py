@@ -0,0 +1,77 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.dependencies import get_current_admin_user
+from app.repository import runpod as runpod_repo
+from app.config import settings
+from app.services.profiler import profiler
+from app.services.warm_scheduler import warm_scheduler
+
+router = APIRouter()
+
+
+@router.get("/warm-scheduler")
+async def get_warm_scheduler_report(current_user=Depends(get_current_admin_user)):
+    """Traffic profile, warming budget and cold-start rates with and without warming"""
+    return warm_scheduler.report()
+
+
+@router.get("/latency")
+async def get_latency_breakdown(hours: int = Query(24, ge=1, le=24 * 30),
+                                db: Session = Depends(get_db),
+                                current_user=Depends(get_current_admin_user)):
+    """p50/p95/p99 of each request latency component per workflow over the last `hours`"""
+    since = datetime.utcnow() - timedelta(hours=hours)
+    workflows = await asyncio.to_thread(runpod_repo.get_latency_breakdown, db, since)
+    return {"since": since, "workflows": workflows}
+
+
+@router.post("/profiler/token")
+async def mint_profile_token(current_user=Depends(get_current_admin_user)):
+    """A short-lived value for the X-Profile header; the request carrying it is profiled"""
+    if not settings.PROFILER_ENABLED:
+        raise HTTPException(409, "Profiler is disabled; set PROFILER_ENABLED=true")
+    return {"header": "X-Profile", "value": profiler.mint_token(), "expires_in": settings.PROFILE_TOKEN_TTL}
+
+
+@router.get("/profiles")
+async def list_profiles(current_user=Depends(get_current_admin_user)):
+    return await asyncio.to_thread(profiler.list_profiles)
+
+
+@router.get("/profiles/{name}")
+async def get_profile(name: str, current_user=Depends(get_current_admin_user)):
+    """Collapsed stacks, ready for flamegraph.pl or speedscope"""
+    path = profiler.profile_path(name)
+    if not path:
+        raise HTTPException(404, "Profile not found")
+    return FileResponse(path, media_type="text/plain")
+
+
+@router.post("/memory/snapshots")
+async def take_memory_snapshot(frames: int = Query(25, ge=1, le=100), limit: int = Query(20, ge=1, le=200),
+                               current_user=Depends(get_current_admin_user)):
+    """Snapshot traced allocations; tracing starts with the first snapshot"""
+    snapshot_id = await asyncio.to_thread(profiler.take_snapshot, frames)
+    return {"id": snapshot_id, "top": await asyncio.to_thread(profiler.top, snapshot_id, limit)}
+
+
+@router.get("/memory/diff")
+async def diff_memory_snapshots(base: str, head: str, limit: int = Query(20, ge=1, le=200),
+                                current_user=Depends(get_current_admin_user)):
+    """Allocation growth from snapshot `base` to snapshot `head`, largest first"""
+    if base not in profiler.snapshots or head not in profiler.snapshots:
+        raise HTTPException(404, "Unknown snapshot")
+    return await asyncio.to_thread(profiler.diff, base, head, limit)
+
+
+@router.delete("/memory/snapshots")
+async def stop_memory_tracing(current_user=Depends(get_current_admin_user)):
+    """Drop snapshots and stop tracemalloc so it stops costing anything"""
+    profiler.stop_tracing()
+    return {"tracing": False}
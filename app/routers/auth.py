@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status, Response, Cookie
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
+import logging
 from typing import Dict, Any, Optional
 from pydantic import BaseModel
 
@@ -15,6 +16,7 @@ from app.services.facebook import facebook_service
 from app.repository import runpod as runpod_repo
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
 @router.post("/register",
@@ -135,12 +137,9 @@ async def facebook_login(request_body: FacebookLoginRequest,
 
     # Now handle anonymous user association with the created user
     if request_body.anonymous_user_id:
-        print(
-            f"[Facebook Login] Associating anonymous ID: {request_body.anonymous_user_id}"
-        )
         updated_count = runpod_repo.associate_anonymous_requests(
             db, request_body.anonymous_user_id, db_user.id)
-        print(f"[Facebook Login] Associated {updated_count} requests")
+        logger.info("Associated %d anonymous requests with user %s", updated_count, db_user.id)
 
     if not db_user:
         # Create new user with Facebook data
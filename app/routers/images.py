@@ -1,29 +1,52 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Request, Response, Depends, Header
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Request, Response, Depends, Header, Query
 from sqlalchemy.orm import Session
 import asyncio
-from app.database import get_db
-from app.dependencies import get_current_active_user, get_current_user
-from app.models import User
+from app.database import get_db, SessionLocal, ACTIVE_REQUEST_STATUSES
+from app.dependencies import get_current_active_user, get_current_user, get_current_admin_user
+from app.models import User, WorkflowProfile
 from app.repository import runpod as runpod_repo
-from typing import Optional
+from app.repository import traces as traces_repo
+from typing import Dict, List, Optional, Union
 from pydantic import BaseModel
 import httpx
 import base64
+import json
+import logging
 from datetime import datetime
 import os
+import time
+import uuid
 
 from app.services.job_tracker import JobTracker, JobStatus
-from app.utils.storage import save_base64_image, Client
+from app.services.status_writer import status_writer
+from app.services.runpod_service import FAILED_STATUSES, TERMINAL_STATUSES, job_error, job_timings, runpod_service
+from app.services.job_status import job_status_resolver
+from app.services.workflow_registry import workflow_registry
+from app.services.endpoint_router import endpoint_router
+from app.services.eta_estimator import eta_estimator
+from app.services.warm_scheduler import warm_scheduler
+from app.services.tracing import tracer, timeline, to_otlp
+from app.services.executor import executor
+from app.utils.image_utils import base64_head, base64_start, read_data_url, read_image_size, to_data_url
+from app.utils.json_stream import StreamedImage, output_parser, replace_streamed, streamed_images
+from app.utils.storage import (save_base64_image, save_image_file, save_image_from_url, check_output_url,
+                               delete_image, Client)
 from app.config import settings
+from app.utils.metrics import (IMAGE_JOBS_SUBMITTED, PIPELINE_STAGE_SECONDS, STORAGE_SECONDS,
+                               WEBHOOK_DB_LAG_SECONDS)
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 from typing import Optional
 
 
 class ImageProcessRequest(BaseModel):
-    workflow_name: str
+    workflow_name: Optional[str] = None
     image: str
+    # Several workflows for the same image: it is stored once, one job is
+    # started per workflow and the jobs come back grouped as a batch
+    workflow_names: Optional[List[str]] = None
     waitForResponse: bool = False
     anonymous_user_id: Optional[str] = None
 
@@ -36,6 +59,36 @@ class JobStatusResponse(BaseModel):
     error: Optional[str] = None
     message: Optional[str] = None
     image_url: Optional[str] = None
+    # For jobs still in flight: when we expect them to finish, and how many
+    # seconds a client should wait before polling again
+    estimated_completion: Optional[datetime] = None
+    retry_after: Optional[int] = None
+
+
+class ImageBatchRequest(BaseModel):
+    images: List[str]
+    # One per image, or a single workflow for every image; with a single
+    # image, one job per workflow
+    workflow_names: List[str]
+    anonymous_user_id: Optional[str] = None
+
+
+class BatchItemResponse(BaseModel):
+    index: int
+    workflow_name: str
+    request_id: Optional[str] = None
+    job_id: Optional[str] = None
+    status: str
+    error: Optional[str] = None
+    image_url: Optional[str] = None
+
+
+class BatchResponse(BaseModel):
+    batch_id: str
+    total: int
+    counts: Dict[str, int]
+    done: bool
+    items: List[BatchItemResponse]
 
 
 async def get_optional_current_user(
@@ -50,8 +103,20 @@ async def get_optional_current_user(
         return None
 
 
+async def request_owner(request: ImageProcessRequest, db: Session) -> tuple:
+    """(user_id, anonymous_user_id) to save on the request"""
+    # Try to get current user from request, but don't require it
+    try:
+        current_user = await get_optional_current_user(db=db)
+        if current_user:
+            return current_user.id, None
+    except Exception as e:
+        logger.info("process_image auth failed, proceeding as anonymous: %s", e)
+    return None, request.anonymous_user_id
+
+
 @router.post("/process-image",
-             response_model=JobStatusResponse,
+             response_model=Union[JobStatusResponse, BatchResponse],
              responses={
                  200: {
                      "description": "Successfully started image processing",
@@ -77,119 +142,387 @@ async def get_optional_current_user(
              })
 async def process_image(request: ImageProcessRequest,
                         db: Session = Depends(get_db)):
-    print("[process_image] Endpoint called")
-    print(f"[process_image] Request workflow_name: {request.workflow_name}")
-    print(
-        f"[process_image] Image data length: {len(request.image) if request.image else 0}"
-    )
-
-    if not (request.workflow_name and request.image):
-        print("[process_image] Missing required fields")
-        raise HTTPException(400, "Workflow name and image are required")
+    started = time.perf_counter()
+    logger.debug("process_image called for workflow %s with %d chars of image data",
+                  request.workflow_name, len(request.image) if request.image else 0)
 
-    # Try to get current user from request, but don't require it
-    try:
-        current_user = await get_optional_current_user(db=db)
-        if current_user:
-            print(f"[process_image] Authenticated user ID: {current_user.id}")
-            user_id = current_user.id
-            anonymous_user_id_to_save = None
-        else:
-            print("[process_image] No auth token, proceeding as anonymous")
-            user_id = None
-            anonymous_user_id_to_save = request.anonymous_user_id
-            print(
-                f"[process_image] Using anonymous user ID: {anonymous_user_id_to_save}"
-            )
-    except Exception as e:
-        print(
-            f"[process_image] Auth failed, proceeding as anonymous: {str(e)}")
-        user_id = None
-        anonymous_user_id_to_save = request.anonymous_user_id
-
-    # Save input image and get URL
-    timestamp = datetime.now().timestamp()
-    input_filename = f"{int(timestamp)}.png"
-    try:
-        await save_base64_image(request.image, "uploads", input_filename)
-        base_url = settings.BASE_URL.rstrip('/')
-        input_url = f"{base_url}/api/images/input/{input_filename}"
+    if not ((request.workflow_name or request.workflow_names) and request.image):
+        logger.info("process_image rejected: missing required fields")
+        raise HTTPException(400, "Workflow name and image are required")
 
-        # Create database record with optional user_id
-        print(
-            f"[process_image] Creating request with user_id={user_id}, anonymous_user_id={anonymous_user_id_to_save}"
+    if request.workflow_names:
+        if request.waitForResponse:
+            raise HTTPException(400, "waitForResponse is not supported with several workflows")
+        user_id, anonymous_user_id = await request_owner(request, db)
+        return await start_batch([request.image], [(0, name) for name in request.workflow_names],
+                                 user_id, anonymous_user_id)
+
+    profile = workflow_registry.get(request.workflow_name)
+    if not profile:
+        raise HTTPException(400, f"Unknown workflow: {request.workflow_name}")
+
+    # Pillow runs in the image process pool; only the header crosses over
+    size = await executor.run_image(read_image_size, base64_head(request.image))
+    if size and max(size) > profile.max_input_resolution:
+        raise HTTPException(
+            400,
+            f"Image is {size[0]}x{size[1]}; {profile.name} accepts at most {profile.max_input_resolution}px per side"
         )
-        db_request = runpod_repo.create_request(
-            db=db,
-            user_id=user_id,
-            workflow_id=request.workflow_name,
-            input_image_url=input_url,
-            anonymous_user_id=anonymous_user_id_to_save)
-    except Exception as e:
-        print(f"[Storage] Failed to save input image: {e}")
+
+    # Started once the request is valid, so rejected requests leave no trace behind
+    tracer.start_trace(workflow_id=request.workflow_name)
+
+    user_id, anonymous_user_id_to_save = await request_owner(request, db)
+
+    # The input URL is known up front, so the storage upload, DB insert and
+    # RunPod submission are independent and run concurrently. Workflows that
+    # take the input by URL have to wait for the upload before submitting.
+    # Unguessable and unique: workflows with input_mode "url" fetch it, and
+    # a failed request deletes it
+    input_filename = f"{uuid.uuid4()}.png"
+    input_path = f"uploads/{input_filename}"
+    base_url = settings.BASE_URL.rstrip('/')
+    input_url = f"{base_url}/api/images/input/{input_filename}"
+
+    logger.debug("process_image creating request for user_id=%s anonymous_user_id=%s",
+                 user_id, anonymous_user_id_to_save)
+    upload_ms = None
+
+    async def timed_upload():
+        nonlocal upload_ms
+        upload_started = time.perf_counter()
+        with tracer.span("ingest.upload"):
+            await save_base64_image(request.image, "uploads", input_filename)
+        upload_ms = int((time.perf_counter() - upload_started) * 1000)
+
+    upload = asyncio.ensure_future(timed_upload())
+
+    async def submit_after_upload():
+        await upload
+        return await submit_runpod_job(request, profile, input_url)
+
+    if profile.input_mode == "url":
+        submission = submit_after_upload()
+    else:
+        submission = submit_runpod_job(request, profile, input_url)
+
+    async def insert_request():
+        with tracer.span("ingest.db_insert"):
+            return await asyncio.to_thread(runpod_repo.create_request,
+                                           db=db,
+                                           user_id=user_id,
+                                           workflow_id=request.workflow_name,
+                                           input_image_url=input_url,
+                                           anonymous_user_id=anonymous_user_id_to_save)
+
+    with PIPELINE_STAGE_SECONDS.time("ingest", stage="ingest"):
+        upload_result, db_result, runpod_result = await asyncio.gather(
+            upload, insert_request(), submission, return_exceptions=True)
+
+    results = (upload_result, db_result, runpod_result)
+    if any(isinstance(result, BaseException) for result in results):
+        tracer.finish()
+        await compensate_failed_submission(upload_result, db_result,
+                                           runpod_result, input_path)
+        if isinstance(runpod_result, BaseException) and \
+                not isinstance(upload_result, BaseException):
+            raise HTTPException(500, f"RunPod API error: {str(runpod_result)}")
+        logger.error("Failed to save input image: %s",
+                     upload_result if isinstance(upload_result, BaseException) else db_result)
         raise HTTPException(500, "Failed to save input image")
+    db_request, data = db_result, runpod_result
+    IMAGE_JOBS_SUBMITTED.inc(workflow=request.workflow_name)
+    tracer.bind(request_id=db_request.id)
 
-    # Save input image
-    timestamp = datetime.now().timestamp()
-    input_filename = f"{int(timestamp)}.png"
-    try:
-        await save_base64_image(request.image, "uploads", input_filename)
-    except Exception as e:
-        print(f"[Storage] Failed to save input image: {e}")
-        # Continue processing even if storage fails
+    if data.get("id"):
+        JobTracker.set_job(data["id"], JobStatus.PROCESSING)
+        eta_estimator.job_submitted(data["id"], request.workflow_name)
+        # Update database record with RunPod job ID
+        with tracer.span("ingest.db_update"):
+            await status_writer.write("submitted",
+                                      db_request.id,
+                                      runpod_job_id=data["id"],
+                                      endpoint_id=data["endpoint_id"],
+                                      ingest_ms=int((time.perf_counter() - started) * 1000),
+                                      upload_ms=upload_ms)
+        # Start background polling
+        asyncio.create_task(
+            JobTracker.poll_job_status(data["id"],
+                                       workflow_id=request.workflow_name))
+        if request.waitForResponse:
+            return await wait_for_job_response(data["id"])
+        return JobStatusResponse(
+            job_id=data["id"],
+            status=JobStatus.PROCESSING,
+            message="Image processing started asynchronously",
+            **eta_estimator.estimate(data["id"]))
+
+    tracer.finish()
+    return data
 
-    # Determine endpoint
-    endpoint = "runsync" if request.waitForResponse else "run"
-    api_url = f"https://api.runpod.ai/v2/{settings.RUNPOD_ENDPOINT_ID}/{endpoint}"
 
-    # Prepare request body
+async def wait_for_job_response(job_id: str) -> JobStatusResponse:
+    """Answer a waitForResponse request from the job's completion, or PROCESSING at the deadline.
+
+    The job was submitted with /run like any other; the webhook or poller
+    finishes it and wakes us up, so no RunPod runsync slot or connection is
+    held while it runs and the output is not limited by runsync's payload size.
+    """
+    job = await JobTracker.wait_for_job(job_id, settings.SYNC_WAIT_TIMEOUT)
+    if job is None:
+        return JobStatusResponse(
+            job_id=job_id,
+            status=JobStatus.PROCESSING,
+            message="Still processing; poll job-status for the result",
+            **eta_estimator.estimate(job_id))
+    if job.status == JobStatus.FAILED:
+        return JobStatusResponse(job_id=job_id, status="FAILED", error=job.error)
+    return JobStatusResponse(job_id=job_id,
+                             status="COMPLETED",
+                             output_image=job.output_image,
+                             image_url=job.image_url,
+                             output=job.output)
+
+
+async def submit_runpod_job(request: ImageProcessRequest,
+                            profile: WorkflowProfile, input_url: str) -> dict:
+    """POST the job to the workflow's RunPod /run endpoint"""
+    if profile.input_mode == "url":
+        image = {"name": "uploaded_image.jpg", "image_url": input_url}
+    else:
+        image = {"name": "uploaded_image.jpg", "image": request.image}
     request_body = {
         "input": {
             "workflow_name": request.workflow_name,
-            "images": [{
-                "name": "uploaded_image.jpg",
-                "image": request.image
-            }]
+            "images": [image]
+        },
+        "policy": {
+            "executionTimeout": workflow_registry.timeout_for(profile.id) * 1000
         }
     }
-
-    # Add webhook for async requests
-    if not request.waitForResponse:
-        base_url = settings.BASE_URL.rstrip('/')
-        request_body["webhook"] = f"{base_url}/api/images/webhook/runpod"
-
-    # Make API request
-    async with httpx.AsyncClient() as client:
+    if profile.priority < 0:
+        # Low-priority jobs don't trigger worker scale-up
+        request_body["policy"]["lowPriority"] = True
+
+    # Completion always comes back through the webhook (or the poller),
+    # including for waitForResponse requests
+    base_url = settings.BASE_URL.rstrip('/')
+    request_body["webhook"] = f"{base_url}/api/images/webhook/runpod"
+
+    # Try the pool's endpoints best-first, failing over on transport errors,
+    # throttling and RunPod-side errors
+    last_error = None
+    for endpoint_id in endpoint_router.ranked(
+            workflow_registry.endpoints_for(profile.id)):
+        try:
+            with tracer.span("runpod.submit", endpoint_id=endpoint_id):
+                data = await runpod_service.submit(request_body,
+                                                   endpoint_id=endpoint_id)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 429 and e.response.status_code < 500:
+                raise
+            last_error = e
+        except httpx.TransportError as e:
+            last_error = e
+        else:
+            data["endpoint_id"] = endpoint_id
+            if data.get("id"):
+                endpoint_router.job_submitted(data["id"], endpoint_id)
+                warm_scheduler.job_submitted(data["id"])
+                tracer.bind(job_id=data["id"])
+            return data
+        logger.warning("Endpoint %s failed, trying next: %s", endpoint_id, last_error)
+        endpoint_router.submit_failed(endpoint_id)
+    raise last_error
+
+
+async def compensate_failed_submission(upload_result, db_result, runpod_result,
+                                       input_path: str):
+    """Undo the steps of a submission that succeeded when another one failed"""
+    if not isinstance(runpod_result, BaseException) and runpod_result.get("id") \
+            and runpod_result.get("status") != "COMPLETED":
+        # Through JobTracker so the finish listeners stop counting the job
         try:
-            response = await client.post(
-                api_url,
-                json=request_body,
-                headers={"Authorization": f"Bearer {settings.RUNPOD_API_KEY}"})
-            response.raise_for_status()
-            data = response.json()
+            await JobTracker.cancel_job(runpod_result["id"], "Submission failed", runpod_result.get("endpoint_id"))
         except Exception as e:
-            raise HTTPException(500, f"RunPod API error: {str(e)}")
-
-    # Handle async response
-    if not request.waitForResponse and data.get("id"):
-        JobTracker.set_job(data["id"], JobStatus.PROCESSING)
-        # Update database record with RunPod job ID
-        runpod_repo.update_request_status(db,
-                                          request_id=db_request.id,
-                                          status="submitted",
-                                          runpod_job_id=data["id"])
-        # Start background polling
-        asyncio.create_task(JobTracker.poll_job_status(data["id"]))
-        return JobStatusResponse(
-            job_id=data["id"],
-            status=JobStatus.PROCESSING,
-            message="Image processing started asynchronously")
-
-    # Handle sync response
-    if request.waitForResponse and data.get("status") == "COMPLETED":
-        return await handle_completed_job(data)
+            logger.error("Failed to cancel job %s: %s", runpod_result["id"], e)
+    if not isinstance(db_result, BaseException):
+        try:
+            await status_writer.write("failed", db_result.id)
+        except Exception as e:
+            logger.error("Failed to mark request %s failed: %s", db_result.id, e)
+    if not isinstance(upload_result, BaseException):
+        await delete_image(input_path)
+
+
+def batch_pairs(batch: ImageBatchRequest) -> List[tuple]:
+    """(image index, workflow name) for every job the batch asks for"""
+    images, workflows = len(batch.images), len(batch.workflow_names)
+    if images == 1:
+        return [(0, name) for name in batch.workflow_names]
+    if workflows == 1:
+        return [(i, batch.workflow_names[0]) for i in range(images)]
+    if images != workflows:
+        raise HTTPException(400, "Give one workflow per image, a single workflow, or a single image")
+    return list(zip(range(images), batch.workflow_names))
+
+
+def batch_response(batch_id: str, items: List[BatchItemResponse]) -> BatchResponse:
+    counts: Dict[str, int] = {}
+    for item in items:
+        counts[item.status] = counts.get(item.status, 0) + 1
+    return BatchResponse(batch_id=batch_id,
+                         total=len(items),
+                         counts=counts,
+                         done=all(item.status not in ACTIVE_REQUEST_STATUSES for item in items),
+                         items=items)
+
+
+@router.post("/process-batch", response_model=BatchResponse)
+async def process_batch(batch: ImageBatchRequest,
+                        current_user: Optional[User] = Depends(get_optional_current_user)):
+    """Start one job per image/workflow pair in a single request"""
+    if not batch.images or not batch.workflow_names:
+        raise HTTPException(400, "At least one image and one workflow are required")
+    return await start_batch(batch.images, batch_pairs(batch),
+                             current_user.id if current_user else None,
+                             None if current_user else batch.anonymous_user_id)
+
+
+async def start_batch(images: List[str], pairs: List[tuple], user_id: Optional[str],
+                      anonymous_user_id: Optional[str]) -> BatchResponse:
+    """Start a job for every (image index, workflow name) pair.
+
+    Each image is uploaded once however many workflows use it, all requests
+    are inserted with one statement, and RunPod submissions run
+    BATCH_SUBMIT_CONCURRENCY at a time. Each job is tracked and marked
+    submitted as soon as RunPod accepts it. Items that fail are reported
+    individually; the rest keep running.
+    """
+    started = time.perf_counter()
+    if len(pairs) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(400, f"A batch can have at most {settings.BATCH_MAX_ITEMS} items")
+
+    profiles = {}
+    for name in {name for _, name in pairs}:
+        profile = workflow_registry.get(name)
+        if not profile:
+            raise HTTPException(400, f"Unknown workflow: {name}")
+        profiles[name] = profile
+    sizes = await asyncio.gather(*(executor.run_image(read_image_size, base64_head(image)) for image in images))
+    for index, size in enumerate(sizes):
+        limit = min(profiles[name].max_input_resolution for i, name in pairs if i == index)
+        if size and max(size) > limit:
+            raise HTTPException(400, f"Image {index} is {size[0]}x{size[1]}; at most {limit}px per side is accepted")
+
+    batch_id = str(uuid.uuid4())
+    base_url = settings.BASE_URL.rstrip('/')
+    filenames = [f"{batch_id}-{index}.png" for index in range(len(images))]
+    input_urls = [f"{base_url}/api/images/input/{filename}" for filename in filenames]
+    uploads = [asyncio.ensure_future(save_base64_image(image, "uploads", filename))
+               for image, filename in zip(images, filenames)]
+
+    def insert_requests():
+        db = SessionLocal()
+        try:
+            return runpod_repo.create_batch_requests(
+                db, batch_id,
+                [{"workflow_id": name, "input_image_url": input_urls[index]} for index, name in pairs],
+                user_id=user_id, anonymous_user_id=anonymous_user_id)
+        finally:
+            db.close()
+
+    semaphore = asyncio.Semaphore(settings.BATCH_SUBMIT_CONCURRENCY)
+    insert = asyncio.ensure_future(asyncio.to_thread(insert_requests))
+
+    async def submit(position: int, index: int, name: str) -> dict:
+        profile = profiles[name]
+        async with semaphore:
+            tracer.start_trace(workflow_id=name, batch_id=batch_id)
+            try:
+                if profile.input_mode == "url":
+                    await uploads[index]
+                request = ImageProcessRequest(workflow_name=name, image=images[index])
+                data = await submit_runpod_job(request, profile, input_urls[index])
+            except BaseException:
+                tracer.finish()
+                raise
+        # Track the job once its row and input are saved; if either failed it is cancelled below
+        try:
+            request_ids = await insert
+            await uploads[index]
+        except Exception:
+            return data
+        job_id = data["id"]
+        tracer.bind(request_id=request_ids[position])
+        IMAGE_JOBS_SUBMITTED.inc(workflow=name)
+        JobTracker.set_job(job_id, JobStatus.PROCESSING)
+        eta_estimator.job_submitted(job_id, name)
+        asyncio.create_task(JobTracker.poll_job_status(job_id, workflow_id=name))
+        try:
+            await status_writer.write("submitted", request_ids[position], runpod_job_id=job_id,
+                                      endpoint_id=data["endpoint_id"],
+                                      ingest_ms=int((time.perf_counter() - started) * 1000))
+        except Exception as e:
+            logger.error("Recording batch %s failed: %s", batch_id, e)
+        return data
+
+    with PIPELINE_STAGE_SECONDS.time("ingest_batch", stage="ingest_batch"):
+        results = await asyncio.gather(*(submit(position, index, name) for position, (index, name) in enumerate(pairs)),
+                                       return_exceptions=True)
+        request_ids, *upload_results = await asyncio.gather(insert, *uploads, return_exceptions=True)
+
+    if isinstance(request_ids, BaseException):
+        # Nothing to report progress against: undo everything
+        logger.error("Failed to insert batch %s: %s", batch_id, request_ids)
+        await asyncio.gather(*(JobTracker.cancel_job(result["id"], "Failed to save batch", result.get("endpoint_id"))
+                               for result in results if not isinstance(result, BaseException) and result.get("id")),
+                             *(delete_image(f"uploads/{filename}") for filename, upload
+                               in zip(filenames, upload_results) if not isinstance(upload, BaseException)),
+                             return_exceptions=True)
+        raise HTTPException(500, "Failed to save batch")
+
+    # Submitted items were recorded as their submissions returned; fail the rest together.
+    # JobTracker.cancel_job also tells the finish listeners, which counted the job when it was submitted
+    items, writes = [], []
+    for position, ((index, name), request_id, data) in enumerate(zip(pairs, request_ids, results)):
+        error = upload_results[index] if isinstance(upload_results[index], BaseException) else None
+        if isinstance(data, BaseException):
+            error = data
+        if error is not None:
+            if not isinstance(data, BaseException) and data.get("id"):
+                writes.append(JobTracker.cancel_job(data["id"], str(error), data.get("endpoint_id")))
+            writes.append(status_writer.write("failed", request_id))
+            items.append(BatchItemResponse(index=position, workflow_name=name, request_id=request_id,
+                                           status="failed", error=str(error)))
+            continue
+        items.append(BatchItemResponse(index=position, workflow_name=name, request_id=request_id,
+                                       job_id=data["id"], status="submitted"))
+    for outcome in await asyncio.gather(*writes, return_exceptions=True):
+        if isinstance(outcome, BaseException):
+            logger.error("Recording batch %s failed: %s", batch_id, outcome)
+    return batch_response(batch_id, items)
+
+
+@router.get("/batches/{batch_id}", response_model=BatchResponse)
+async def get_batch_status(batch_id: str):
+    """Progress of every job in a batch, read with one query"""
+
+    def load():
+        db = SessionLocal()
+        try:
+            return runpod_repo.get_batch_requests(db, batch_id)
+        finally:
+            db.close()
 
-    return data
+    rows = await asyncio.to_thread(load)
+    if not rows:
+        raise HTTPException(404, "Batch not found")
+    return batch_response(batch_id, [
+        BatchItemResponse(index=row.batch_index, workflow_name=row.workflow_id, request_id=row.id,
+                          job_id=row.runpod_job_id, status=row.status, image_url=row.output_image_url)
+        for row in rows
+    ])
 
 
 @router.get("/job-status/{job_id}")
@@ -197,101 +530,156 @@ async def get_job_status(job_id: str):
     if not job_id:
         raise HTTPException(400, "Job ID is required")
 
-    # Check local cache
-    cached_job = JobTracker.get_job(job_id)
-    if cached_job:
-        return cached_job
-
-    # Check RunPod status
-    api_url = f"https://api.runpod.ai/v2/{settings.RUNPOD_ENDPOINT_ID}/status/{job_id}"
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                api_url,
-                headers={"Authorization": f"Bearer {settings.RUNPOD_API_KEY}"})
-            data = response.json()
-        except Exception as e:
-            raise HTTPException(500, f"Failed to get job status: {str(e)}")
+    # Memory, then our database, then RunPod for jobs still in flight
+    try:
+        result = await job_status_resolver.resolve(job_id)
+    except Exception as e:
+        raise HTTPException(500, f"Failed to get job status: {str(e)}")
+    if result.status.upper() not in TERMINAL_STATUSES:
+        result = result.model_copy(update=eta_estimator.estimate(job_id))
+    return result
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=JobStatusResponse)
+async def cancel_job(job_id: str,
+                     db: Session = Depends(get_db),
+                     current_user: Optional[User] = Depends(
+                         get_optional_current_user)):
+    """Cancel an in-flight job, e.g. when the client navigates away"""
+    db_request = runpod_repo.get_request_by_job_id(db, job_id)
+    if not db_request:
+        raise HTTPException(404, "Job not found")
 
-    if data["status"] == "COMPLETED":
-        return await handle_completed_job(data)
-    elif data["status"] == "FAILED":
-        JobTracker.set_job(job_id,
-                           JobStatus.FAILED,
-                           error=data.get("error", "Unknown error"))
+    # Jobs owned by a user can only be cancelled by that user; anonymous
+    # jobs are cancellable by whoever holds the job ID
+    if db_request.user_id and (current_user is None
+                               or current_user.id != db_request.user_id):
+        raise HTTPException(403, "Not allowed to cancel this job")
 
-    # Get cached URL if available
-    cached_job = JobTracker.get_job(job_id)
-    image_url = None
-    if cached_job and hasattr(cached_job, 'image_url'):
-        image_url = cached_job.image_url
+    if db_request.status not in ACTIVE_REQUEST_STATUSES:
+        raise HTTPException(409, f"Job already {db_request.status}")
 
+    await JobTracker.cancel_job(
+        job_id, "Cancelled by client", db_request.endpoint_id
+        or workflow_registry.endpoint_for(db_request.workflow_id))
     return JobStatusResponse(job_id=job_id,
-                             status=data["status"],
-                             output=data.get("output"),
-                             error=data.get("error"),
-                             image_url=image_url)
+                             status="CANCELLED",
+                             message="Job cancelled")
+
+
+@router.get("/jobs/{job_id}/timeline")
+async def get_job_timeline(job_id: str,
+                           format: str = Query("timeline", pattern="^(timeline|otlp)$"),
+                           db: Session = Depends(get_db),
+                           current_user: User = Depends(get_current_admin_user)):
+    """Where a job's time went: spans from upload to completion, or the same as OTLP/JSON"""
+    spans = tracer.spans_for_job(job_id)
+    if spans is None:
+        # Evicted from the ring buffer; fall back to persisted spans
+        rows = await asyncio.to_thread(traces_repo.get_spans_for_job, db, job_id)
+        spans = [{
+            "span_id": row.span_id,
+            "trace_id": row.trace_id,
+            "parent_span_id": row.parent_span_id,
+            "job_id": row.job_id,
+            "request_id": row.request_id,
+            "name": row.name,
+            "start_time_ns": row.start_time_ns,
+            "end_time_ns": row.end_time_ns,
+            "attributes": json.loads(row.attributes or "{}"),
+        } for row in rows]
+    if not spans:
+        raise HTTPException(404, "No trace recorded for this job")
+    return to_otlp(spans) if format == "otlp" else timeline(spans)
 
 
 @router.get("/webhook/runpod", operation_id="runpod_webhook_get")
 @router.post("/webhook/runpod", operation_id="runpod_webhook_post")
 async def runpod_webhook(request: Request, db: Session = Depends(get_db)):
-    # Log request details
-    print("\n=== RunPod Webhook Request ===")
-    print(f"Method: {request.method}")
-    print(f"Headers: {dict(request.headers)}")
-    print(f"Query Params: {dict(request.query_params)}")
-
-    try:
-        # Try to get body for both GET and POST
-        body = await request.body()
-        print(f"Raw Body: {body.decode()}")
-    except Exception as e:
-        print(f"Body read error: {str(e)}")
+    received = time.perf_counter()
 
     # Parse data based on request method
     try:
-        data = await request.json(
-        ) if request.method == "POST" else request.query_params
-        print(f"Parsed Data: {data}")
+        data = await read_webhook_body(request) if request.method == "POST" else request.query_params
     except Exception as e:
-        print(f"Data parse error: {str(e)}")
+        logger.warning("RunPod webhook body could not be parsed: %s", e)
         raise HTTPException(400, f"Invalid request data: {str(e)}")
 
+    try:
+        return await apply_webhook(request, data, db, received)
+    finally:
+        # handle_completed_job consumes the decoded image; anything left was never used
+        for image in streamed_images(data):
+            image.discard()
+
+
+async def read_webhook_body(request: Request):
+    """Parse a webhook body, decoding the output image to a file as the body arrives"""
+    if not settings.STREAM_DECODE_OUTPUTS:
+        return await request.json()
+    parser = output_parser()
+    try:
+        async for chunk in request.stream():
+            parser.feed(chunk)
+    except BaseException:
+        parser.abort()
+        raise
+    return parser.close()
+
+
+async def apply_webhook(request: Request, data, db: Session, received: float):
+    if logger.isEnabledFor(logging.DEBUG):
+        # Payloads carry multi-MB images; the formatter collapses them
+        logger.debug("RunPod webhook %s",
+                     request.method,
+                     extra={"headers": dict(request.headers), "payload": dict(data)})
+
     job_id = data.get("id")
     if not job_id:
         raise HTTPException(400, "Job ID is required")
+    logger.info("RunPod webhook for job %s: %s", job_id, data.get("status"))
 
-    # Get database record
-    db_request = runpod_repo.get_request_by_job_id(db, job_id)
+    # Get database record. The lookup runs off the loop and the session is
+    # released straight away: a burst of webhooks would otherwise block the
+    # loop waiting for pool connections that only the loop can give back.
+    db_request = await asyncio.to_thread(runpod_repo.get_request_by_job_id, db, job_id)
+    db.close()
     if not db_request:
-        print(f"Warning: No database record found for job {job_id}")
+        logger.warning("No database record found for job %s", job_id)
         return {"success": False, "error": "No database record found"}
 
-    # Check for duplicate completion
+    # Check for duplicate completion. The tracker says completed before the row is
+    # committed, so a retry after a failed write is let through
     cached_job = JobTracker.get_job(job_id)
-    if cached_job and cached_job.status == JobStatus.COMPLETED:
+    if cached_job and cached_job.status == JobStatus.COMPLETED and db_request.status == "completed":
         return {"success": True}
 
+    if data["status"] in TERMINAL_STATUSES:
+        runpod_service.notify_job_finished(job_id, data)
+
     if data["status"] == "COMPLETED":
-        job_response: JobStatusResponse = await handle_completed_job(data)
-        if db_request:
-            runpod_repo.update_request_status(
-                db,
-                request_id=db_request.id,
-                status="completed",
-                output_url=job_response.image_url)
-            print(
-                f"[runpod_webhook] Updated request {db_request.id} with URL: {job_response.image_url}"
-            )
+        with tracer.activate(job_id), tracer.span("completion", detected_by="webhook"):
+            completion_started = time.perf_counter()
+            job_response: JobStatusResponse = await handle_completed_job(data)
+            if db_request:
+                with tracer.span("completion.db_update"):
+                    await status_writer.write("completed",
+                                              job_id,
+                                              by_job_id=True,
+                                              output_url=job_response.image_url,
+                                              completion_ms=int((time.perf_counter() - completion_started) * 1000),
+                                              **job_timings(data))
+                WEBHOOK_DB_LAG_SECONDS.observe(time.perf_counter() - received)
+                logger.info("Updated request %s with URL %s", db_request.id, job_response.image_url)
+        tracer.finish(job_id)
         return job_response
-    elif data["status"] == "FAILED":
-        error = data.get("error", "Unknown error")
+    elif data["status"] in FAILED_STATUSES:
+        error = job_error(data)
         JobTracker.set_job(job_id, JobStatus.FAILED, error=error)
         if db_request:
-            runpod_repo.update_request_status(db,
-                                              request_id=db_request.id,
-                                              status="failed")
+            await status_writer.write("failed", job_id, by_job_id=True, **job_timings(data))
+            WEBHOOK_DB_LAG_SECONDS.observe(time.perf_counter() - received)
+        tracer.finish(job_id)
 
     return {"success": True}
 
@@ -302,7 +690,8 @@ async def get_stored_image(filename: str):
     try:
         storage = Client()
         object_path = f"uploads/{filename}"
-        image_data = storage.download_as_bytes(object_path)
+        with STORAGE_SECONDS.time("storage_download", operation="download"):
+            image_data = storage.download_as_bytes(object_path)
 
         return Response(content=image_data, media_type="image/png")
     except Exception as e:
@@ -315,42 +704,79 @@ async def get_stored_image(filename: str):
     try:
         storage = Client()
         object_path = f"processed/{filename}"
-        image_data = storage.download_as_bytes(object_path)
+        with STORAGE_SECONDS.time("storage_download", operation="download"):
+            image_data = storage.download_as_bytes(object_path)
 
         return Response(content=image_data, media_type="image/png")
     except Exception as e:
         raise HTTPException(status_code=404, detail="Image not found")
 
 
+def output_image_url(output_data: dict) -> Optional[str]:
+    """URL of an output the worker uploaded itself, if it sent one instead of base64"""
+    images = output_data.get("images") or [{}]
+    for value in (output_data.get("image_url"), output_data.get("output_image"),
+                  images[0].get("url"), images[0].get("image_url"), images[0].get("image")):
+        if isinstance(value, str) and value.startswith(("http://", "https://")):
+            return value
+    return None
+
+
 async def handle_completed_job(data: dict) -> JobStatusResponse:
+    started = time.perf_counter()
     job_id = data.get("id", str(int(datetime.now().timestamp())))
     output_data = data.get("output", {})
 
     # Extract output image from various formats
-    output_image = (output_data.get("output_image")
-                    or (output_data.get("images", [{}])[0].get("image"))
-                    or output_data.get("message"))
-
-    if output_image:
-        if not output_image.startswith("data:image/"):
-            output_image = f"data:image/png;base64,{output_image}"
+    output_url = output_image_url(output_data)
+    output_image = None if output_url else (output_data.get("output_image")
+                                            or (output_data.get("images", [{}])[0].get("image"))
+                                            or output_data.get("message"))
+    streamed = isinstance(output_image, StreamedImage)
 
     try:
-        timestamp = int(datetime.now().timestamp())
-        output_filename = f"{timestamp}.png"
-        await save_base64_image(output_image, "processed", output_filename)
-        base_url = settings.BASE_URL.rstrip('/')
-        # Use BASE_URL for API endpoint as it serves the images
-        image_url = f"{base_url}/api/images/processed/{output_filename}"
-        print(f"[handle_completed_job] Constructed image URL: {image_url}")
+        # Named after the job: timestamps collide when jobs finish in the same second
+        output_filename = f"{job_id}.png"
+        with PIPELINE_STAGE_SECONDS.time("save_output", stage="save_output"):
+            if output_url and settings.OUTPUT_URL_MODE == "record":
+                # Clients load recorded URLs, so they pass the same checks as a copy's fetch
+                await check_output_url(output_url)
+                # Served straight from the worker's bucket; nothing is copied
+                image_url = output_url
+            else:
+                if output_url:
+                    await save_image_from_url(output_url, "processed", output_filename)
+                elif streamed:
+                    await save_image_file(output_image.path, "processed", output_filename)
+                else:
+                    await save_base64_image(output_image, "processed", output_filename)
+                base_url = settings.BASE_URL.rstrip('/')
+                # Use BASE_URL for API endpoint as it serves the images
+                image_url = f"{base_url}/api/images/processed/{output_filename}"
+        logger.debug("Saved output for job %s at %s", job_id, image_url)
     except Exception as e:
-        print(f"[Storage] Failed to save output image: {e}")
+        logger.error("Failed to save output image for job %s: %s", job_id, e)
         image_url = None
 
+    if streamed:
+        # Responses carry the image inline whether or not it was streamed to a file
+        image_file = output_image
+        output_image = await executor.run_codec(read_data_url, image_file.path)
+        image_file.discard()
+        if image_file.prefix:
+            output_image = image_file.prefix + output_image[base64_start(output_image):]
+        # `output` gets the value as the worker sent it
+        output_data = replace_streamed(output_data, output_image if image_file.prefix
+                                       else output_image[base64_start(output_image):])
+    elif output_image:
+        output_image = await executor.run_codec(to_data_url, output_image)
+
     JobTracker.set_job(job_id,
                        JobStatus.COMPLETED,
                        output_image=output_image,
-                       image_url=image_url)
+                       image_url=image_url,
+                       output=output_data)
+    PIPELINE_STAGE_SECONDS.observe(time.perf_counter() - started, stage="handle_completed_job")
 
     return JobStatusResponse(job_id=job_id,
                              status="COMPLETED",
@@ -1,40 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from typing import List
 from app.models import Workflow
 from app.dependencies import get_current_active_user
+from app.services.workflow_registry import workflow_registry
 
 router = APIRouter()
 
-# Example workflows - in production these would come from a database
-WORKFLOWS = [
-    Workflow(
-        id="lastnurses_api",
-        name="lastnurses_api",
-        display_name="The Last Nurses",
-        description=
-        "See your workplace as the Post-apocalyptic world it already is.",
-    ),
-    Workflow(
-        id="nursefilter_v2",
-        name="nursefilter_v2",
-        display_name="Modern Nurse Filter",
-        description="Contemporary medical professional style",
-    )
-]
+
+def not_modified(request: Request, response: Response) -> bool:
+    """Set the registry ETag and report whether the client already has it"""
+    etag = workflow_registry.current_etag()
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    return request.headers.get("if-none-match") == etag
 
 
 @router.get("/list", response_model=List[Workflow])
-async def list_workflows(current_user=Depends(get_current_active_user)):
+async def list_workflows(request: Request,
+                         response: Response,
+                         current_user=Depends(get_current_active_user)):
     """List all available workflows"""
-    return WORKFLOWS
+    if not_modified(request, response):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED,
+                        headers=dict(response.headers))
+    return workflow_registry.list()
 
 
 @router.get("/{workflow_id}", response_model=Workflow)
 async def get_workflow(workflow_id: str,
+                       request: Request,
+                       response: Response,
                        current_user=Depends(get_current_active_user)):
     """Get workflow details by ID"""
-    workflow = next((w for w in WORKFLOWS if w.id == workflow_id), None)
+    workflow = workflow_registry.get(workflow_id)
     if not workflow:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail="Workflow not found")
+    if not_modified(request, response):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED,
+                        headers=dict(response.headers))
     return workflow
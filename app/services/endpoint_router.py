@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.config import settings
+from app.services.runpod_service import runpod_service
+
+logger = logging.getLogger(__name__)
+
+# Assumed job latency (seconds) before any endpoint has been observed
+DEFAULT_LATENCY = 30.0
+
+
+class EndpointStats:
+
+    def __init__(self):
+        self.latency: Optional[float] = None  # EWMA of execution seconds
+        self.error_rate = 0.0  # EWMA of failed submissions and jobs
+        self.consecutive_failures = 0
+        self.degraded_until = 0.0
+        self.in_queue = 0  # From the health API
+        self.in_progress = 0  # From the health API
+        self.workers = 0  # Idle + running workers, from the health API
+        self.in_flight = 0  # Jobs we sent that have not finished
+
+
+class EndpointRouter:
+    """Picks the RunPod endpoint in a workflow's pool that should finish a job soonest.
+
+    Endpoints are scored from their queue depth and worker count (RunPod health
+    API), recent job latency and error rate. An endpoint that keeps failing is
+    treated as degraded for a cooldown and only used when nothing else is left.
+    """
+
+    def __init__(self, alpha: float = 0.2,
+                 failure_threshold: int = settings.ENDPOINT_FAILURE_THRESHOLD,
+                 cooldown: float = settings.ENDPOINT_COOLDOWN):
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.stats: Dict[str, EndpointStats] = {}
+        # job_id -> (endpoint_id, submitted at)
+        self._jobs: Dict[str, Tuple[str, float]] = {}
+
+    def _stats(self, endpoint_id: str) -> EndpointStats:
+        if endpoint_id not in self.stats:
+            self.stats[endpoint_id] = EndpointStats()
+        return self.stats[endpoint_id]
+
+    def score(self, endpoint_id: str) -> float:
+        """Expected seconds until a new job on this endpoint finishes; lower is better"""
+        stats = self._stats(endpoint_id)
+        latency = stats.latency if stats.latency is not None else self._typical_latency()
+        load = stats.in_queue + stats.in_progress + stats.in_flight
+        queue_factor = 1 + load / max(stats.workers, 1)
+        return latency * queue_factor * (1 + 4 * stats.error_rate)
+
+    def _typical_latency(self) -> float:
+        # Unobserved endpoints are assumed to be as fast as the ones we know
+        known = [s.latency for s in self.stats.values() if s.latency is not None]
+        return sum(known) / len(known) if known else DEFAULT_LATENCY
+
+    def is_degraded(self, endpoint_id: str) -> bool:
+        return self._stats(endpoint_id).degraded_until > time.monotonic()
+
+    def ranked(self, pool: Iterable[str]) -> List[str]:
+        """Endpoints in `pool`, best first, with degraded ones last"""
+        return sorted(pool, key=lambda e: (self.is_degraded(e), self.score(e)))
+
+    def choose(self, pool: Iterable[str]) -> str:
+        return self.ranked(pool)[0]
+
+    def _record(self, endpoint_id: str, ok: bool):
+        stats = self._stats(endpoint_id)
+        stats.error_rate += self.alpha * ((0.0 if ok else 1.0) - stats.error_rate)
+        if ok:
+            stats.consecutive_failures = 0
+            return
+        stats.consecutive_failures += 1
+        if stats.consecutive_failures >= self.failure_threshold or stats.error_rate > 0.5:
+            if not self.is_degraded(endpoint_id):
+                logger.warning("Endpoint %s degraded, failing over for %ss", endpoint_id, self.cooldown)
+            stats.degraded_until = time.monotonic() + self.cooldown
+
+    def submit_failed(self, endpoint_id: str):
+        self._record(endpoint_id, ok=False)
+
+    def job_submitted(self, job_id: str, endpoint_id: str):
+        self._record(endpoint_id, ok=True)
+        self._stats(endpoint_id).in_flight += 1
+        self._jobs[job_id] = (endpoint_id, time.monotonic())
+
+    def job_finished(self, job_id: str, data: dict):
+        """RunPodService finish listener"""
+        entry = self._jobs.pop(job_id, None)
+        if entry is None:
+            return
+        endpoint_id, submitted_at = entry
+        stats = self._stats(endpoint_id)
+        stats.in_flight = max(0, stats.in_flight - 1)
+        if data.get("status") == "CANCELLED":
+            return
+        if data.get("status") == "COMPLETED":
+            # Prefer RunPod's own execution time; queueing is scored separately
+            if data.get("executionTime") is not None:
+                elapsed = data["executionTime"] / 1000
+            else:
+                elapsed = time.monotonic() - submitted_at
+            if stats.latency is None:
+                stats.latency = elapsed
+            else:
+                stats.latency += self.alpha * (elapsed - stats.latency)
+        self._record(endpoint_id, ok=data.get("status") == "COMPLETED")
+
+    def update_health(self, endpoint_id: str, health: dict):
+        stats = self._stats(endpoint_id)
+        jobs = health.get("jobs", {})
+        workers = health.get("workers", {})
+        stats.in_queue = jobs.get("inQueue", 0)
+        stats.in_progress = jobs.get("inProgress", 0)
+        stats.workers = workers.get("idle", 0) + workers.get("running", 0)
+        # Jobs RunPod reports are already counted; only keep what it has not seen
+        stats.in_flight = 0
+
+    async def refresh_health(self, endpoint_ids: Iterable[str]):
+        async def refresh(endpoint_id):
+            try:
+                self.update_health(endpoint_id, await runpod_service.health(endpoint_id))
+            except Exception as e:
+                logger.warning("Health check for %s failed: %s", endpoint_id, e)
+                self._record(endpoint_id, ok=False)
+
+        await asyncio.gather(*(refresh(e) for e in set(endpoint_ids)))
+
+    async def run(self):
+        """Refresh health for every endpoint any workflow can route to"""
+        from app.services.workflow_registry import workflow_registry
+
+        while True:
+            endpoint_ids = [e for w in workflow_registry.list()
+                            for e in workflow_registry.endpoints_for(w.id)]
+            if len(set(endpoint_ids)) > 1:
+                await self.refresh_health(endpoint_ids)
+            await asyncio.sleep(settings.ENDPOINT_HEALTH_INTERVAL)
+
+
+endpoint_router = EndpointRouter()
+runpod_service.finish_listeners.append(endpoint_router.job_finished)
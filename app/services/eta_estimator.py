@@ -0,0 +1,109 @@
+import logging
+import statistics
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, Optional, Tuple
+
+from app.config import settings
+from app.database import SessionLocal
+from app.repository import runpod as runpod_repo
+from app.services.runpod_service import runpod_service
+
+logger = logging.getLogger(__name__)
+
+# Bounds on the suggested delay before a client polls again, in seconds
+MIN_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 30
+
+
+class EtaEstimator:
+    """Estimates when an in-flight job will finish.
+
+    Keeps a rolling window of recent queue-wait and execution times per
+    workflow, seeded from completed runpod_requests at startup and fed by
+    finished jobs afterwards. A job's expected queue wait is the larger of the
+    typical wait and the time for the workers to get through the jobs of its
+    workflow submitted before it.
+    """
+
+    def __init__(self, window: int = settings.ETA_WINDOW):
+        self.window = window
+        # workflow_id -> recent (delay seconds, execution seconds)
+        self.samples: Dict[str, Deque[Tuple[float, float]]] = {}
+        # job_id -> (workflow_id, monotonic submit time)
+        self._in_flight: Dict[str, Tuple[str, float]] = {}
+
+    def _add_sample(self, workflow_id: str, delay: float, execution: float):
+        if workflow_id not in self.samples:
+            self.samples[workflow_id] = deque(maxlen=self.window)
+        self.samples[workflow_id].append((delay, execution))
+
+    def seed(self):
+        db = SessionLocal()
+        try:
+            rows = runpod_repo.get_recent_job_timings(db, self.window * 20)
+        finally:
+            db.close()
+        # Oldest first, so the newest samples survive the window
+        for workflow_id, delay_ms, execution_ms in reversed(rows):
+            self._add_sample(workflow_id, (delay_ms or 0) / 1000, execution_ms / 1000)
+        logger.info("Seeded %d samples for %d workflows", len(rows), len(self.samples))
+
+    def job_submitted(self, job_id: str, workflow_id: str):
+        self._in_flight[job_id] = (workflow_id, time.monotonic())
+
+    def job_finished(self, job_id: str, data: dict):
+        """RunPodService finish listener"""
+        entry = self._in_flight.pop(job_id, None)
+        if entry is None or data.get("status") != "COMPLETED" or data.get("executionTime") is None:
+            return
+        self._add_sample(entry[0], (data.get("delayTime") or 0) / 1000, data["executionTime"] / 1000)
+
+    def _typical(self, workflow_id: str) -> Optional[Tuple[float, float]]:
+        samples = self.samples.get(workflow_id)
+        if not samples:
+            # Unseen workflow; fall back to everything we have
+            samples = [s for recent in self.samples.values() for s in recent]
+        if not samples:
+            return None
+        return (statistics.median(d for d, _ in samples),
+                statistics.median(e for _, e in samples))
+
+    def _workers(self, workflow_id: str) -> int:
+        from app.services.endpoint_router import endpoint_router
+        from app.services.workflow_registry import workflow_registry
+
+        workers = sum(endpoint_router.stats[e].workers
+                      for e in workflow_registry.endpoints_for(workflow_id)
+                      if e in endpoint_router.stats)
+        return max(workers, 1)
+
+    def remaining(self, job_id: str) -> Optional[float]:
+        """Expected seconds until `job_id` finishes, or None if we can't tell"""
+        entry = self._in_flight.get(job_id)
+        if entry is None:
+            return None
+        workflow_id, submitted_at = entry
+        typical = self._typical(workflow_id)
+        if typical is None:
+            return None
+        delay, execution = typical
+        ahead = sum(1 for w, t in self._in_flight.values() if w == workflow_id and t < submitted_at)
+        queue_wait = max(delay, ahead * execution / self._workers(workflow_id))
+        elapsed = time.monotonic() - submitted_at
+        return max(queue_wait + execution - elapsed, 0.0)
+
+    def estimate(self, job_id: str) -> Dict:
+        """`estimated_completion` and `retry_after` fields for a status response"""
+        remaining = self.remaining(job_id)
+        if remaining is None:
+            return {}
+        return {
+            "estimated_completion": datetime.utcnow() + timedelta(seconds=remaining),
+            "retry_after": int(min(max(remaining, MIN_RETRY_AFTER), MAX_RETRY_AFTER)),
+        }
+
+
+eta_estimator = EtaEstimator()
+runpod_service.finish_listeners.append(eta_estimator.job_finished)
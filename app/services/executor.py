@@ -0,0 +1,83 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional, TypeVar
+
+from app.config import settings
+from app.utils.metrics import EXECUTOR_SECONDS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class CPUExecutor:
+    """Pools for CPU-bound work that would otherwise stall the event loop.
+
+    Base64 and other codec calls go to a thread pool: arguments and results
+    are handed over by reference, and the codecs in image_utils work in
+    slices so the loop thread gets the GIL between them. Pillow goes to a
+    process pool, so only send it small inputs such as an image header.
+    Both pools start on first use.
+    """
+
+    def __init__(self, codec_threads: int = settings.CODEC_THREADS,
+                 image_processes: int = settings.IMAGE_PROCESSES):
+        self.codec_threads = codec_threads
+        self.image_processes = image_processes
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def threads(self) -> ThreadPoolExecutor:
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self.codec_threads, thread_name_prefix="codec")
+        return self._threads
+
+    @property
+    def processes(self) -> Executor:
+        if self.image_processes <= 0:
+            return self.threads
+        if self._processes is None:
+            # Not fork: the parent has running threads (logging, codec pool) that a fork would copy mid-state
+            self._processes = ProcessPoolExecutor(max_workers=self.image_processes,
+                                                  mp_context=multiprocessing.get_context("spawn"))
+        return self._processes
+
+    async def run_codec(self, fn: Callable[..., T], *args) -> T:
+        """Run a codec call (base64, data URLs) in the thread pool"""
+        with EXECUTOR_SECONDS.time(pool="threads"):
+            return await asyncio.get_running_loop().run_in_executor(self.threads, functools.partial(fn, *args))
+
+    async def run_image(self, fn: Callable[..., T], *args) -> T:
+        """Run Pillow work in the process pool; `fn` and its arguments must pickle"""
+        pool = self.processes
+        with EXECUTOR_SECONDS.time(pool="processes"):
+            try:
+                return await asyncio.get_running_loop().run_in_executor(pool, functools.partial(fn, *args))
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed); start a fresh pool for the next call
+                logger.error("Image process pool broke; restarting it")
+                if pool is self._processes:
+                    self._processes = None
+                    pool.shutdown(wait=False, cancel_futures=True)
+                raise
+
+    async def start(self):
+        """Spawn the image processes now rather than on the first request"""
+        if self.image_processes > 0:
+            await asyncio.gather(*(self.run_image(int) for _ in range(self.image_processes)))
+
+    def shutdown(self):
+        if self._threads is not None:
+            self._threads.shutdown(wait=False, cancel_futures=True)
+            self._threads = None
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+            self._processes = None
+
+
+executor = CPUExecutor()
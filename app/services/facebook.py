@@ -1,9 +1,12 @@
 import httpx
+import logging
 from typing import Optional, Dict, Any
 from fastapi import HTTPException, status
 from app.config import settings
 from urllib.parse import quote
 
+logger = logging.getLogger(__name__)
+
 
 class FacebookService:
 
@@ -22,7 +25,7 @@ class FacebookService:
     async def exchange_code_for_token(self,
                                       code: str) -> Optional[Dict[str, Any]]:
         """Exchange the authorization code for an access token using Facebook Graph API"""
-        print(f"[Facebook] Exchanging code for access token...")
+        logger.debug("Exchanging code for access token")
         async with httpx.AsyncClient() as client:
             url = f"https://graph.facebook.com/{self.api_version}/oauth/access_token"
             params = {
@@ -31,38 +34,35 @@ class FacebookService:
                 "redirect_uri": self.redirect_uri,  # Prevent double encoding
                 "code": code
             }
-            print(f"[Facebook] Making request to: {url}")
-            print(f"[Facebook] With params: {params}")
+            # The authorization code is a credential until it is exchanged
+            logger.debug("Token request to %s", url,
+                         extra={"params": {**params, "code": "<redacted>"}})
 
             response = await client.get(url, params=params)
 
             if response.status_code != 200:
-                print(
-                    f"[Facebook] Token exchange failed with status {response.status_code}"
-                )
-                print(f"[Facebook] Error response: {response.text}")
+                logger.warning("Token exchange failed with status %s: %s",
+                               response.status_code, response.text)
                 return None
 
             token_data = response.json()
-            print("[Facebook] Token response data:", token_data)
-            print("[Facebook] Successfully obtained access token")
+            logger.debug("Obtained access token")
 
             # Get long-lived token
             long_lived_token = await self.get_long_lived_token(
                 token_data.get("access_token"))
             if long_lived_token:
-                print("[Facebook] Successfully exchanged for long-lived token")
+                logger.debug("Exchanged for long-lived token")
                 token_data["access_token"] = long_lived_token
             else:
-                print("[Facebook] Failed to obtain long-lived token")
+                logger.warning("Failed to obtain long-lived token")
 
             return token_data
 
     async def get_long_lived_token(self,
                                    short_lived_token: str) -> Optional[str]:
         """Exchange a short-lived token for a long-lived token using Facebook Graph API"""
-        print(
-            "[Facebook] Exchanging short-lived token for long-lived token...")
+        logger.debug("Exchanging short-lived token for long-lived token")
         async with httpx.AsyncClient() as client:
             url = f"https://graph.facebook.com/{self.api_version}/oauth/access_token"
             params = {
@@ -71,21 +71,15 @@ class FacebookService:
                 "client_secret": self.client_secret,
                 "fb_exchange_token": short_lived_token
             }
-            print(f"[Facebook] Making request to: {url}")
-
             response = await client.get(url, params=params)
 
             if response.status_code != 200:
-                print(
-                    f"[Facebook] Long-lived token exchange failed with status {response.status_code}"
-                )
-                print(f"[Facebook] Error response: {response.text}")
+                logger.warning("Long-lived token exchange failed with status %s: %s",
+                               response.status_code, response.text)
                 return None
 
             data = response.json()
-            print(
-                f"[Facebook] Long-lived token exchange successful. Expires in: {data.get('expires_in')} seconds"
-            )
+            logger.debug("Long-lived token expires in %s seconds", data.get("expires_in"))
             return data.get("access_token")
 
     async def get_user_profile(self,
@@ -101,9 +95,7 @@ class FacebookService:
                 })
 
             if profile_response.status_code != 200:
-                print(
-                    f"[Facebook] Failed to get profile: {profile_response.text}"
-                )
+                logger.warning("Failed to get profile: %s", profile_response.text)
                 return None
 
             return profile_response.json()
@@ -0,0 +1,127 @@
+import asyncio
+import time
+from typing import Dict, Tuple
+
+from app.config import settings
+from app.database import SessionLocal
+from app.repository import runpod as runpod_repo
+from app.services.job_tracker import JobTracker, JobStatus
+from app.services.runpod_service import FAILED_STATUSES, TERMINAL_STATUSES, job_error, job_timings, runpod_service
+from app.services.status_writer import status_writer
+from app.services.workflow_registry import workflow_registry
+from app.services.tracing import tracer
+from app.utils.json_stream import streamed_images
+
+
+class JobStatusResolver:
+    """Answers job-status lookups from the cheapest tier that knows the answer.
+
+    Tiers are the in-process JobTracker cache, the runpod_requests row for the
+    job, and finally RunPod's status API for jobs the database does not have
+    as finished. Concurrent lookups of one job share a single resolution.
+    """
+
+    def __init__(self, recent_ttl: float = settings.JOB_STATUS_CACHE_TTL):
+        self.recent_ttl = recent_ttl
+        self.tier_counts = {"memory": 0, "database": 0, "runpod": 0, "coalesced": 0}
+        # job_id -> (expires_at, response) for non-terminal RunPod answers
+        self._recent: Dict[str, Tuple[float, object]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def resolve(self, job_id: str):
+        cached_job = JobTracker.get_job(job_id)
+        if cached_job:
+            self.tier_counts["memory"] += 1
+            return cached_job
+
+        recent = self._recent.get(job_id)
+        if recent and recent[0] > time.monotonic():
+            self.tier_counts["memory"] += 1
+            return recent[1]
+
+        inflight = self._inflight.get(job_id)
+        if inflight is None:
+            inflight = asyncio.ensure_future(self._resolve_uncached(job_id))
+            self._inflight[job_id] = inflight
+            inflight.add_done_callback(lambda _: self._inflight.pop(job_id, None))
+        else:
+            self.tier_counts["coalesced"] += 1
+        return await asyncio.shield(inflight)
+
+    async def _resolve_uncached(self, job_id: str):
+        from app.routers.images import JobStatusResponse
+
+        db = SessionLocal()
+        try:
+            db_request = await asyncio.to_thread(runpod_repo.get_request_by_job_id, db, job_id)
+        finally:
+            db.close()
+
+        if db_request and db_request.status == "completed" and db_request.output_image_url:
+            self.tier_counts["database"] += 1
+            JobTracker.set_job(job_id, JobStatus.COMPLETED, image_url=db_request.output_image_url)
+            return JobStatusResponse(job_id=job_id,
+                                     status="COMPLETED",
+                                     image_url=db_request.output_image_url)
+        if db_request and db_request.status == "failed":
+            self.tier_counts["database"] += 1
+            JobTracker.set_job(job_id, JobStatus.FAILED, error="Job failed")
+            return JobStatusResponse(job_id=job_id, status="FAILED", error="Job failed")
+
+        self.tier_counts["runpod"] += 1
+        endpoint_id = None
+        if db_request:
+            endpoint_id = db_request.endpoint_id or workflow_registry.endpoint_for(db_request.workflow_id)
+        data = await runpod_service.check_job_status(job_id, endpoint_id,
+                                                     stream_output=settings.STREAM_DECODE_OUTPUTS)
+        try:
+            return await self._apply_status(job_id, data, db_request)
+        finally:
+            for image in streamed_images(data):
+                image.discard()
+
+    async def _apply_status(self, job_id: str, data: dict, db_request):
+        """Record a status answer fetched from RunPod and build the response"""
+        from app.routers.images import JobStatusResponse, handle_completed_job
+
+        if data["status"] in TERMINAL_STATUSES:
+            # A client poll can see completion before the webhook or poller, which then stand down
+            runpod_service.notify_job_finished(job_id, data)
+
+        if data["status"] == "COMPLETED":
+            with tracer.activate(job_id), tracer.span("completion", detected_by="status_lookup"):
+                completion_started = time.perf_counter()
+                job_response = await handle_completed_job(data)
+                if db_request:
+                    with tracer.span("completion.db_update"):
+                        await status_writer.write("completed",
+                                                  job_id,
+                                                  by_job_id=True,
+                                                  output_url=job_response.image_url,
+                                                  completion_ms=int((time.perf_counter() - completion_started) * 1000),
+                                                  **job_timings(data))
+            tracer.finish(job_id)
+            return job_response
+        elif data["status"] in FAILED_STATUSES:
+            error = job_error(data)
+            JobTracker.set_job(job_id, JobStatus.FAILED, error=error)
+            if db_request:
+                await status_writer.write("failed", job_id, by_job_id=True, **job_timings(data))
+            tracer.finish(job_id)
+            return JobStatusResponse(job_id=job_id, status="FAILED", error=error)
+
+        response = JobStatusResponse(job_id=job_id,
+                                     status=data["status"],
+                                     output=data.get("output"),
+                                     error=data.get("error"))
+        self._recent[job_id] = (time.monotonic() + self.recent_ttl, response)
+        self._prune_recent()
+        return response
+
+    def _prune_recent(self):
+        now = time.monotonic()
+        for job_id in [k for k, (expires, _) in self._recent.items() if expires <= now]:
+            del self._recent[job_id]
+
+
+job_status_resolver = JobStatusResolver()
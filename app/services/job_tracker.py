@@ -1,84 +1,186 @@
 
-from typing import Dict, Optional
-from datetime import datetime
+import logging
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
 import asyncio
-import httpx
+import time
 from pydantic import BaseModel
 from app.config import settings
+from app.services.status_writer import status_writer
+from app.services.runpod_service import FAILED_STATUSES, job_error, job_timings, runpod_service
+from app.services.workflow_registry import workflow_registry
+from app.services.tracing import tracer
+from app.utils.json_stream import streamed_images
+from app.utils.metrics import JOB_TRACKER_UPDATES, Gauge
+
+logger = logging.getLogger(__name__)
 
 class JobStatus:
     PROCESSING = "processing"
     COMPLETED = "completed"
     FAILED = "failed"
 
+def job_deadline(workflow_id: Optional[str], submitted_at: datetime) -> datetime:
+    """When a job submitted at `submitted_at` (UTC) should be given up on"""
+    timeout = workflow_registry.timeout_for(workflow_id)
+    return submitted_at + timedelta(seconds=timeout)
+
 class JobData(BaseModel):
     status: str
     output_image: Optional[str] = None
     image_url: Optional[str] = None
+    output: Optional[dict] = None
     error: Optional[str] = None
     timestamp: float
+    estimated_completion: Optional[datetime] = None
+    retry_after: Optional[int] = None
 
 class JobTracker:
     _jobs: Dict[str, JobData] = {}
+    # Callers waiting for a job's output to be stored (or for it to fail)
+    _waiters: Dict[str, List[asyncio.Future]] = {}
 
     @classmethod
     def get_job(cls, job_id: str) -> Optional[JobData]:
         return cls._jobs.get(job_id)
 
     @classmethod
-    def set_job(cls, job_id: str, status: str, output_image: Optional[str] = None, image_url: Optional[str] = None, error: Optional[str] = None):
+    def set_job(cls, job_id: str, status: str, output_image: Optional[str] = None, image_url: Optional[str] = None, error: Optional[str] = None,
+                output: Optional[dict] = None):
         cls._jobs[job_id] = JobData(
             status=status,
             output_image=output_image,
             image_url=image_url,
+            output=output,
             error=error,
             timestamp=datetime.now().timestamp()
         )
+        JOB_TRACKER_UPDATES.inc(status=status)
+        if status in (JobStatus.COMPLETED, JobStatus.FAILED):
+            for waiter in cls._waiters.pop(job_id, []):
+                if not waiter.done():
+                    waiter.set_result(cls._jobs[job_id])
         return cls._jobs[job_id]
 
     @classmethod
-    async def poll_job_status(cls, job_id: str):
+    async def wait_for_job(cls, job_id: str, timeout: float) -> Optional[JobData]:
+        """The job once the webhook or poller has finished handling it, or None after `timeout` seconds.
+
+        Unlike RunPodService.await_result, this resolves after the output is
+        stored, so the image URL is already known.
+        """
+        job = cls._jobs.get(job_id)
+        if job and job.status in (JobStatus.COMPLETED, JobStatus.FAILED):
+            return job
+        waiter = asyncio.get_running_loop().create_future()
+        cls._waiters.setdefault(job_id, []).append(waiter)
+        try:
+            return await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            waiters = cls._waiters.get(job_id)
+            if waiters and waiter in waiters:
+                waiters.remove(waiter)
+                if not waiters:
+                    del cls._waiters[job_id]
+
+    @classmethod
+    async def cancel_job(cls, job_id: str, reason: str, endpoint_id: Optional[str] = None):
+        """Cancel a job on RunPod and record it as failed"""
+        try:
+            await runpod_service.cancel_job(job_id, endpoint_id)
+        except Exception as e:
+            # Still fail it locally; RunPod will drop it at its own timeout
+            logger.warning("RunPod cancel for %s failed: %s", job_id, e)
+        cls.set_job(job_id, JobStatus.FAILED, error=reason)
+        runpod_service.notify_job_finished(job_id, {"id": job_id, "status": "CANCELLED", "error": reason})
+        await status_writer.write("failed", job_id, by_job_id=True)
+        tracer.finish(job_id)
+
+    @classmethod
+    async def poll_job_status(cls, job_id: str, workflow_id: Optional[str] = None, submitted_at: Optional[datetime] = None):
         """Poll RunPod API for job status updates"""
+        deadline = job_deadline(workflow_id, submitted_at or datetime.utcnow())
+        endpoint_id = workflow_registry.endpoint_for(workflow_id) if workflow_id else None
         while True:
             if job_id not in cls._jobs or cls._jobs[job_id].status in [JobStatus.COMPLETED, JobStatus.FAILED]:
                 break
+
+            if datetime.utcnow() >= deadline:
+                logger.info("Job %s passed its deadline, cancelling", job_id)
+                await cls.cancel_job(job_id, "Job timed out", endpoint_id)
+                break
+                
+            data = None
+            try:
+                data = await runpod_service.check_job_status(job_id, endpoint_id,
+                                                             stream_output=settings.STREAM_DECODE_OUTPUTS)
                 
-            api_url = f"https://api.runpod.ai/v2/{settings.RUNPOD_ENDPOINT_ID}/status/{job_id}"
-            async with httpx.AsyncClient() as client:
-                try:
-                    response = await client.get(
-                        api_url,
-                        headers={"Authorization": f"Bearer {settings.RUNPOD_API_KEY}"}
-                    )
-                    data = response.json()
+                if data["status"] == "COMPLETED":
+                    from app.routers.images import handle_completed_job
                     
-                    if data["status"] == "COMPLETED":
-                        from app.routers.images import handle_completed_job
-                        from app.database import SessionLocal
-                        from app.repository import runpod as runpod_repo
-                        
+                    runpod_service.notify_job_finished(job_id, data)
+                    with tracer.activate(job_id), tracer.span("completion", detected_by="poll"):
                         # Get full job response with image URL
+                        completion_started = time.perf_counter()
                         job_response = await handle_completed_job(data)
-                        
+
                         # Update database with proper image URL
-                        db = SessionLocal()
-                        try:
-                            db_request = runpod_repo.get_request_by_job_id(db, job_id)
-                            if db_request:
-                                runpod_repo.update_request_status(
-                                    db,
-                                    request_id=db_request.id,
-                                    status="completed",
-                                    output_url=job_response.image_url
-                                )
-                                print(f"[poll_job_status] Updated request {db_request.id} with URL: {job_response.image_url}")
-                        finally:
-                            db.close()
-                        break
-                    elif data["status"] == "FAILED":
-                        cls.set_job(job_id, JobStatus.FAILED, error=data.get("error", "Unknown error"))
-                        break
-                except Exception as e:
-                    print(f"Error polling job {job_id}: {str(e)}")
-                    
+                        with tracer.span("completion.db_update"):
+                            await status_writer.write(
+                                "completed",
+                                job_id,
+                                by_job_id=True,
+                                output_url=job_response.image_url,
+                                completion_ms=int((time.perf_counter() - completion_started) * 1000),
+                                **job_timings(data)
+                            )
+                    tracer.finish(job_id)
+                    logger.info("Updated job %s with URL %s", job_id, job_response.image_url)
+                    break
+                elif data["status"] in FAILED_STATUSES:
+                    runpod_service.notify_job_finished(job_id, data)
+                    cls.set_job(job_id, JobStatus.FAILED, error=job_error(data))
+                    await status_writer.write("failed", job_id, by_job_id=True, **job_timings(data))
+                    tracer.finish(job_id)
+                    break
+            except Exception as e:
+                logger.warning("Error polling job %s: %s", job_id, e)
+            finally:
+                for image in streamed_images(data):
+                    image.discard()
+                
             await asyncio.sleep(5)  # Poll every 5 seconds
+
+    @classmethod
+    async def enforce_deadlines(cls):
+        """Periodically cancel in-flight requests that outlived their workflow deadline.
+
+        Covers jobs whose poller died with a previous process.
+        """
+        from app.database import SessionLocal
+        from app.repository import runpod as runpod_repo
+
+        while True:
+            await asyncio.sleep(settings.DEADLINE_SWEEP_INTERVAL)
+            db = SessionLocal()
+            try:
+                requests = await asyncio.to_thread(runpod_repo.get_active_requests, db)
+                now = datetime.utcnow()
+                for request in requests:
+                    started = request.submitted_at or request.created_at
+                    if started is None or now < job_deadline(request.workflow_id, started):
+                        continue
+                    if request.runpod_job_id:
+                        await cls.cancel_job(
+                            request.runpod_job_id, "Job timed out",
+                            request.endpoint_id or workflow_registry.endpoint_for(request.workflow_id))
+                    else:
+                        await status_writer.write("failed", request.id)
+            except Exception as e:
+                logger.error("Deadline sweep failed: %s", e)
+            finally:
+                db.close()
+
+Gauge("job_tracker_jobs", "Jobs held in the in-memory JobTracker", function=lambda: len(JobTracker._jobs))
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from app.config import settings
+from app.utils.metrics import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_SECONDS = Histogram("event_loop_lag_seconds", "How late the event loop ran a timer it was asked to run",
+                             buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+LOOP_LAG_QUANTILE = Gauge("event_loop_lag_quantile_seconds", "Recent event loop lag percentiles", ["quantile"])
+LOOP_BLOCKED = Counter("event_loop_blocked_total", "Times the event loop was blocked past the threshold")
+
+# Lag samples kept for the percentiles on /health
+RECENT_SAMPLES = 600
+
+
+class LoopMonitor:
+    """Measures event-loop lag and reports what is blocking the loop.
+
+    A task sleeps for `interval` in a loop; how much later than asked it
+    wakes up is the lag. A watchdog thread watches that task's heartbeat and,
+    when the loop has not come back for `threshold` seconds, logs the stack
+    of the loop thread, which is the code that is blocking it. With
+    LOOP_ASYNCIO_DEBUG asyncio's own slow-callback warnings are turned on too.
+    """
+
+    def __init__(self, interval: float = settings.LOOP_MONITOR_INTERVAL,
+                 threshold: float = settings.LOOP_BLOCK_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.samples: Deque[float] = deque(maxlen=RECENT_SAMPLES)
+        self.blocked = 0
+        self._heartbeat = time.monotonic()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        if settings.LOOP_ASYNCIO_DEBUG:
+            # Logs "Executing <Handle ...> took N seconds" through the asyncio logger
+            self._loop.set_debug(True)
+            self._loop.slow_callback_duration = self.threshold
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._measure())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+
+    async def _measure(self):
+        ticks = 0
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            lag = max(0.0, now - started - self.interval)
+            self.samples.append(lag)
+            LOOP_LAG_SECONDS.observe(lag)
+            ticks += 1
+            if ticks % 10 == 0:
+                for name, value in self.percentiles().items():
+                    LOOP_LAG_QUANTILE.set(value, quantile=name)
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stopped.wait(self.threshold / 2):
+            beat = self._heartbeat
+            stalled = time.monotonic() - beat - self.interval
+            if stalled < self.threshold or beat == reported_beat:
+                continue
+            # One report per stall
+            reported_beat = beat
+            self.blocked += 1
+            LOOP_BLOCKED.inc()
+            self._report(stalled)
+
+    def _report(self, stalled: float):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame, limit=12)) if frame else "<no frame>"
+        task = None
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            pass
+        logger.warning("Event loop blocked for %.0f ms in %s", stalled * 1000,
+                       task.get_name() if task else "a callback",
+                       extra={"coroutine": repr(task.get_coro()) if task else None, "stack": stack})
+
+    def percentiles(self) -> Dict[str, float]:
+        if not self.samples:
+            return {}
+        ordered = sorted(self.samples)
+
+        def pick(pct):
+            return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+        return {"p50": pick(50), "p95": pick(95), "p99": pick(99), "max": ordered[-1]}
+
+    def report(self) -> Dict:
+        return {
+            "lag_ms": {name: round(value * 1000, 2) for name, value in self.percentiles().items()},
+            "blocked": self.blocked,
+            "threshold_ms": self.threshold * 1000,
+        }
+
+
+loop_monitor = LoopMonitor()
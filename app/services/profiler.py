@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Snapshots kept for diffing
+MAX_SNAPSHOTS = 5
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def _thread_stack(frame) -> List[str]:
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    return stack[::-1]
+
+
+def _awaiting_stack(coro) -> List[str]:
+    """Where a suspended coroutine chain is waiting, outermost first"""
+    stack = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        stack.append(_frame_label(frame))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return stack
+
+
+class RequestSampler:
+    """Samples one asyncio task's stack from a helper thread.
+
+    While the task is running on the loop the loop thread's stack is
+    recorded; while it is suspended the chain of awaits it is parked on is
+    recorded under "(waiting)", so the profile adds up to wall-clock time.
+    """
+
+    def __init__(self, task: asyncio.Task, interval: float = settings.PROFILE_INTERVAL):
+        self.task = task
+        self.loop = task.get_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stopped.set()
+        self._thread.join()
+        return self.samples
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                if asyncio.current_task(self.loop) is self.task:
+                    frame = sys._current_frames().get(self.loop_thread_id)
+                    stack = _thread_stack(frame)
+                else:
+                    stack = ["(waiting)"] + _awaiting_stack(self.task.get_coro())
+            except Exception:
+                continue
+            self.samples[";".join(stack)] += 1
+
+
+class Profiler:
+    """Opt-in per-request profiling and tracemalloc snapshots for admins.
+
+    A request is profiled when it carries a valid X-Profile header (minted by
+    an admin, signed with SECRET_KEY and short-lived) or is picked by
+    PROFILE_SAMPLE_RATE. Profiles are written to PROFILE_DIR as collapsed
+    stacks ("frame;frame;frame count"), which flamegraph.pl and speedscope
+    render as flame graphs. Nothing here runs unless PROFILER_ENABLED is set.
+    """
+
+    def __init__(self, profile_dir: str = settings.PROFILE_DIR):
+        self.profile_dir = profile_dir
+        self.snapshots: Dict[str, tracemalloc.Snapshot] = {}
+
+    # Request profiling
+
+    @staticmethod
+    def _signature(expires: int) -> str:
+        return hmac.new(settings.SECRET_KEY.encode(), f"profile:{expires}".encode(), hashlib.sha256).hexdigest()
+
+    def mint_token(self, ttl: int = settings.PROFILE_TOKEN_TTL) -> str:
+        expires = int(time.time()) + ttl
+        return f"{expires}.{self._signature(expires)}"
+
+    def verify_token(self, token: str) -> bool:
+        expires, _, signature = token.partition(".")
+        if not expires.isdigit() or int(expires) < time.time():
+            return False
+        return hmac.compare_digest(signature, self._signature(int(expires)))
+
+    def should_profile(self, token: Optional[str]) -> bool:
+        if token:
+            return self.verify_token(token)
+        return settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE
+
+    def save(self, name: str, samples: Counter, seconds: float) -> str:
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, f"{name}.folded")
+        with open(path, "w") as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+        logger.info("Saved profile %s (%d samples over %.0f ms)", path, sum(samples.values()), seconds * 1000)
+        return path
+
+    def list_profiles(self) -> List[Dict]:
+        if not os.path.isdir(self.profile_dir):
+            return []
+        entries = []
+        for filename in sorted(os.listdir(self.profile_dir), reverse=True):
+            path = os.path.join(self.profile_dir, filename)
+            entries.append({"name": filename, "bytes": os.path.getsize(path),
+                            "created": os.path.getmtime(path)})
+        return entries
+
+    def profile_path(self, name: str) -> Optional[str]:
+        path = os.path.join(self.profile_dir, os.path.basename(name))
+        return path if os.path.isfile(path) else None
+
+    # Memory snapshots
+
+    def take_snapshot(self, frames: int = 25) -> str:
+        """Snapshot traced allocations, starting tracemalloc on first use"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ])
+        snapshot_id = str(int(time.time() * 1000))
+        self.snapshots[snapshot_id] = snapshot
+        while len(self.snapshots) > MAX_SNAPSHOTS:
+            del self.snapshots[next(iter(self.snapshots))]
+        return snapshot_id
+
+    @staticmethod
+    def _stat(stat) -> Dict:
+        return {
+            "size_kb": round(stat.size / 1024, 1),
+            "size_diff_kb": round(getattr(stat, "size_diff", 0) / 1024, 1),
+            "count": stat.count,
+            "traceback": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+        }
+
+    def top(self, snapshot_id: str, limit: int = 20) -> List[Dict]:
+        stats = self.snapshots[snapshot_id].statistics("traceback")
+        return [self._stat(stat) for stat in stats[:limit]]
+
+    def diff(self, base_id: str, head_id: str, limit: int = 20) -> List[Dict]:
+        stats = self.snapshots[head_id].compare_to(self.snapshots[base_id], "traceback")
+        return [self._stat(stat) for stat in stats[:limit]]
+
+    def stop_tracing(self):
+        self.snapshots.clear()
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+profiler = Profiler()
@@ -1,4 +1,5 @@
 
+import logging
 import os
 import json
 import httpx
@@ -7,12 +8,15 @@ from datetime import datetime
 from app.config import settings
 from app.repository import runpod as runpod_repo
 from app.database import SessionLocal
+from app.services.status_writer import status_writer
+from app.services.runpod_service import FAILED_STATUSES, TERMINAL_STATUSES, runpod_service
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 async def submit_to_runpod(request_id: str, input_image: str, workflow_id: str):
     """Submit job to RunPod endpoint"""
-    endpoint_url = f"https://api.runpod.ai/v2/{settings.RUNPOD_ENDPOINT_ID}/run"
     payload = {
         "input": {
             "image": input_image,
@@ -20,27 +24,18 @@ async def submit_to_runpod(request_id: str, input_image: str, workflow_id: str):
         }
     }
     
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            endpoint_url,
-            json=payload,
-            headers={"Authorization": f"Bearer {settings.RUNPOD_API_KEY}"}
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            db = SessionLocal()
-            try:
-                runpod_repo.update_request_status(
-                    db,
-                    request_id=request_id,
-                    status="submitted",
-                    runpod_job_id=data["id"]
-                )
-            finally:
-                db.close()
-            return data["id"]
-    return None
+    try:
+        data = await runpod_service.submit(payload)
+    except httpx.HTTPError as e:
+        logger.error("Submission for request %s failed: %s", request_id, e)
+        return None
+
+    await status_writer.write(
+        "submitted",
+        request_id,
+        runpod_job_id=data["id"]
+    )
+    return data["id"]
 
 @router.post("/webhook")
 async def runpod_webhook(request: Request):
@@ -48,21 +43,21 @@ async def runpod_webhook(request: Request):
     data = await request.json()
     job_id = data.get("id")
     
-    db = SessionLocal()
-    try:
-        # Find request by RunPod job ID
-        request = runpod_repo.get_request_by_job_id(db, job_id)
-        if request and data.get("status") == "COMPLETED":
-            output_url = data.get("output", {}).get("image_url")
-            if output_url:
-                runpod_repo.update_request_status(
-                    db,
-                    request_id=request.id,
-                    status="completed",
-                    output_url=output_url
-                )
-    finally:
-        db.close()
+    if job_id and data.get("status") in TERMINAL_STATUSES:
+        runpod_service.notify_job_finished(job_id, data)
+    if job_id and data.get("status") in FAILED_STATUSES:
+        await status_writer.write("failed", job_id, by_job_id=True)
+
+    if job_id and data.get("status") == "COMPLETED":
+        output_url = data.get("output", {}).get("image_url")
+        if output_url:
+            # Guarded by job ID, so unknown jobs simply match no row
+            await status_writer.write(
+                "completed",
+                job_id,
+                by_job_id=True,
+                output_url=output_url
+            )
     
     return {"status": "success"}
 
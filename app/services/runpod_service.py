@@ -1,38 +1,218 @@
-
-import runpod
 import asyncio
-from typing import Optional
+import logging
+import httpx
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Dict, List, Optional
 from app.config import settings
+from app.utils.json_stream import output_parser
+from app.utils.metrics import RUNPOD_REQUEST_SECONDS
+
+logger = logging.getLogger(__name__)
+
+RUNPOD_REST_BASE = "https://rest.runpod.io/v1"
+TERMINAL_STATUSES = ("COMPLETED", "FAILED", "CANCELLED", "TIMED_OUT")
+# Terminal statuses without an output; all of them fail the request
+FAILED_STATUSES = ("FAILED", "CANCELLED", "TIMED_OUT")
+# How many submitted job IDs to remember the endpoint of
+JOB_ENDPOINT_CACHE_SIZE = 10000
+
+
+def job_timings(data: dict) -> dict:
+    """RunPod's queue wait and execution time from a status or webhook payload, as transition columns"""
+    return {
+        "delay_time_ms": data.get("delayTime"),
+        "execution_time_ms": data.get("executionTime"),
+    }
+
+
+def job_error(data: dict) -> str:
+    """Why a job in one of FAILED_STATUSES failed"""
+    if data.get("error"):
+        return str(data["error"])
+    return {"CANCELLED": "Job was cancelled", "TIMED_OUT": "Job timed out on RunPod"}.get(data.get("status"),
+                                                                                         "Unknown error")
+
 
 class RunPodService:
+    """Async client for the RunPod serverless API over one shared HTTP connection pool.
+
+    Completion is delivered by the webhook, the poller and job-status lookups
+    through `notify_job_finished`, so `await_result` waits on an event instead
+    of polling RunPod in a loop.
+    """
+
     def __init__(self):
-        runpod.api_key = settings.RUNPOD_API_KEY
-        
-    async def submit_job(self, workflow_id: str, input_data: dict, webhook_url: Optional[str] = None) -> str:
+        self._client: Optional[httpx.AsyncClient] = None
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._job_endpoints: "OrderedDict[str, str]" = OrderedDict()
+        # Called with (job_id, data) whenever a job is reported finished
+        self.finish_listeners: List[Callable[[str, dict], None]] = []
+        # Called with (job_id, data) for every status answer from RunPod
+        self.status_listeners: List[Callable[[str, dict], None]] = []
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                headers={"Authorization": f"Bearer {settings.RUNPOD_API_KEY}"},
+                timeout=httpx.Timeout(30.0, connect=5.0),
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20))
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _request(self, method: str, path: str, endpoint_id: Optional[str] = None, **kwargs) -> dict:
+        endpoint_id = endpoint_id or settings.RUNPOD_ENDPOINT_ID
+        operation = path.split("/")[0]
+        with RUNPOD_REQUEST_SECONDS.time(f"runpod_{operation}", operation=operation):
+            response = await self.client.request(method, f"{settings.RUNPOD_API_BASE.rstrip('/')}/{endpoint_id}/{path}", **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    async def _request_streamed(self, method: str, path: str, endpoint_id: Optional[str] = None) -> dict:
+        """Like _request, but the output image is decoded to a file while the body downloads"""
+        endpoint_id = endpoint_id or settings.RUNPOD_ENDPOINT_ID
+        operation = path.split("/")[0]
+        parser = output_parser()
+        try:
+            with RUNPOD_REQUEST_SECONDS.time(f"runpod_{operation}", operation=operation):
+                async with self.client.stream(method, f"{settings.RUNPOD_API_BASE.rstrip('/')}/{endpoint_id}/{path}") as response:
+                    response.raise_for_status()
+                    async for chunk in response.aiter_bytes():
+                        parser.feed(chunk)
+        except BaseException:
+            parser.abort()
+            raise
+        return parser.close()
+
+    def _job_endpoint(self, job_id: str, endpoint_id: Optional[str]) -> Optional[str]:
+        # Jobs submitted by this process go back to the endpoint that accepted them;
+        # `endpoint_id` is the caller's best guess for anything older
+        return self._job_endpoints.get(job_id) or endpoint_id
+
+    async def submit(self, payload: dict, sync: bool = False, endpoint_id: Optional[str] = None) -> dict:
+        """POST a raw payload to /run (or /runsync) and return RunPod's response"""
+        if sync:
+            # runsync holds the connection until the job finishes
+            data = await self._request("POST", "runsync", endpoint_id, json=payload,
+                                       timeout=httpx.Timeout(settings.RUNPOD_TIMEOUT, connect=5.0))
+        else:
+            data = await self._request("POST", "run", endpoint_id, json=payload)
+        if data.get("id"):
+            self._job_endpoints[data["id"]] = endpoint_id or settings.RUNPOD_ENDPOINT_ID
+            if len(self._job_endpoints) > JOB_ENDPOINT_CACHE_SIZE:
+                self._job_endpoints.popitem(last=False)
+        return data
+
+    async def submit_job(self, workflow_id: str, input_data: dict, webhook_url: Optional[str] = None,
+                         endpoint_id: Optional[str] = None) -> str:
         """Submit a job to RunPod and return the job ID"""
-        endpoint = runpod.Endpoint(settings.RUNPOD_ENDPOINT_ID)
         request_data = {
             "input": {
                 "workflow_name": workflow_id,
                 "image": input_data.get("image")
             }
         }
-        
+
         if webhook_url:
             request_data["webhook"] = webhook_url
-            
-        run_request = endpoint.run(request_data)
-        return run_request.id
-        
-    async def check_job_status(self, job_id: str) -> dict:
-        """Check the status of a RunPod job"""
-        status = runpod.get_job_status(job_id)
-        return status
-        
+
+        data = await self.submit(request_data, endpoint_id=endpoint_id)
+        return data["id"]
+
+    async def check_job_status(self, job_id: str, endpoint_id: Optional[str] = None,
+                               stream_output: bool = False) -> dict:
+        """Check the status of a RunPod job.
+
+        With `stream_output` the output image comes back as a StreamedImage
+        whose file the caller must discard.
+        """
+        if stream_output:
+            data = await self._request_streamed("GET", f"status/{job_id}", self._job_endpoint(job_id, endpoint_id))
+        else:
+            data = await self._request("GET", f"status/{job_id}", self._job_endpoint(job_id, endpoint_id))
+        for listener in self.status_listeners:
+            try:
+                listener(job_id, data)
+            except Exception as e:
+                logger.warning("Status listener failed for %s: %s", job_id, e)
+        return data
+
+    async def cancel_job(self, job_id: str, endpoint_id: Optional[str] = None) -> dict:
+        """Cancel a queued or running job"""
+        return await self._request("POST", f"cancel/{job_id}", self._job_endpoint(job_id, endpoint_id))
+
+    async def stream_job(self, job_id: str, endpoint_id: Optional[str] = None,
+                         poll_interval: float = 1.0) -> AsyncIterator[dict]:
+        """Yield partial outputs from /stream until the job finishes, asking every `poll_interval` seconds"""
+        while True:
+            data = await self._request("GET", f"stream/{job_id}", self._job_endpoint(job_id, endpoint_id))
+            for chunk in data.get("stream", []):
+                yield chunk
+            if data.get("status") in TERMINAL_STATUSES:
+                break
+            await asyncio.sleep(poll_interval)
+
+    async def health(self, endpoint_id: Optional[str] = None) -> dict:
+        """Worker and queue counts for an endpoint"""
+        return await self._request("GET", "health", endpoint_id)
+
+    async def set_min_workers(self, endpoint_id: str, workers_min: int) -> dict:
+        """Change how many workers an endpoint keeps running while idle"""
+        response = await self.client.patch(f"{RUNPOD_REST_BASE}/endpoints/{endpoint_id}",
+                                           json={"workersMin": workers_min})
+        response.raise_for_status()
+        return response.json()
+
+    def notify_job_finished(self, job_id: str, data: dict):
+        """Wake everything awaiting `job_id`; called by the webhook and poller"""
+        for listener in self.finish_listeners:
+            try:
+                listener(job_id, data)
+            except Exception as e:
+                logger.error("Finish listener failed for %s: %s", job_id, e)
+        for waiter in self._waiters.pop(job_id, []):
+            if not waiter.done():
+                waiter.set_result(data)
+
+    async def await_result(self, job_id: str, timeout: float = settings.RUNPOD_TIMEOUT,
+                           check_interval: float = 30.0, endpoint_id: Optional[str] = None) -> Optional[dict]:
+        """Wait for a job to finish, or return None once `timeout` seconds pass.
+
+        A status check every `check_interval` seconds covers lost webhooks.
+        """
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._waiters.setdefault(job_id, []).append(waiter)
+        deadline = loop.time() + timeout
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return None
+                try:
+                    return await asyncio.wait_for(asyncio.shield(waiter), min(check_interval, remaining))
+                except asyncio.TimeoutError:
+                    pass
+                try:
+                    data = await self.check_job_status(job_id, endpoint_id)
+                except Exception as e:
+                    logger.warning("Status check for %s failed: %s", job_id, e)
+                    continue
+                if data.get("status") in TERMINAL_STATUSES:
+                    return data
+        finally:
+            waiters = self._waiters.get(job_id)
+            if waiters and waiter in waiters:
+                waiters.remove(waiter)
+                if not waiters:
+                    del self._waiters[job_id]
+
     async def get_job_result(self, job_id: str, timeout: int = 600) -> Optional[dict]:
         """Get job result with timeout"""
-        endpoint = runpod.Endpoint("")  # Empty string since we're using job_id
-        result = endpoint.wait_for_job(job_id, timeout)
-        return result
+        return await self.await_result(job_id, timeout=timeout)
 
 runpod_service = RunPodService()
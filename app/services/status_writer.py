@@ -0,0 +1,123 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.database import SessionLocal
+from app.repository import runpod as runpod_repo
+
+logger = logging.getLogger(__name__)
+
+# Flush order within a batch so a job that is both started and finished
+# in the same window ends up terminal
+FLUSH_ORDER = ["submitted", "processing", "completed", "failed"]
+
+
+class StatusWriter:
+    """Coalesces request status transitions into one UPDATE per target status.
+
+    Writers await their transition until the batch containing it has been
+    committed, so an acknowledged completion is always durable. Under load,
+    everything that arrives during a flush interval shares one statement.
+    """
+
+    def __init__(self, flush_interval: float = settings.STATUS_FLUSH_INTERVAL,
+                 max_batch: int = settings.STATUS_MAX_BATCH):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        # (status, by_job_id) -> key -> (values, waiters)
+        self._pending: Dict[Tuple[str, bool], Dict[str, Tuple[dict, List[asyncio.Future]]]] = {}
+        self._size = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._flushing: Optional[asyncio.Future] = None
+
+    async def write(self, status: str, key: str, by_job_id: bool = False,
+                    output_url: Optional[str] = None, **columns) -> None:
+        """Queue a transition and wait until it has been committed.
+
+        `columns` may set any of runpod_repo.TRANSITION_COLUMNS; None values are skipped.
+        """
+        if status not in runpod_repo.STATUS_TRANSITIONS:
+            raise ValueError(f"Invalid target status: {status}")
+        for column_name in columns:
+            if column_name not in runpod_repo.TRANSITION_COLUMNS:
+                raise ValueError(f"Not a transition column: {column_name}")
+        loop = asyncio.get_running_loop()
+        if self._flusher is None or self._flusher.done():
+            self._wakeup = asyncio.Event()
+            self._flusher = loop.create_task(self._run())
+
+        waiter = loop.create_future()
+        group = self._pending.setdefault((status, by_job_id), {})
+        values, waiters = group.get(key, ({}, []))
+        if output_url:
+            values["output_image_url"] = output_url
+        values.update({name: value for name, value in columns.items() if value is not None})
+        if not waiters:
+            self._size += 1
+        waiters.append(waiter)
+        group[key] = (values, waiters)
+
+        self._wakeup.set()
+        await waiter
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            # Linger briefly so concurrent webhooks share the statement
+            if self._size < self.max_batch and self.flush_interval > 0:
+                await asyncio.sleep(self.flush_interval)
+            self._wakeup.clear()
+            batch, self._pending, self._size = self._pending, {}, 0
+            if batch:
+                # Shielded so close() never strands a batch mid-commit; close() awaits it
+                self._flushing = asyncio.ensure_future(self._flush(batch))
+                await asyncio.shield(self._flushing)
+
+    async def _flush(self, batch):
+        waiters = [w for group in batch.values() for _, ws in group.values() for w in ws]
+        try:
+            await asyncio.to_thread(self._apply, batch)
+        except Exception as e:
+            logger.error("Flush of %d transitions failed: %s", len(waiters), e)
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+            return
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _apply(self, batch):
+        db = SessionLocal()
+        try:
+            for status in FLUSH_ORDER:
+                for by_job_id in (False, True):
+                    group = batch.get((status, by_job_id))
+                    if group:
+                        runpod_repo.apply_status_transitions(
+                            db, status,
+                            {key: values for key, (values, _) in group.items()},
+                            by_job_id=by_job_id)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def close(self):
+        """Flush anything still queued and stop the background task"""
+        if self._flusher is None:
+            return
+        self._flusher.cancel()
+        self._flusher = None
+        if self._flushing is not None and not self._flushing.done():
+            await self._flushing
+        batch, self._pending, self._size = self._pending, {}, 0
+        if batch:
+            await self._flush(batch)
+
+
+status_writer = StatusWriter()
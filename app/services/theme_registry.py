@@ -1,10 +1,13 @@
 
+import logging
 import os
 import json
 from typing import Dict, List, Optional
 from app.config import settings
 from app.models import ThemeDetail
 
+logger = logging.getLogger(__name__)
+
 class ThemeRegistry:
     """Service to manage theme LoRAs and their metadata"""
     
@@ -34,7 +37,7 @@ class ThemeRegistry:
                     )
                     
             except Exception as e:
-                print(f"Error loading themes metadata: {str(e)}")
+                logger.error("Error loading themes metadata: %s", e)
                 self._initialize_default_themes()
         else:
             self._initialize_default_themes()
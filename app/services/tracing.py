@@ -0,0 +1,297 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import httpx
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services.runpod_service import runpod_service
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "nursefilter-api"
+
+# (trace_id, span_id of the innermost open span) for the code currently running
+_current: ContextVar[Optional[Tuple[str, str]]] = ContextVar("current_trace", default=None)
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+class Trace:
+
+    def __init__(self, trace_id: str, root_span_id: str, attributes: dict):
+        self.trace_id = trace_id
+        self.root_span_id = root_span_id
+        self.attributes = attributes
+        self.started_ns = time.time_ns()
+        self.submitted_ns: Optional[int] = None
+        self.job_id: Optional[str] = None
+        self.request_id: Optional[str] = None
+        self.spans: List[dict] = []
+        self.finished = False
+
+
+class Tracer:
+    """Lightweight per-job spans, from the upload in process_image to the DB update on completion.
+
+    A trace covers one image job and is found again by its RunPod job ID, so
+    the webhook, poller and status lookups add their spans to the trace that
+    process_image started. Recent traces are kept in a ring buffer; finished
+    traces can also be stored in job_spans and pushed to an OTLP collector.
+    Code running outside a trace pays only for a context variable lookup.
+    """
+
+    def __init__(self, buffer_size: int = settings.TRACE_BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self._traces: "OrderedDict[str, Trace]" = OrderedDict()
+        self._by_job: Dict[str, str] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._exports = set()
+
+    def _new_trace(self, attributes: dict) -> Trace:
+        trace = Trace(_new_id(16), _new_id(8), attributes)
+        self._traces[trace.trace_id] = trace
+        while len(self._traces) > self.buffer_size:
+            _, evicted = self._traces.popitem(last=False)
+            if evicted.job_id:
+                self._by_job.pop(evicted.job_id, None)
+        return trace
+
+    def start_trace(self, **attributes) -> str:
+        """Begin a trace and make it current for the rest of the calling task"""
+        trace = self._new_trace(attributes)
+        _current.set((trace.trace_id, trace.root_span_id))
+        return trace.trace_id
+
+    def _trace(self, trace_id: Optional[str] = None) -> Optional[Trace]:
+        if trace_id is None:
+            current = _current.get()
+            trace_id = current[0] if current else None
+        return self._traces.get(trace_id) if trace_id else None
+
+    def bind(self, job_id: Optional[str] = None, request_id: Optional[str] = None):
+        """Attach the RunPod job ID and/or runpod_requests ID to the current trace"""
+        trace = self._trace()
+        if trace is None:
+            return
+        if job_id:
+            trace.job_id = job_id
+            trace.submitted_ns = time.time_ns()
+            self._by_job[job_id] = trace.trace_id
+        if request_id:
+            trace.request_id = request_id
+
+    @contextmanager
+    def activate(self, job_id: str):
+        """Make the job's trace current, starting one if this process never saw the job"""
+        trace_id = self._by_job.get(job_id)
+        trace = self._traces.get(trace_id) if trace_id else None
+        if trace is None:
+            trace = self._new_trace({"recovered": True})
+            trace.job_id = job_id
+            self._by_job[job_id] = trace.trace_id
+        token = _current.set((trace.trace_id, trace.root_span_id))
+        try:
+            yield
+        finally:
+            _current.reset(token)
+
+    def record(self, name: str, start_ns: int, end_ns: int, trace_id: Optional[str] = None,
+               parent_span_id: Optional[str] = None, error: Optional[str] = None, **attributes) -> Optional[str]:
+        """Add a span whose timing is already known; returns its ID"""
+        trace = self._trace(trace_id)
+        if trace is None:
+            return None
+        current = _current.get()
+        if parent_span_id is None:
+            parent_span_id = current[1] if current and current[0] == trace.trace_id else trace.root_span_id
+        span_id = _new_id(8)
+        self._append(trace, span_id, parent_span_id, name, start_ns, end_ns, attributes, error)
+        return span_id
+
+    @staticmethod
+    def _append(trace: Trace, span_id: str, parent_span_id: Optional[str], name: str,
+                start_ns: int, end_ns: int, attributes: dict, error: Optional[str]):
+        trace.spans.append({
+            "span_id": span_id,
+            "trace_id": trace.trace_id,
+            "parent_span_id": parent_span_id,
+            "name": name,
+            "start_time_ns": start_ns,
+            "end_time_ns": end_ns,
+            "attributes": {**attributes, "error": error} if error else attributes,
+        })
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Time the block as a child of the innermost open span"""
+        current = _current.get()
+        if current is None:
+            yield
+            return
+        trace_id, parent_span_id = current
+        span_id = _new_id(8)
+        start_ns = time.time_ns()
+        token = _current.set((trace_id, span_id))
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = repr(e)
+            raise
+        finally:
+            _current.reset(token)
+            trace = self._traces.get(trace_id)
+            if trace is not None:
+                self._append(trace, span_id, parent_span_id, name, start_ns, time.time_ns(), attributes, error)
+
+    def job_finished(self, job_id: str, data: dict):
+        """RunPodService finish listener; records the wait on RunPod and its queue/execution split"""
+        trace_id = self._by_job.get(job_id)
+        trace = self._traces.get(trace_id) if trace_id else None
+        if trace is None or trace.submitted_ns is None:
+            return
+        now = time.time_ns()
+        wait_id = self.record("runpod.wait", trace.submitted_ns, now, trace_id=trace_id,
+                              parent_span_id=trace.root_span_id, status=data.get("status"))
+        queue_end = trace.submitted_ns
+        if data.get("delayTime") is not None:
+            queue_end = trace.submitted_ns + int(data["delayTime"] * 1_000_000)
+            self.record("runpod.queue", trace.submitted_ns, queue_end, trace_id=trace_id, parent_span_id=wait_id)
+        if data.get("executionTime") is not None:
+            self.record("runpod.execution", queue_end, queue_end + int(data["executionTime"] * 1_000_000),
+                        trace_id=trace_id, parent_span_id=wait_id)
+
+    def _spans(self, trace: Trace) -> List[dict]:
+        root = {
+            "span_id": trace.root_span_id,
+            "trace_id": trace.trace_id,
+            "parent_span_id": None,
+            "name": "job",
+            "start_time_ns": trace.started_ns,
+            "end_time_ns": max([s["end_time_ns"] for s in trace.spans] + [trace.started_ns]),
+            "attributes": trace.attributes,
+        }
+        return [{**span, "job_id": trace.job_id, "request_id": trace.request_id}
+                for span in [root] + trace.spans]
+
+    def finish(self, job_id: Optional[str] = None):
+        """Close the job's (or the current) trace and hand it to the configured exporters"""
+        trace = self._trace(self._by_job.get(job_id) if job_id else None)
+        if trace is None or trace.finished:
+            return
+        trace.finished = True
+        if settings.TRACE_STORE_DB or settings.OTLP_ENDPOINT:
+            task = asyncio.get_running_loop().create_task(self._export(self._spans(trace)))
+            self._exports.add(task)
+            task.add_done_callback(self._exports.discard)
+
+    async def close(self):
+        """Wait for pending exports, then close the OTLP client"""
+        await asyncio.gather(*self._exports, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _export(self, spans: List[dict]):
+        if settings.TRACE_STORE_DB:
+            try:
+                await asyncio.to_thread(self._store, spans)
+            except Exception as e:
+                logger.warning("Storing trace failed: %s", e)
+        if settings.OTLP_ENDPOINT:
+            try:
+                if self._client is None:
+                    self._client = httpx.AsyncClient(timeout=10.0)
+                response = await self._client.post(f"{settings.OTLP_ENDPOINT.rstrip('/')}/v1/traces",
+                                                   json=to_otlp(spans))
+                response.raise_for_status()
+            except Exception as e:
+                logger.warning("OTLP export failed: %s", e)
+
+    @staticmethod
+    def _store(spans: List[dict]):
+        from app.database import SessionLocal
+        from app.repository import traces as traces_repo
+
+        db = SessionLocal()
+        try:
+            traces_repo.add_spans(db, [{**span, "attributes": json.dumps(span["attributes"], default=str)}
+                                       for span in spans])
+        finally:
+            db.close()
+
+    def spans_for_job(self, job_id: str) -> Optional[List[dict]]:
+        """The job's spans from the ring buffer, or None if it has been evicted"""
+        trace_id = self._by_job.get(job_id)
+        trace = self._traces.get(trace_id) if trace_id else None
+        return self._spans(trace) if trace else None
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans: List[dict]) -> dict:
+    """Spans as an OTLP/JSON ExportTraceServiceRequest"""
+    otlp_spans = []
+    for span in spans:
+        attributes = dict(span["attributes"])
+        for key in ("job_id", "request_id"):
+            if span.get(key):
+                attributes[key] = span[key]
+        otlp_spans.append({
+            "traceId": span["trace_id"],
+            "spanId": span["span_id"],
+            "parentSpanId": span["parent_span_id"] or "",
+            "name": span["name"],
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(span["start_time_ns"]),
+            "endTimeUnixNano": str(span["end_time_ns"]),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items() if v is not None],
+            "status": {"code": 2 if span["attributes"].get("error") else 1},
+        })
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "app.services.tracing"}, "spans": otlp_spans}],
+        }]
+    }
+
+
+def timeline(spans: List[dict]) -> dict:
+    """Spans as offsets from the start of the job, for reading by eye"""
+    spans = sorted(spans, key=lambda s: s["start_time_ns"])
+    start = spans[0]["start_time_ns"]
+    end = max(s["end_time_ns"] for s in spans)
+    return {
+        "trace_id": spans[0]["trace_id"],
+        "job_id": next((s["job_id"] for s in spans if s.get("job_id")), None),
+        "request_id": next((s["request_id"] for s in spans if s.get("request_id")), None),
+        "duration_ms": round((end - start) / 1e6, 1),
+        "spans": [{
+            "name": s["name"],
+            "span_id": s["span_id"],
+            "parent_span_id": s["parent_span_id"],
+            "offset_ms": round((s["start_time_ns"] - start) / 1e6, 1),
+            "duration_ms": round((s["end_time_ns"] - s["start_time_ns"]) / 1e6, 1),
+            "attributes": s["attributes"],
+        } for s in spans],
+    }
+
+
+tracer = Tracer()
+runpod_service.finish_listeners.append(tracer.job_finished)
@@ -0,0 +1,205 @@
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from app.config import settings
+from app.database import SessionLocal
+from app.repository import runpod as runpod_repo
+from app.services.runpod_service import runpod_service
+
+logger = logging.getLogger(__name__)
+
+# How often the hourly traffic profile is recomputed
+PROFILE_REFRESH = timedelta(hours=6)
+# Submitted jobs whose warm state is remembered until they finish
+SUBMITTED_JOBS_CACHE_SIZE = 10000
+
+
+class WarmScheduler:
+    """Keeps RunPod endpoints warm during the hours we usually get traffic.
+
+    The hourly profile is learned from runpod_requests.created_at. Inside a
+    predicted busy window (plus a lead time) endpoints are kept warm either by
+    raising their minimum worker count or by sending cheap keep-alive jobs,
+    until the daily worker-hour budget is spent. Cold starts are counted
+    separately for warmed and unwarmed periods so the effect is visible.
+    """
+
+    def __init__(self, mode: str = settings.WARM_MODE,
+                 busy_threshold: float = settings.WARM_BUSY_THRESHOLD,
+                 budget_worker_hours: float = settings.WARM_BUDGET_WORKER_HOURS):
+        if mode not in ("keepalive", "min_workers"):
+            raise ValueError(f"Invalid warm mode: {mode}")
+        self.mode = mode
+        self.busy_threshold = busy_threshold
+        self.budget_worker_hours = budget_worker_hours
+        self.hourly_rate: List[float] = [0.0] * 24  # Average requests per UTC hour of day
+        self.profile_updated: Optional[datetime] = None
+        self.warming = False
+        # Endpoints whose workersMin this process raised and hasn't reset yet
+        self.warmed_endpoints: Set[str] = set()
+        # False until min_workers mode has applied its state once; a crashed
+        # process may have left workersMin raised
+        self._synced = False
+        self._submitted_warm: "OrderedDict[str, bool]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+        self.spent_worker_hours = 0.0
+        self._budget_day = datetime.utcnow().date()
+        self.cold_starts = {
+            "unwarmed": {"jobs": 0, "cold_starts": 0},
+            "warmed": {"jobs": 0, "cold_starts": 0},
+        }
+
+    def learn_profile(self, now: datetime):
+        db = SessionLocal()
+        try:
+            counts = runpod_repo.get_hourly_request_counts(
+                db, now - timedelta(days=settings.WARM_PROFILE_DAYS))
+        finally:
+            db.close()
+        self.hourly_rate = [counts.get(hour, 0) / settings.WARM_PROFILE_DAYS for hour in range(24)]
+        self.profile_updated = now
+
+    def busy_hours(self) -> List[int]:
+        return [hour for hour, rate in enumerate(self.hourly_rate) if rate >= self.busy_threshold]
+
+    def is_busy(self, now: datetime) -> bool:
+        """Whether `now` is in a busy hour, or close enough to the next one to pre-warm"""
+        lead = now + timedelta(minutes=settings.WARM_LEAD_MINUTES)
+        busy = self.busy_hours()
+        return now.hour in busy or lead.hour in busy
+
+    def _charge(self, worker_hours: float, now: datetime) -> bool:
+        """Spend from today's budget; False if it would be exceeded"""
+        if now.date() != self._budget_day:
+            self._budget_day = now.date()
+            self.spent_worker_hours = 0.0
+        if self.spent_worker_hours + worker_hours > self.budget_worker_hours:
+            return False
+        self.spent_worker_hours += worker_hours
+        return True
+
+    def _endpoints(self) -> List[str]:
+        from app.services.workflow_registry import workflow_registry
+
+        return sorted({e for w in workflow_registry.list() for e in workflow_registry.endpoints_for(w.id) if e})
+
+    async def tick(self, now: datetime, interval: float):
+        endpoints = self._endpoints()
+        if self.mode == "min_workers":
+            cost = settings.WARM_MIN_WORKERS * len(endpoints) * interval / 3600
+        else:
+            cost = settings.WARM_KEEPALIVE_COST_SECONDS * len(endpoints) / 3600
+        should_warm = self.is_busy(now) and self._charge(cost, now)
+
+        if self.mode == "min_workers":
+            if should_warm != self.warming or not self._synced:
+                if should_warm:
+                    targets = endpoints
+                else:
+                    targets = sorted(self.warmed_endpoints) if self._synced else endpoints
+                if not await self._set_all_min_workers(targets, settings.WARM_MIN_WORKERS if should_warm else 0):
+                    return  # keep the old state so the next tick retries
+                self._synced = True
+        elif should_warm:
+            payload = json.loads(settings.WARM_KEEPALIVE_PAYLOAD)
+            await asyncio.gather(*(self._keepalive(e, payload) for e in endpoints))
+
+        if should_warm != self.warming:
+            logger.info("%s %d endpoints", "Warming" if should_warm else "Stopped warming", len(endpoints))
+        self.warming = should_warm
+
+    async def _set_all_min_workers(self, endpoint_ids: List[str], workers_min: int) -> bool:
+        """Set workersMin on every endpoint; True only if every call succeeded"""
+        results = await asyncio.gather(*(self._set_min_workers(e, workers_min) for e in endpoint_ids))
+        return all(results)
+
+    async def _set_min_workers(self, endpoint_id: str, workers_min: int) -> bool:
+        try:
+            await runpod_service.set_min_workers(endpoint_id, workers_min)
+        except Exception as e:
+            logger.warning("Setting min workers on %s failed: %s", endpoint_id, e)
+            return False
+        if workers_min:
+            self.warmed_endpoints.add(endpoint_id)
+        else:
+            self.warmed_endpoints.discard(endpoint_id)
+        return True
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Stop ticking, then put warmed endpoints back to zero idle workers so they stop costing money"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.warmed_endpoints:
+            logger.info("Resetting min workers on %d endpoints", len(self.warmed_endpoints))
+            await self._set_all_min_workers(sorted(self.warmed_endpoints), 0)
+        self.warming = False
+
+    async def _keepalive(self, endpoint_id: str, payload: dict):
+        try:
+            await runpod_service.submit(payload, endpoint_id=endpoint_id)
+        except Exception as e:
+            logger.warning("Keep-alive to %s failed: %s", endpoint_id, e)
+
+    def job_submitted(self, job_id: str):
+        """Remember whether endpoints were being warmed when the job was queued"""
+        self._submitted_warm[job_id] = self.warming
+        if len(self._submitted_warm) > SUBMITTED_JOBS_CACHE_SIZE:
+            self._submitted_warm.popitem(last=False)
+
+    def job_finished(self, job_id: str, data: dict):
+        """RunPodService finish listener; classifies the job's queue delay"""
+        warm = self._submitted_warm.pop(job_id, self.warming)
+        if data.get("delayTime") is None:
+            return
+        bucket = self.cold_starts["warmed" if warm else "unwarmed"]
+        bucket["jobs"] += 1
+        if data["delayTime"] >= settings.COLD_START_DELAY_MS:
+            bucket["cold_starts"] += 1
+
+    def report(self) -> Dict:
+        def rate(bucket):
+            return bucket["cold_starts"] / bucket["jobs"] if bucket["jobs"] else None
+
+        return {
+            "enabled": settings.WARM_SCHEDULER_ENABLED,
+            "mode": self.mode,
+            "warming": self.warming,
+            "busy_hours_utc": self.busy_hours(),
+            "hourly_rate": self.hourly_rate,
+            "profile_updated": self.profile_updated,
+            "budget_worker_hours": self.budget_worker_hours,
+            "spent_worker_hours": round(self.spent_worker_hours, 3),
+            "cold_start_rate": {
+                "unwarmed": rate(self.cold_starts["unwarmed"]),
+                "warmed": rate(self.cold_starts["warmed"]),
+            },
+            "cold_starts": self.cold_starts,
+        }
+
+    async def run(self):
+        interval = settings.WARM_KEEPALIVE_INTERVAL
+        while True:
+            now = datetime.utcnow()
+            try:
+                if self.profile_updated is None or now - self.profile_updated > PROFILE_REFRESH:
+                    await asyncio.to_thread(self.learn_profile, now)
+                await self.tick(now, interval)
+            except Exception as e:
+                logger.error("Tick failed: %s", e)
+            await asyncio.sleep(interval)
+
+
+warm_scheduler = WarmScheduler()
+runpod_service.finish_listeners.append(warm_scheduler.job_finished)
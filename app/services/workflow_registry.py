@@ -0,0 +1,112 @@
+import logging
+import os
+import json
+import time
+import hashlib
+from typing import Dict, List, Optional
+from app.config import settings
+from app.models import WorkflowProfile
+
+logger = logging.getLogger(__name__)
+
+# Used when no workflows file is present
+DEFAULT_WORKFLOWS = [
+    {
+        "id": "lastnurses_api",
+        "name": "lastnurses_api",
+        "display_name": "The Last Nurses",
+        "description": "See your workplace as the Post-apocalyptic world it already is.",
+    },
+    {
+        "id": "nursefilter_v2",
+        "name": "nursefilter_v2",
+        "display_name": "Modern Nurse Filter",
+        "description": "Contemporary medical professional style",
+    },
+]
+
+
+class WorkflowRegistry:
+    """Workflow profiles keyed by ID, reloaded when the workflows file changes"""
+
+    def __init__(self, path: str = settings.WORKFLOWS_FILE,
+                 check_interval: float = settings.WORKFLOWS_RELOAD_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self.workflows: Dict[str, WorkflowProfile] = {}
+        self.etag = ""
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._load()
+
+    def _load(self):
+        """Load profiles from the workflows file, or the defaults if it is missing"""
+        try:
+            self._mtime = os.path.getmtime(self.path)
+        except OSError:
+            self._mtime = None
+
+        workflows = self._parse(DEFAULT_WORKFLOWS)
+        if self._mtime is not None:
+            try:
+                with open(self.path, 'r') as f:
+                    workflows = self._parse(json.load(f))
+            except Exception as e:
+                # Keep serving the previous profiles rather than none at all. The
+                # mtime is already recorded, so the file isn't retried until it changes.
+                logger.error("Error loading %s: %s", self.path, e)
+                if self.workflows:
+                    return
+        self.workflows = workflows
+
+        listing = json.dumps([w.model_dump() for w in self.workflows.values()], sort_keys=True)
+        self.etag = f'"{hashlib.sha1(listing.encode()).hexdigest()}"'
+
+    @staticmethod
+    def _parse(entries) -> Dict[str, WorkflowProfile]:
+        """Validate every entry before any of them is used"""
+        profiles = [WorkflowProfile(**entry) for entry in entries]
+        return {profile.id: profile for profile in profiles}
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        if mtime != self._mtime:
+            logger.info("%s changed, reloading", self.path)
+            self._load()
+
+    def get(self, workflow_id: str) -> Optional[WorkflowProfile]:
+        self._maybe_reload()
+        return self.workflows.get(workflow_id)
+
+    def list(self) -> List[WorkflowProfile]:
+        self._maybe_reload()
+        return list(self.workflows.values())
+
+    def current_etag(self) -> str:
+        self._maybe_reload()
+        return self.etag
+
+    def endpoints_for(self, workflow_id: str) -> List[str]:
+        """The endpoint pool a workflow's jobs can be routed to"""
+        profile = self.get(workflow_id)
+        if profile and profile.endpoint_ids:
+            return list(profile.endpoint_ids)
+        return [(profile and profile.endpoint_id) or settings.RUNPOD_ENDPOINT_ID]
+
+    def endpoint_for(self, workflow_id: str) -> str:
+        """The workflow's primary endpoint"""
+        return self.endpoints_for(workflow_id)[0]
+
+    def timeout_for(self, workflow_id: Optional[str]) -> int:
+        profile = self.get(workflow_id) if workflow_id else None
+        return (profile and profile.timeout) or settings.RUNPOD_TIMEOUT
+
+
+workflow_registry = WorkflowRegistry()
@@ -0,0 +1,68 @@
+import base64
+import binascii
+import io
+from typing import Optional, Tuple, Union
+from PIL import Image
+
+# Enough base64 to cover the header of any PNG and nearly every JPEG
+HEADER_BASE64_CHARS = 64 * 1024
+# Codec calls hold the GIL for their whole input; slices this size keep each hold under a millisecond
+BASE64_SLICE_CHARS = 1024 * 1024
+BINARY_SLICE_BYTES = BASE64_SLICE_CHARS // 4 * 3
+# Longest data URL header looked for in front of base64 data
+MAX_DATA_URL_PREFIX = 100
+
+
+def base64_start(base64_str: str) -> int:
+    """Index where the base64 data starts, past any data URL header"""
+    if base64_str.startswith("data:"):
+        comma = base64_str.find(",", 0, MAX_DATA_URL_PREFIX)
+        if comma >= 0:
+            return comma + 1
+    return 0
+
+
+def base64_head(base64_str: str) -> str:
+    """The first HEADER_BASE64_CHARS of base64 image data, small enough to send to another process"""
+    start = base64_start(base64_str)
+    head = base64_str[start:start + HEADER_BASE64_CHARS]
+    return head[:len(head) - len(head) % 4]
+
+
+def read_image_size(head: str) -> Optional[Tuple[int, int]]:
+    """(width, height) from the start of a base64 image, or None if Pillow can't tell"""
+    try:
+        with Image.open(io.BytesIO(base64.b64decode(head))) as image:
+            return image.size
+    except Exception:
+        return None
+
+
+def peek_image_size(base64_str: str) -> Optional[Tuple[int, int]]:
+    """Read (width, height) from the start of a base64 image without decoding all of it"""
+    return read_image_size(base64_head(base64_str))
+
+
+def decode_base64(base64_str: str, start: int = 0) -> bytes:
+    """Decode base64 from `start`, a slice at a time so other threads get the GIL in between"""
+    if len(base64_str) - start <= BASE64_SLICE_CHARS or "\n" in base64_str:
+        # Line breaks would shift the 4-character groups across slices
+        return base64.b64decode(base64_str[start:] if start else base64_str)
+    return b"".join(binascii.a2b_base64(base64_str[i:i + BASE64_SLICE_CHARS])
+                    for i in range(start, len(base64_str), BASE64_SLICE_CHARS))
+
+
+def to_data_url(image: Union[bytes, str], mime: str = "image/png") -> str:
+    """A data URL for raw image bytes or base64 text, encoding in slices like decode_base64"""
+    prefix = f"data:{mime};base64,"
+    if isinstance(image, str):
+        return image if image.startswith("data:") else prefix + image
+    view = memoryview(image)  # slicing a view doesn't copy
+    return "".join([prefix] + [binascii.b2a_base64(view[i:i + BINARY_SLICE_BYTES], newline=False).decode("ascii")
+                               for i in range(0, len(view), BINARY_SLICE_BYTES)])
+
+
+def read_data_url(path: str, mime: str = "image/png") -> str:
+    """A data URL for an image file on disk"""
+    with open(path, "rb") as f:
+        return to_data_url(f.read(), mime)
@@ -0,0 +1,317 @@
+import binascii
+import codecs
+import json
+import os
+import re
+import tempfile
+from typing import Callable, Iterator, List, Optional, Tuple, Union
+
+# Where RunPod workers put the finished image; the first match is used
+OUTPUT_IMAGE_PATHS = {("output", "output_image"), ("output", "images", 0, "image")}
+
+_STRING_SPECIAL = re.compile(r'["\\]')
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+_SCALAR_CHARS = frozenset("0123456789+-.eEtrufalsn")
+_WHITESPACE = frozenset(" \t\r\n")
+# A data URL header longer than this is not one
+MAX_DATA_URL_PREFIX = 256
+# Workers that upload the image themselves put its URL where the base64 would go
+URL_SCHEMES = ("http://", "https://")
+MAX_URL_LENGTH = 8192
+
+Path = Tuple[Union[str, int], ...]
+
+
+class StreamedImage:
+    """A base64 string value that was decoded to a temporary file instead of kept in memory"""
+
+    def __init__(self, path: str, size: int, prefix: Optional[str] = None):
+        self.path = path
+        self.size = size
+        self.prefix = prefix  # the data URL header, if the value had one
+
+    def discard(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __repr__(self):
+        return f"<streamed image {self.size} bytes>"
+
+
+class Base64FileSink:
+    """Decodes base64 text written in pieces into a temporary file.
+
+    A value that turns out to be an http(s) URL is kept as text instead,
+    and close() returns the string.
+    """
+
+    def __init__(self, suffix: str = ".png"):
+        self._file = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+        self._head: Optional[str] = ""  # text seen before the data URL prefix was ruled in or out
+        self._pending = b""  # trailing characters short of a 4-character group
+        self._url: Optional[str] = None
+        self.prefix: Optional[str] = None
+        self.size = 0
+
+    def write(self, text: str):
+        if self._url is not None:
+            self._url += text
+            if len(self._url) > MAX_URL_LENGTH:
+                raise ValueError("Output URL too long")
+            return
+        if self._head is not None:
+            self._head += text
+            if self._head.startswith(URL_SCHEMES):
+                self._url, self._head = self._head, None
+                return
+            if self._head.startswith("data:"):
+                comma = self._head.find(",")
+                if comma < 0:
+                    if len(self._head) > MAX_DATA_URL_PREFIX:
+                        raise ValueError("Unterminated data URL prefix")
+                    return
+                self.prefix, text = self._head[:comma + 1], self._head[comma + 1:]
+            elif any(len(self._head) < len(start) and start.startswith(self._head)
+                     for start in ("data:",) + URL_SCHEMES):
+                return
+            else:
+                text = self._head
+            self._head = None
+        data = self._pending + text.encode("ascii").translate(None, b" \t\r\n")
+        usable = len(data) - len(data) % 4
+        if usable:
+            self._decode(data[:usable])
+        self._pending = data[usable:]
+
+    def _decode(self, data: bytes):
+        decoded = binascii.a2b_base64(data)
+        self._file.write(decoded)
+        self.size += len(decoded)
+
+    def close(self) -> Union[StreamedImage, str]:
+        if self._url is not None:
+            self.abort()
+            return self._url
+        try:
+            if self._head is not None:
+                head, self._head = self._head, None
+                self.write(head)
+            if self._pending:
+                self._decode(self._pending)  # raises binascii.Error on bad padding
+        except Exception:
+            self.abort()
+            raise
+        self._file.close()
+        return StreamedImage(self._file.name, self.size, self.prefix)
+
+    def abort(self):
+        self._file.close()
+        StreamedImage(self._file.name, 0).discard()
+
+
+class StreamingJSONParser:
+    """Builds a JSON document from chunks as they arrive.
+
+    String values at paths for which `divert(path)` returns a sink are
+    written to the sink piece by piece, and the document holds whatever the
+    sink's close() returns in their place. Everything else is parsed as
+    json.loads would.
+    """
+
+    def __init__(self, divert: Callable[[Path], Optional[Base64FileSink]]):
+        self.divert = divert
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._stack: List[Union[dict, list]] = []
+        self._path: List[Union[str, int]] = []  # slot of each open container except the root
+        self._key: Optional[str] = None  # key awaiting its value in the innermost object
+        self._root = None
+        self._done = False
+        self._scalar = ""
+        self._in_string = False
+        self._string_is_key = False
+        self._parts: List[str] = []
+        self._sink: Optional[Base64FileSink] = None
+        self._escape = ""
+        self._surrogates = False
+
+    def feed(self, chunk: bytes):
+        try:
+            self._parse(self._decoder.decode(chunk))
+        except Exception:
+            self.abort()
+            raise
+
+    def close(self):
+        """Finish parsing and return the document"""
+        try:
+            self._parse(self._decoder.decode(b"", final=True))
+            if self._scalar:
+                self._finish_scalar()
+            if self._in_string or self._stack or not self._done:
+                raise ValueError("Incomplete JSON document")
+        except Exception:
+            self.abort()
+            raise
+        return self._root
+
+    def abort(self):
+        """Delete the files of every diverted value parsed so far"""
+        if self._sink is not None:
+            self._sink.abort()
+            self._sink = None
+        for image in streamed_images(self._root):
+            image.discard()
+
+    def _parse(self, text: str):
+        i, n = 0, len(text)
+        while i < n:
+            if self._in_string:
+                i = self._read_string(text, i)
+                continue
+            c = text[i]
+            i += 1
+            if c in _SCALAR_CHARS:
+                self._scalar += c
+                continue
+            if self._scalar:
+                self._finish_scalar()
+            if c in _WHITESPACE or c == ':' or c == ',':
+                continue
+            if c == '"':
+                self._start_string()
+            elif c == '{' or c == '[':
+                self._open({} if c == '{' else [])
+            elif c == '}' or c == ']':
+                if not self._stack:
+                    raise ValueError(f"Unexpected {c!r}")
+                self._stack.pop()
+                if self._stack:
+                    self._path.pop()
+            else:
+                raise ValueError(f"Unexpected {c!r}")
+
+    def _slot(self) -> Union[str, int, None]:
+        if not self._stack:
+            return None
+        top = self._stack[-1]
+        return self._key if isinstance(top, dict) else len(top)
+
+    def _add(self, value):
+        if not self._stack:
+            if self._done:
+                raise ValueError("Extra data after JSON document")
+            self._root, self._done = value, True
+            return
+        top = self._stack[-1]
+        if isinstance(top, dict):
+            if self._key is None:
+                raise ValueError("Object value without a key")
+            top[self._key] = value
+            self._key = None
+        else:
+            top.append(value)
+
+    def _open(self, container):
+        slot = self._slot()
+        self._add(container)
+        if self._stack:
+            self._path.append(slot)
+        self._stack.append(container)
+
+    def _finish_scalar(self):
+        scalar, self._scalar = self._scalar, ""
+        self._add(json.loads(scalar))
+
+    def _start_string(self):
+        self._in_string = True
+        self._string_is_key = bool(self._stack) and isinstance(self._stack[-1], dict) and self._key is None
+        if not self._string_is_key:
+            self._sink = self.divert(tuple(self._path) + (self._slot(),) if self._stack else ())
+
+    def _emit(self, text: str):
+        if self._sink is not None:
+            self._sink.write(text)
+        else:
+            self._parts.append(text)
+
+    def _end_string(self):
+        self._in_string = False
+        if self._sink is not None:
+            sink, self._sink = self._sink, None
+            self._add(sink.close())
+            return
+        value = "".join(self._parts)
+        self._parts = []
+        if self._surrogates:
+            # \u escapes for a character outside the BMP arrive as a surrogate pair
+            value = value.encode("utf-16", "surrogatepass").decode("utf-16")
+            self._surrogates = False
+        if self._string_is_key:
+            self._key = value
+        else:
+            self._add(value)
+
+    def _read_string(self, text: str, i: int) -> int:
+        if self._escape:
+            return self._read_escape(text, i)
+        match = _STRING_SPECIAL.search(text, i)
+        end = match.start() if match else len(text)
+        if end > i:
+            self._emit(text[i:end])
+        if not match:
+            return end
+        if text[end] == '"':
+            self._end_string()
+        else:
+            self._escape = "\\"
+        return end + 1
+
+    def _read_escape(self, text: str, i: int) -> int:
+        if self._escape == "\\":
+            c = text[i]
+            if c == "u":
+                self._escape = "\\u"
+                return i + 1
+            if c not in _ESCAPES:
+                raise ValueError(f"Invalid escape \\{c}")
+            self._escape = ""
+            self._emit(_ESCAPES[c])
+            return i + 1
+        needed = 6 - len(self._escape)
+        self._escape += text[i:i + needed]
+        if len(self._escape) == 6:
+            code = int(self._escape[2:], 16)
+            self._surrogates = self._surrogates or 0xD800 <= code <= 0xDFFF
+            self._emit(chr(code))
+            self._escape = ""
+        return min(len(text), i + needed)
+
+
+def streamed_images(value) -> Iterator[StreamedImage]:
+    """Every StreamedImage inside a parsed document"""
+    if isinstance(value, StreamedImage):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from streamed_images(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from streamed_images(item)
+
+
+def replace_streamed(value, text: str):
+    """Copy of a parsed document with every StreamedImage replaced by `text`"""
+    if isinstance(value, StreamedImage):
+        return text
+    if isinstance(value, dict):
+        return {key: replace_streamed(item, text) for key, item in value.items()}
+    if isinstance(value, list):
+        return [replace_streamed(item, text) for item in value]
+    return value
+
+
+def output_parser() -> StreamingJSONParser:
+    """Parser for RunPod status and webhook payloads that decodes the output image to a file"""
+    return StreamingJSONParser(lambda path: Base64FileSink() if path in OUTPUT_IMAGE_PATHS else None)
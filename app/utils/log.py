@@ -0,0 +1,152 @@
+"""Structured, non-blocking logging.
+
+Records are put on an in-memory queue by the calling code (usually the event
+loop) and formatted, redacted and written by a background listener thread, so
+a slow stdout never stalls a request. Use `logging.getLogger(__name__)` with
+%-style arguments so messages below the configured level are never formatted.
+"""
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import time
+from typing import Any, Optional
+
+from app.config import settings
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "sample"}
+
+# Keys whose values are never logged as-is
+SECRET_KEYS = {"authorization", "cookie", "password", "hashed_password", "token", "access_token",
+               "refresh_token", "client_secret", "fb_exchange_token", "facebook_token", "api_key",
+               "secret_key"}
+# Keys that hold image payloads
+IMAGE_KEYS = {"image", "images", "output_image", "input_image", "body"}
+
+_DATA_URL = re.compile(r"data:[\w/+.-]+;base64,[A-Za-z0-9+/=]+")
+_BASE64_RUN = re.compile(r"[A-Za-z0-9+/]{256,}={0,2}")
+_BEARER = re.compile(r"(Bearer\s+)[\w\-.~+/=]+", re.IGNORECASE)
+_JWT = re.compile(r"eyJ[\w-]{8,}\.[\w-]{8,}\.[\w-]{8,}")
+# The authorization code in an OAuth callback URL
+_OAUTH_CODE = re.compile(r"(/callback\?(?:[^\s#]*&)?code=)[^&\s#]+")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def redact_text(text: str, max_length: int = settings.LOG_MAX_FIELD_LENGTH) -> str:
+    """Collapse base64 payloads, mask tokens and truncate"""
+    text = _DATA_URL.sub(lambda m: f"<data url {len(m.group(0))} chars>", text)
+    text = _BASE64_RUN.sub(lambda m: f"<base64 {len(m.group(0))} chars>", text)
+    text = _BEARER.sub(r"\1<redacted>", text)
+    text = _JWT.sub("<jwt>", text)
+    text = _OAUTH_CODE.sub(r"\1<redacted>", text)
+    if len(text) > max_length:
+        text = f"{text[:max_length]}... <{len(text) - max_length} more chars>"
+    return text
+
+
+def redact(value: Any, max_length: int = settings.LOG_MAX_FIELD_LENGTH, key: Optional[str] = None) -> Any:
+    """Redacted copy of a value bound for a log line, recursing into dicts and lists"""
+    if key and key.lower() in SECRET_KEYS and value:
+        return "<redacted>"
+    if isinstance(value, dict):
+        return {k: redact(v, max_length, str(k)) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v, max_length, key) for v in value]
+    if isinstance(value, (bytes, bytearray)):
+        return f"<{len(value)} bytes>"
+    if isinstance(value, str):
+        if key and key.lower() in IMAGE_KEYS and len(value) > 64:
+            return f"<{len(value)} chars>"
+        return redact_text(value, max_length)
+    return value
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of DEBUG records, or of any record logged with extra={"sample": rate}.
+
+    DEBUG records are only sampled when LOG_DEBUG_SAMPLE_RATE is set below 1.
+    """
+
+    def __init__(self, debug_rate: float = settings.LOG_DEBUG_SAMPLE_RATE):
+        super().__init__()
+        self.debug_rate = debug_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = getattr(record, "sample", None)
+        if rate is None and record.levelno <= logging.DEBUG:
+            rate = self.debug_rate
+        return rate is None or rate >= 1 or random.random() < rate
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records untouched; formatting happens on the listener thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class StructuredFormatter(logging.Formatter):
+    """One JSON object per line (or key=value text), with payloads redacted"""
+
+    def __init__(self, fmt: str = settings.LOG_FORMAT):
+        super().__init__()
+        self.json = fmt == "json"
+
+    def format(self, record: logging.LogRecord) -> str:
+        try:
+            message = record.getMessage()
+        except Exception as e:
+            message = f"{record.msg!r} (formatting failed: {e})"
+        fields = {k: redact(v, key=k) for k, v in vars(record).items() if k not in _RECORD_ATTRS}
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": redact_text(message),
+            **fields,
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        if self.json:
+            return json.dumps(entry, default=str)
+        extras = " ".join(f"{k}={v}" for k, v in fields.items())
+        text = f"{entry['ts']} {record.levelname:<7} {record.name}: {entry['msg']}" + (f" {extras}" if extras else "")
+        return text + (f"\n{entry['exc']}" if record.exc_info else "")
+
+
+def configure_logging(stream=None, level: str = settings.LOG_LEVEL, levels: str = settings.LOG_LEVELS):
+    """Route all logging through one queue and a background writer.
+
+    `levels` sets per-logger levels, e.g. "app.routers.images=DEBUG,httpx=WARNING".
+    Safe to call again; the previous listener is stopped first.
+    """
+    global _listener
+    shutdown_logging()
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(StructuredFormatter())
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+    _listener.start()
+
+    handler = DeferredQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter())
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level.upper())
+    for entry in filter(None, (part.strip() for part in levels.split(","))):
+        name, _, logger_level = entry.partition("=")
+        logging.getLogger(name.strip()).setLevel(logger_level.strip().upper())
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,195 @@
+"""In-process counters, gauges and histograms rendered in the Prometheus text format.
+
+Also collects per-request timings for the Server-Timing response header.
+"""
+import abc
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_registry: List["Metric"] = []
+
+# (name, seconds) entries for the request being handled, or None outside a request
+_server_timing: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("server_timing", default=None)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metric(abc.ABC):
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: tuple, extra: Iterable[Tuple[str, str]] = ()) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    @abc.abstractmethod
+    def samples(self) -> List[str]:
+        """Exposition lines for the metric's current values"""
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}",
+                f"# TYPE {self.name} {self.type}"] + self.samples()
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{self._labels(key)} {value}" for key, value in values]
+
+
+class Gauge(Metric):
+    """A settable value, or one read from `function` at scrape time"""
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 function: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+        self._values: Dict[tuple, float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self) -> List[str]:
+        if self.function is not None:
+            try:
+                return [f"{self.name} {self.function()}"]
+            except Exception:
+                return []
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{self._labels(key)} {value}" for key, value in values]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> (per-bucket counts with a trailing +Inf slot, sum)
+        self._values: Dict[tuple, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    @contextmanager
+    def time(self, timing: Optional[str] = None, **labels):
+        """Observe the duration of the block; also report it as `timing` in Server-Timing"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe(elapsed, **labels)
+            if timing:
+                record_timing(timing, elapsed)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{self._labels(key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {total}")
+            lines.append(f"{self.name}_count{self._labels(key)} {cumulative}")
+        return lines
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format"""
+    return "\n".join(line for metric in _registry for line in metric.render()) + "\n"
+
+
+def record_timing(name: str, seconds: float):
+    """Add an entry to the current request's Server-Timing header, if there is one"""
+    timings = _server_timing.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+def start_request_timings():
+    """Begin collecting Server-Timing entries; returns the list and a reset token"""
+    timings: List[Tuple[str, float]] = []
+    return timings, _server_timing.set(timings)
+
+
+def end_request_timings(token):
+    _server_timing.reset(token)
+
+
+def server_timing_header(timings: List[Tuple[str, float]]) -> str:
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings)
+
+
+# HTTP
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by route and status",
+                        ["method", "route", "status"])
+HTTP_REQUEST_SECONDS = Histogram("http_request_duration_seconds", "HTTP request latency by route",
+                                 ["method", "route"])
+
+# Image pipeline
+PIPELINE_STAGE_SECONDS = Histogram("pipeline_stage_duration_seconds",
+                                   "Time spent in each stage of the image pipeline", ["stage"])
+IMAGE_JOBS_SUBMITTED = Counter("image_jobs_submitted_total", "Jobs submitted to RunPod by workflow",
+                               ["workflow"])
+RUNPOD_REQUEST_SECONDS = Histogram("runpod_request_duration_seconds", "RunPod API call latency by operation",
+                                   ["operation"])
+STORAGE_SECONDS = Histogram("storage_operation_duration_seconds", "Object storage latency by operation",
+                            ["operation"])
+WEBHOOK_DB_LAG_SECONDS = Histogram("webhook_to_db_seconds",
+                                   "Time from receiving a RunPod webhook to its status being committed")
+EXECUTOR_SECONDS = Histogram("executor_task_duration_seconds",
+                             "CPU work moved off the event loop, including time queued, by pool", ["pool"])
+JOB_TRACKER_UPDATES = Counter("job_tracker_updates_total", "In-memory job status updates by status", ["status"])
+
+# Database pool
+DB_POOL_CHECKOUT_WAIT_SECONDS = Histogram("db_pool_checkout_wait_seconds",
+                                          "Time spent waiting for a pooled database connection",
+                                          buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0))
+DB_CONNECTION_HOLD_SECONDS = Histogram("db_connection_hold_seconds",
+                                       "How long a database connection stays checked out")
@@ -1,47 +1,143 @@
-
-from typing import Optional
-import base64
+import logging
 from replit.object_storage import Client
+import asyncio
+import ipaddress
 import os
+import socket
+import tempfile
+from typing import Optional
+from urllib.parse import urljoin, urlparse
 
-async def save_base64_image(base64_data: str, folder: str, filename: str) -> str:
-    # Remove data URI prefix if present
-    base64_image = base64_data.replace("data:image/png;base64,", "")
-    
-    # Convert to bytes
-    image_data = base64.b64decode(base64_image)
-    
-    # Create object path
-    object_path = f"{folder}/{filename}"
-    
-    # Save to object storage using the client
-    client = Client()
-    client.upload_bytes(object_path, image_data)
-    
-    return object_path
-from replit.object_storage import Client
-import base64
-import io
+import httpx
+
+from app.config import settings
+from app.services.executor import executor
+from app.services.tracing import tracer
+from app.utils.image_utils import base64_start, decode_base64
+from app.utils.metrics import STORAGE_SECONDS
+
+logger = logging.getLogger(__name__)
 
 storage = Client()
 
+# Shared by every output download so connections to a worker's bucket are reused
+_download_client: Optional[httpx.AsyncClient] = None
+
+
+def download_client() -> httpx.AsyncClient:
+    global _download_client
+    if _download_client is None or _download_client.is_closed:
+        _download_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.OUTPUT_DOWNLOAD_TIMEOUT, connect=5.0),
+            limits=httpx.Limits(max_connections=settings.OUTPUT_DOWNLOAD_CONNECTIONS,
+                                max_keepalive_connections=settings.OUTPUT_DOWNLOAD_CONNECTIONS),
+            follow_redirects=False)  # redirects are followed by hand so every hop is checked
+    return _download_client
+
+
+async def close_download_client():
+    global _download_client
+    if _download_client is not None:
+        await _download_client.aclose()
+        _download_client = None
+
 async def save_base64_image(base64_str: str, folder: str, filename: str) -> str:
     """Save base64 image to object storage"""
     try:
-        # Remove data:image prefix if present
-        if ',' in base64_str:
-            base64_str = base64_str.split(',')[1]
-            
-        # Decode base64 to bytes
-        image_bytes = base64.b64decode(base64_str)
+        # Decode in the codec pool, skipping any data:image prefix without copying the string
+        with tracer.span("storage.decode", bytes=len(base64_str)):
+            image_bytes = await executor.run_codec(decode_base64, base64_str, base64_start(base64_str))
         
         # Create full path
         full_path = f"{folder}/{filename}"
         
-        # Upload bytes to storage
-        storage.upload_from_bytes(full_path, image_bytes)
+        # Upload bytes to storage off the event loop; the client is blocking
+        with STORAGE_SECONDS.time("storage_upload", operation="upload"), tracer.span("storage.upload", path=full_path):
+            await asyncio.to_thread(storage.upload_from_bytes, full_path, image_bytes)
         
         return full_path
     except Exception as e:
-        print(f"[Storage] Failed to save image: {e}")
+        logger.error("Failed to save image: %s", e)
         raise
+
+async def save_image_file(local_path: str, folder: str, filename: str) -> str:
+    """Upload an image that is already decoded to a local file"""
+    full_path = f"{folder}/{filename}"
+    with STORAGE_SECONDS.time("storage_upload", operation="upload"), tracer.span("storage.upload", path=full_path):
+        await asyncio.to_thread(storage.upload_from_filename, full_path, local_path)
+    return full_path
+
+def output_host_allowed(host: str) -> bool:
+    """Whether OUTPUT_URL_HOSTS lists the host or a parent domain; an empty list allows nothing"""
+    allowed = [name.strip().lower() for name in settings.OUTPUT_URL_HOSTS.split(",") if name.strip()]
+    host = host.lower()
+    return any(host == name or host.endswith("." + name) for name in allowed)
+
+
+async def check_output_url(url: str) -> None:
+    """Raise ValueError unless a worker's output URL is safe to fetch or record.
+
+    The host must be in OUTPUT_URL_HOSTS and resolve only to public
+    addresses, so a worker can't point the API at its own network.
+    """
+    parsed = urlparse(url)
+    host = parsed.hostname or ""
+    if parsed.scheme not in ("http", "https") or not host:
+        raise ValueError("Output URL must be http(s) with a host")
+    if not output_host_allowed(host):
+        raise ValueError(f"{host} is not in OUTPUT_URL_HOSTS")
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, parsed.port or 0, type=socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        raise ValueError(f"Could not resolve {host}: {e}")
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%", 1)[0])
+        if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not settings.OUTPUT_URL_ALLOW_PRIVATE and (not address.is_global or address.is_multicast):
+            raise ValueError(f"{host} resolves to non-public address {address}")
+
+
+async def _fetch(url: str, f) -> None:
+    """Stream a checked URL into f, following at most OUTPUT_DOWNLOAD_MAX_REDIRECTS checked redirects"""
+    max_bytes = settings.OUTPUT_DOWNLOAD_MAX_MB * 1024 * 1024
+    client = download_client()
+    for _ in range(settings.OUTPUT_DOWNLOAD_MAX_REDIRECTS + 1):
+        await check_output_url(url)
+        response = await client.send(client.build_request("GET", url), stream=True)
+        try:
+            if response.is_redirect:
+                url = urljoin(url, response.headers["location"])
+                continue
+            response.raise_for_status()
+            size = 0
+            async for chunk in response.aiter_bytes():
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ValueError(f"Output is larger than {settings.OUTPUT_DOWNLOAD_MAX_MB} MB")
+                f.write(chunk)
+            return
+        finally:
+            await response.aclose()
+    raise ValueError(f"More than {settings.OUTPUT_DOWNLOAD_MAX_REDIRECTS} redirects")
+
+
+async def save_image_from_url(url: str, folder: str, filename: str) -> str:
+    """Copy an image from a URL into storage, streaming it through a temporary file"""
+    fd, local_path = tempfile.mkstemp(suffix=".png")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            # Presigned URLs carry credentials in the query string
+            with STORAGE_SECONDS.time("storage_fetch", operation="fetch"), \
+                    tracer.span("storage.fetch", url=url.split("?", 1)[0]):
+                await _fetch(url, f)
+        return await save_image_file(local_path, folder, filename)
+    finally:
+        os.remove(local_path)
+
+async def delete_image(object_path: str) -> None:
+    """Remove an object from storage, ignoring objects that were never written"""
+    try:
+        await asyncio.to_thread(storage.delete, object_path, ignore_not_found=True)
+    except Exception as e:
+        logger.warning("Failed to delete %s: %s", object_path, e)
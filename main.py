@@ -11,12 +11,17 @@ import httpx
 import json
 from datetime import datetime, timedelta
 
-from app.routers import auth, user, images, workflows
+from app.routers import auth, user, images, workflows, admin
 from app.dependencies import get_current_user
 from app.config import settings
+from app.utils.log import configure_logging, shutdown_logging
+from app.middleware.metrics import MetricsMiddleware
 
 
 
+# Queue-backed logging so log writes never block the event loop
+configure_logging()
+
 app = FastAPI(title="NurseFilter API", 
               description="A service that processes images with nurse-themed LoRAs using Stable Diffusion")
 
@@ -27,7 +32,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+app.add_middleware(MetricsMiddleware)
+if settings.PROFILER_ENABLED:
+    from app.middleware.profiler import ProfilerMiddleware
+    app.add_middleware(ProfilerMiddleware)
+if settings.TRAFFIC_RECORD_FILE:
+    from app.middleware.recorder import RunPodStatusRecorder, TrafficRecorderMiddleware
+    from app.services.runpod_service import runpod_service
+    app.add_middleware(TrafficRecorderMiddleware, path=settings.TRAFFIC_RECORD_FILE)
+    runpod_service.status_listeners.append(RunPodStatusRecorder(settings.TRAFFIC_RECORD_FILE))
 
 # Static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -37,11 +52,19 @@ app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(user.router, prefix="/api/user", tags=["Users"])
 app.include_router(images.router, prefix="/api/images", tags=["Images"])
 app.include_router(workflows.router, prefix="/api/workflows", tags=["Workflows"])
+app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to NurseFilter API"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    from fastapi.responses import PlainTextResponse
+    from app.utils.metrics import render
+
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 def health_check():
     from sqlalchemy import text
@@ -55,9 +78,14 @@ def health_check():
     except Exception as e:
         db_status = f"error: {str(e)}"
     
+    from app.services.job_status import job_status_resolver
+    from app.services.loop_monitor import loop_monitor
+
     return {
         "status": "ok",
         "database": db_status,
+        "job_status_lookups": job_status_resolver.tier_counts,
+        "event_loop": loop_monitor.report(),
         "timestamp": datetime.now().isoformat()
     }
 
@@ -94,10 +122,64 @@ async def startup_event():
         except Exception as e:
             print(f"✗ {dir}: {str(e)}")
 
+    import asyncio
+
+    # Measure event loop lag and log whatever blocks it
+    from app.services.loop_monitor import loop_monitor
+    loop_monitor.start()
+
+    # Spawn the image processes before the first upload needs one
+    from app.services.executor import executor
+    try:
+        await executor.start()
+    except Exception as e:
+        print(f"✗ Image process pool failed to start: {e}")
+
+    # Cancel jobs that run past their workflow deadline
+    from app.services.job_tracker import JobTracker
+    asyncio.create_task(JobTracker.enforce_deadlines())
+
+    # Keep endpoint pool health fresh for routing
+    from app.services.endpoint_router import endpoint_router
+    asyncio.create_task(endpoint_router.run())
+
+    # Seed completion estimates from recently finished requests
+    from app.services.eta_estimator import eta_estimator
+    try:
+        await asyncio.to_thread(eta_estimator.seed)
+    except Exception as e:
+        print(f"✗ ETA seeding failed: {e}")
+
+    # Keep endpoints warm ahead of predicted busy hours
+    if settings.WARM_SCHEDULER_ENABLED:
+        from app.services.warm_scheduler import warm_scheduler
+        warm_scheduler.start()
+
     # Scan for LoRAs on startup - Removed theme scanning.
     print("\nLoRA Scanning: Skipped (Theme functionality removed)")
     print("\n===============================")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Make sure queued status transitions reach the database
+    from app.services.status_writer import status_writer
+    from app.services.runpod_service import runpod_service
+    await status_writer.close()
+    # Resetting warmed endpoints calls RunPod, so it goes before the client is closed
+    if settings.WARM_SCHEDULER_ENABLED:
+        from app.services.warm_scheduler import warm_scheduler
+        await warm_scheduler.stop()
+    from app.services.executor import executor
+    executor.shutdown()
+    from app.utils.storage import close_download_client
+    await close_download_client()
+    from app.services.loop_monitor import loop_monitor
+    loop_monitor.stop()
+    await runpod_service.close()
+    from app.services.tracing import tracer
+    await tracer.close()
+    shutdown_logging()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
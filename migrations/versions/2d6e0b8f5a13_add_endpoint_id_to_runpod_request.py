@@ -0,0 +1,28 @@
+"""add endpoint_id to runpod_request
+
+Revision ID: 2d6e0b8f5a13
+Revises: 7f3a9c21d4e8
+Create Date: 2026-10-19 11:40:02.734519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2d6e0b8f5a13'
+down_revision: Union[str, None] = '7f3a9c21d4e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('runpod_requests', sa.Column('endpoint_id', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('runpod_requests', 'endpoint_id')
@@ -0,0 +1,47 @@
+"""index runpod_job_id and active status
+
+Revision ID: 7f3a9c21d4e8
+Revises: bc0952c8eed1
+Create Date: 2026-10-19 09:12:44.118302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f3a9c21d4e8'
+down_revision: Union[str, None] = 'bc0952c8eed1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Nothing kept runpod_job_id unique before this, so duplicates may exist. Keep it on one row per job
+    # (the completed one if any, else the oldest) and clear it on the rest, or the unique index fails.
+    op.execute(sa.text("""
+        UPDATE runpod_requests SET runpod_job_id = NULL
+        WHERE runpod_job_id IS NOT NULL AND id <> (
+            SELECT keep.id FROM runpod_requests AS keep
+            WHERE keep.runpod_job_id = runpod_requests.runpod_job_id
+            ORDER BY CASE WHEN keep.status = 'completed' THEN 0 ELSE 1 END, keep.id
+            LIMIT 1
+        )
+    """))
+    op.create_index(op.f('ix_runpod_requests_runpod_job_id'), 'runpod_requests', ['runpod_job_id'], unique=True)
+    op.create_index(
+        'ix_runpod_requests_active_status',
+        'runpod_requests',
+        ['status'],
+        unique=False,
+        postgresql_where=sa.text("status IN ('pending', 'submitted', 'processing')")
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_runpod_requests_active_status', table_name='runpod_requests')
+    op.drop_index(op.f('ix_runpod_requests_runpod_job_id'), table_name='runpod_requests')
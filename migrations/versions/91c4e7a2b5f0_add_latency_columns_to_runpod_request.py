@@ -0,0 +1,38 @@
+"""add latency columns to runpod_request
+
+Revision ID: 91c4e7a2b5f0
+Revises: 2d6e0b8f5a13
+Create Date: 2026-10-19 14:05:27.402871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '91c4e7a2b5f0'
+down_revision: Union[str, None] = '2d6e0b8f5a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('runpod_requests', sa.Column('delay_time_ms', sa.Integer(), nullable=True))
+    op.add_column('runpod_requests', sa.Column('execution_time_ms', sa.Integer(), nullable=True))
+    op.add_column('runpod_requests', sa.Column('ingest_ms', sa.Integer(), nullable=True))
+    op.add_column('runpod_requests', sa.Column('upload_ms', sa.Integer(), nullable=True))
+    op.add_column('runpod_requests', sa.Column('completion_ms', sa.Integer(), nullable=True))
+    op.create_index('ix_runpod_requests_completed_at', 'runpod_requests', ['completed_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_runpod_requests_completed_at', table_name='runpod_requests')
+    op.drop_column('runpod_requests', 'completion_ms')
+    op.drop_column('runpod_requests', 'upload_ms')
+    op.drop_column('runpod_requests', 'ingest_ms')
+    op.drop_column('runpod_requests', 'execution_time_ms')
+    op.drop_column('runpod_requests', 'delay_time_ms')
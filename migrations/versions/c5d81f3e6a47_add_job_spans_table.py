@@ -0,0 +1,44 @@
+"""add job_spans table
+
+Revision ID: c5d81f3e6a47
+Revises: 91c4e7a2b5f0
+Create Date: 2026-10-19 16:42:11.093518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d81f3e6a47'
+down_revision: Union[str, None] = '91c4e7a2b5f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'job_spans',
+        sa.Column('span_id', sa.String(), nullable=False),
+        sa.Column('trace_id', sa.String(), nullable=True),
+        sa.Column('parent_span_id', sa.String(), nullable=True),
+        sa.Column('job_id', sa.String(), nullable=True),
+        sa.Column('request_id', sa.String(), nullable=True),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('start_time_ns', sa.BigInteger(), nullable=True),
+        sa.Column('end_time_ns', sa.BigInteger(), nullable=True),
+        sa.Column('attributes', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('span_id'),
+    )
+    op.create_index('ix_job_spans_trace_id', 'job_spans', ['trace_id'], unique=False)
+    op.create_index('ix_job_spans_job_id', 'job_spans', ['job_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_job_spans_job_id', table_name='job_spans')
+    op.drop_index('ix_job_spans_trace_id', table_name='job_spans')
+    op.drop_table('job_spans')
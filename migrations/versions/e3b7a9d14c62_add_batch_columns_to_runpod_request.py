@@ -0,0 +1,32 @@
+"""add batch columns to runpod_request
+
+Revision ID: e3b7a9d14c62
+Revises: c5d81f3e6a47
+Create Date: 2026-10-19 18:21:44.617203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3b7a9d14c62'
+down_revision: Union[str, None] = 'c5d81f3e6a47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('runpod_requests', sa.Column('batch_id', sa.String(), nullable=True))
+    op.add_column('runpod_requests', sa.Column('batch_index', sa.Integer(), nullable=True))
+    op.create_index('ix_runpod_requests_batch_id', 'runpod_requests', ['batch_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_runpod_requests_batch_id', table_name='runpod_requests')
+    op.drop_column('runpod_requests', 'batch_index')
+    op.drop_column('runpod_requests', 'batch_id')
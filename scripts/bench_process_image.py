@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark time-to-job-id for POST /api/images/process-image.
+
+Storage, database and RunPod are replaced with local fakes that add a fixed
+latency, so the numbers show how much of that latency the pipeline overlaps.
+Usage: python scripts/bench_process_image.py [iterations]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import statistics
+import tempfile
+
+# Use a throwaway SQLite database instead of the configured one
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+
+STORAGE_LATENCY = 0.120  # object storage upload
+DB_LATENCY = 0.040       # insert + commit round trips to a remote database
+RUNPOD_LATENCY = 0.250   # POST /run
+
+
+class FakeStorage:
+    """Blocking client, like replit.object_storage.Client"""
+
+    def upload_from_bytes(self, path, data):
+        time.sleep(STORAGE_LATENCY)
+
+    def delete(self, path, ignore_not_found=False):
+        pass
+
+
+async def fake_runpod(request: httpx.Request) -> httpx.Response:
+    await asyncio.sleep(RUNPOD_LATENCY)
+    return httpx.Response(200, json={"id": f"job-{time.perf_counter_ns()}", "status": "IN_QUEUE"})
+
+
+class FakeRunPodClient(httpx.AsyncClient):
+
+    def __init__(self, *args, **kwargs):
+        kwargs["transport"] = httpx.MockTransport(fake_runpod)
+        super().__init__(*args, **kwargs)
+
+
+def install_fakes():
+    from app.utils import storage
+    from app.repository import runpod as runpod_repo
+    from app.services.job_tracker import JobTracker
+
+    storage.storage = FakeStorage()
+    httpx.AsyncClient = FakeRunPodClient
+
+    create_request = runpod_repo.create_request
+
+    def slow_create_request(*args, **kwargs):
+        time.sleep(DB_LATENCY)
+        return create_request(*args, **kwargs)
+
+    runpod_repo.create_request = slow_create_request
+
+    async def no_polling(cls, job_id, **kwargs):
+        return None
+
+    JobTracker.poll_job_status = classmethod(no_polling)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    install_fakes()
+
+    from app.database import SessionLocal
+    from app.routers.images import process_image, ImageProcessRequest
+
+    image = "iVBORw0KGgo" * 20000  # ~220 KB of base64
+    timings = []
+    for _ in range(iterations):
+        db = SessionLocal()
+        try:
+            start = time.perf_counter()
+            response = await process_image(
+                ImageProcessRequest(workflow_name="lastnurses_api", image=image),
+                db=db)
+            timings.append(time.perf_counter() - start)
+            assert response.job_id
+        finally:
+            db.close()
+
+    sequential = STORAGE_LATENCY + DB_LATENCY + RUNPOD_LATENCY
+    print(f"Iterations:              {iterations}")
+    print(f"Sequential lower bound:  {sequential * 1000:.1f} ms")
+    print(f"time-to-job-id p50:      {percentile(timings, 50) * 1000:.1f} ms")
+    print(f"time-to-job-id p99:      {percentile(timings, 99) * 1000:.1f} ms")
+    print(f"time-to-job-id mean:     {statistics.mean(timings) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark RunPod webhook latency under different logging setups.
+
+Each iteration POSTs a COMPLETED webhook carrying a multi-MB base64 image to
+the images router (storage is faked, the database is a throwaway SQLite file).
+Log output goes to a sink limited to ~50 MB/s, standing in for a container's
+stdout pipe. Compared setups:
+  sync-unredacted  DEBUG through a plain blocking StreamHandler, full payloads
+                   (roughly what the old print statements cost)
+  queued-info      the default: INFO through the queue handler
+  queued-debug     DEBUG through the queue handler, payloads redacted, sampled
+  queued-debug-all DEBUG through the queue handler with sampling disabled
+Usage: python scripts/bench_webhook_logging.py [iterations] [image_mb]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import tempfile
+
+# Use a throwaway SQLite database instead of the configured one
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+
+SINK_BYTES_PER_SECOND = 50_000_000
+
+
+class FakeStorage:
+
+    def upload_from_bytes(self, path, data):
+        pass
+
+    def upload_from_filename(self, path, filename):
+        pass
+
+    def delete(self, path, ignore_not_found=False):
+        pass
+
+
+class SlowSink:
+    """Write-only stream with limited throughput, like a busy stdout pipe"""
+
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, text):
+        self.bytes += len(text)
+        time.sleep(len(text) / SINK_BYTES_PER_SECOND)
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+class UnredactedFormatter(logging.Formatter):
+    """Message plus extra fields verbatim, formatted on the calling thread"""
+
+    def format(self, record):
+        extras = {k: v for k, v in vars(record).items() if k in ("headers", "payload")}
+        return f"{record.levelname} {record.name}: {record.getMessage()} {extras}"
+
+
+def configure(setup, sink):
+    from app.utils import log
+
+    log.shutdown_logging()
+    if setup == "sync-unredacted":
+        handler = logging.StreamHandler(sink)
+        handler.setFormatter(UnredactedFormatter())
+        logging.getLogger().handlers = [handler]
+        logging.getLogger().setLevel(logging.DEBUG)
+        return
+    log.configure_logging(stream=sink, level="DEBUG" if setup.startswith("queued-debug") else "INFO")
+    rate = 1.0 if setup == "queued-debug-all" else 0.1
+    for handler in logging.getLogger().handlers:
+        for f in handler.filters:
+            f.debug_rate = rate
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(setup, iterations, image, client):
+    from app.database import SessionLocal
+    from app.repository import runpod as runpod_repo
+
+    db = SessionLocal()
+    job_ids = []
+    for i in range(iterations):
+        request = runpod_repo.create_request(db, workflow_id="lastnurses_api", input_image_url="bench")
+        job_id = f"{setup}-{i}"
+        runpod_repo.update_request_status(db, request.id, "submitted", runpod_job_id=job_id)
+        job_ids.append(job_id)
+    db.close()
+
+    sink = SlowSink()
+    configure(setup, sink)
+    timings = []
+    for job_id in job_ids:
+        payload = {"id": job_id, "status": "COMPLETED", "delayTime": 900, "executionTime": 4000,
+                   "output": {"output_image": image}}
+        start = time.perf_counter()
+        response = await client.post("/api/images/webhook/runpod", json=payload,
+                                     headers={"Authorization": "Bearer not-a-real-token"})
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+    # Drain whatever the writer thread still has queued
+    from app.utils import log
+    log.shutdown_logging()
+    return timings, sink.bytes
+
+
+async def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    image_mb = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    image = "iVBORw0KGgo" * int(image_mb * 1_000_000 / 11)
+
+    from fastapi import FastAPI
+    from app.utils import storage
+    from app.routers import images
+
+    storage.storage = FakeStorage()
+    app = FastAPI()
+    app.include_router(images.router, prefix="/api/images")
+
+    print(f"{iterations} webhooks with a {len(image) / 1e6:.1f} MB image, log sink at "
+          f"{SINK_BYTES_PER_SECOND / 1e6:.0f} MB/s")
+    print(f"{'setup':<18} {'p50 ms':>8} {'p99 ms':>8} {'logged':>10}")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for setup in ("sync-unredacted", "queued-info", "queued-debug", "queued-debug-all"):
+            timings, logged = await run(setup, iterations, image, client)
+            print(f"{setup:<18} {percentile(timings, 50) * 1000:8.1f} {percentile(timings, 99) * 1000:8.1f} "
+                  f"{logged / 1e3:8.1f}KB")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
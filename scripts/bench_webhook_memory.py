@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Peak RSS of the API while it takes large completion webhooks.
+
+Runs the API in a child process (as scripts/load_test.py does) once with
+STREAM_DECODE_OUTPUTS off, which buffers the body and decodes the parsed
+JSON, once with it on, which decodes the output image to a file while the
+body arrives, and once with the output sent as a URL that the API copies
+into storage. Each run POSTs webhooks for an `--output-mb` image one after
+another and reports how far the child's peak RSS rose above idle.
+Usage: python scripts/bench_webhook_memory.py [--output-mb 20] [--requests 3]
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+
+from load_test import percentile, read_memory, start_api, wait_ready
+from replay_traffic import seed_database
+
+# mode -> (STREAM_DECODE_OUTPUTS, output sent by URL)
+MODES = {"buffered": ("false", False), "streaming": ("true", False), "url": ("true", True)}
+
+
+def reset_peak(pid):
+    """Restart VmHWM from the current RSS so startup doesn't count; Linux only"""
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def webhook_body(job_id, image, output_base=None):
+    if output_base:
+        output = {"image_url": f"{output_base}/outputs/{job_id}.png"}
+    else:
+        output = {"images": [{"image": "IMAGE"}]}
+    body = json.dumps({"id": job_id, "status": "COMPLETED", "delayTime": 120, "executionTime": 9000,
+                       "output": output}).encode()
+    if output_base:
+        return body
+    before, after = body.split(b'"IMAGE"')
+    return before + b'"' + image + b'"' + after
+
+
+def output_app(image_bytes):
+    """Serves every output URL, standing in for a worker's bucket"""
+    from fastapi import FastAPI, Response
+
+    app = FastAPI()
+
+    @app.get("/outputs/{name}")
+    async def output(name: str):
+        return Response(content=image_bytes, media_type="image/png")
+
+    return app
+
+
+async def measure(mode, args, workdir, job_ids, image):
+    stream_decode, by_url = MODES[mode]
+    os.environ["STREAM_DECODE_OUTPUTS"] = stream_decode
+    output_base = f"http://127.0.0.1:{args.runpod_port}" if by_url else None
+    process, log_path = start_api(args.api_port, args.runpod_port, workdir)
+    latencies = []
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.api_port}", timeout=120.0) as client:
+            await wait_ready(client, process, log_path)
+            await asyncio.sleep(1.0)  # let startup tasks settle
+            idle = read_memory(process.pid, "VmRSS")
+            peak_reset = reset_peak(process.pid)
+            for job_id in job_ids:
+                body = webhook_body(job_id, image, output_base)
+                started = time.perf_counter()
+                response = await client.post("/api/images/webhook/runpod", content=body,
+                                             headers={"Content-Type": "application/json"})
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200 or not response.json().get("image_url"):
+                    sys.exit(f"{mode}: webhook for {job_id} answered {response.status_code} "
+                             f"{response.text[:200]}; see {log_path}")
+            peak = read_memory(process.pid, "VmHWM")
+    finally:
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return idle, peak, peak_reset, latencies
+
+
+async def run(args):
+    import base64
+    import uvicorn
+
+    workdir = tempfile.mkdtemp(prefix="webhook-memory-")
+    job_ids = {mode: [f"mem-{mode}-{i}" for i in range(args.requests)] for mode in MODES}
+    seed_database(workdir, [job_id for ids in job_ids.values() for job_id in ids])
+    # Random bytes: the API never looks inside the image, and they don't compress
+    image_bytes = os.urandom(args.output_mb * 2**20)
+    image = base64.b64encode(image_bytes)
+    bucket = uvicorn.Server(uvicorn.Config(output_app(image_bytes), host="127.0.0.1", port=args.runpod_port,
+                                           log_level="warning"))
+    bucket_task = asyncio.create_task(bucket.serve())
+
+    print(f"{args.requests} webhooks per mode, {args.output_mb} MB output "
+          f"({len(image) / 2**20:.1f} MB as base64)")
+    try:
+        for mode in MODES:
+            idle, peak, peak_reset, latencies = await measure(mode, args, workdir, job_ids[mode], image)
+            if idle is None or peak is None:
+                sys.exit("Peak RSS is read from /proc; run this on Linux")
+            growth = peak - idle
+            print(f"{mode:<10} idle {idle / 2**20:7.1f} MB  peak {peak / 2**20:7.1f} MB  "
+                  f"growth {growth / 2**20:7.1f} MB ({growth / (args.output_mb * 2**20):4.1f}x output)  "
+                  f"p50 {percentile(latencies, 50) * 1000:7.1f} ms"
+                  + ("" if peak_reset else "  (peak includes startup)"))
+    finally:
+        bucket.should_exit = True
+        await bucket_task
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output-mb", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=3)
+    parser.add_argument("--api-port", type=int, default=8020)
+    parser.add_argument("--runpod-port", type=int, default=8021, help="serves the URL outputs")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the RunPod serverless API.
+
+Implements /run, /runsync, /status, /cancel, /stream and /health for any
+endpoint ID. Jobs wait in a queue for one of `workers` simulated workers,
+run for a log-normally distributed time, then complete (or fail at
+`failure_rate`) and POST the result to the job's webhook like RunPod does,
+retrying failed deliveries. Webhooks can be delayed or dropped to exercise
+the poller. With --url-outputs the output is served from /outputs/ and
+returned as a URL, like workers that upload to their own bucket. Point the API at it with RUNPOD_API_BASE=http://127.0.0.1:8001.
+Usage: python scripts/fake_runpod.py [--port 8001] [--workers 4] [...]
+"""
+
+import os
+import sys
+import time
+import uuid
+import base64
+import random
+import asyncio
+import argparse
+from typing import Dict, List, Optional
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request, Response
+
+TERMINAL_STATUSES = ("COMPLETED", "FAILED", "CANCELLED", "TIMED_OUT")
+
+
+class FakeRunPodConfig:
+
+    def __init__(self, workers=4, execution_median=2.0, execution_sigma=0.5, cold_start=0.0,
+                 failure_rate=0.0, submit_error_rate=0.0, webhook_delay=0.05, webhook_drop_rate=0.0,
+                 webhook_retries=2, webhook_retry_delay=1.0, output_kb=512, url_outputs=False,
+                 unknown_jobs_running=False, seed=None):
+        self.workers = workers
+        self.execution_median = execution_median  # seconds
+        self.execution_sigma = execution_sigma    # log-normal shape; 0 makes every job take the median
+        self.cold_start = cold_start              # added to the first job each worker runs
+        self.failure_rate = failure_rate          # jobs that finish FAILED
+        self.submit_error_rate = submit_error_rate  # /run and /runsync answered with a 503
+        self.webhook_delay = webhook_delay
+        self.webhook_drop_rate = webhook_drop_rate  # webhooks never sent; only polling finds the job
+        self.webhook_retries = webhook_retries
+        self.webhook_retry_delay = webhook_retry_delay
+        self.output_kb = output_kb
+        self.url_outputs = url_outputs            # return {"image_url": ...} instead of inline base64
+        self.unknown_jobs_running = unknown_jobs_running  # report IDs it never saw as IN_PROGRESS (for replays)
+        self.seed = seed
+
+    @classmethod
+    def add_arguments(cls, parser: argparse.ArgumentParser):
+        defaults = cls()
+        for name, value in vars(defaults).items():
+            flag = f"--{name.replace('_', '-')}"
+            if isinstance(value, bool):
+                parser.add_argument(flag, action="store_true", default=value)
+            else:
+                parser.add_argument(flag, type=type(value) if value is not None else int, default=value)
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> "FakeRunPodConfig":
+        return cls(**{name: getattr(args, name) for name in vars(cls())})
+
+
+class FakeJob:
+
+    def __init__(self, endpoint_id: str, payload: dict, base_url: str = ""):
+        self.id = f"fake-{uuid.uuid4()}"
+        self.endpoint_id = endpoint_id
+        self.base_url = base_url  # where this fake is reachable, for URL outputs
+        self.input = payload.get("input", {})
+        self.webhook: Optional[str] = payload.get("webhook")
+        self.status = "IN_QUEUE"
+        self.submitted = time.monotonic()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.output: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.done = asyncio.Event()
+
+    def to_dict(self) -> dict:
+        data = {"id": self.id, "status": self.status}
+        if self.started is not None:
+            data["delayTime"] = int((self.started - self.submitted) * 1000)
+        if self.finished is not None and self.started is not None:
+            data["executionTime"] = int((self.finished - self.started) * 1000)
+        if self.output is not None:
+            data["output"] = self.output
+        if self.error is not None:
+            data["error"] = self.error
+        return data
+
+
+class FakeRunPod:
+    """Queue, workers and webhook delivery behind the fake API"""
+
+    def __init__(self, config: FakeRunPodConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.jobs: Dict[str, FakeJob] = {}
+        self.queue: "asyncio.Queue[FakeJob]" = asyncio.Queue()
+        self.running = 0
+        self.webhooks_sent = 0
+        self.webhooks_dropped = 0
+        self.webhooks_failed = 0
+        # job id -> status answers recorded from RunPod, served in order for jobs it never ran (replays)
+        self.recorded_statuses: Dict[str, List[dict]] = {}
+        self._workers = []
+        self._deliveries = set()
+        self._client: Optional[httpx.AsyncClient] = None
+        # Any bytes will do; the API only decodes and stores them
+        self.output_bytes = os.urandom(config.output_kb * 1024)
+        self.output_image = base64.b64encode(self.output_bytes).decode()
+
+    async def start(self):
+        self._client = httpx.AsyncClient(timeout=30.0)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.config.workers)]
+
+    async def stop(self):
+        for task in self._workers + list(self._deliveries):
+            task.cancel()
+        await asyncio.gather(*self._workers, *self._deliveries, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+
+    def submit(self, endpoint_id: str, payload: dict, base_url: str = "") -> FakeJob:
+        if self.rng.random() < self.config.submit_error_rate:
+            raise HTTPException(503, "Endpoint temporarily unavailable")
+        job = FakeJob(endpoint_id, payload, base_url)
+        self.jobs[job.id] = job
+        self.queue.put_nowait(job)
+        return job
+
+    def cancel(self, job_id: str) -> FakeJob:
+        job = self.job(job_id)
+        if job.status not in TERMINAL_STATUSES:
+            self._finish(job, "CANCELLED")
+        return job
+
+    def job(self, job_id: str) -> FakeJob:
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPException(404, "Job not found")
+        return job
+
+    def _execution_time(self) -> float:
+        if self.config.execution_sigma <= 0:
+            return self.config.execution_median
+        return self.config.execution_median * self.rng.lognormvariate(0, self.config.execution_sigma)
+
+    async def _worker(self):
+        warm = False
+        while True:
+            job = await self.queue.get()
+            if job.status != "IN_QUEUE":
+                continue
+            job.status = "IN_PROGRESS"
+            job.started = time.monotonic()
+            self.running += 1
+            try:
+                await asyncio.sleep(self._execution_time() + (0 if warm else self.config.cold_start))
+            finally:
+                self.running -= 1
+            warm = True
+            if job.status != "IN_PROGRESS":
+                continue  # cancelled while running
+            if self.rng.random() < self.config.failure_rate:
+                job.error = "Simulated worker failure"
+                self._finish(job, "FAILED")
+            else:
+                if self.config.url_outputs:
+                    job.output = {"image_url": f"{job.base_url}/outputs/{job.id}.png"}
+                else:
+                    job.output = {"images": [{"image": self.output_image}]}
+                self._finish(job, "COMPLETED")
+
+    def _finish(self, job: FakeJob, status: str):
+        job.status = status
+        job.finished = time.monotonic()
+        job.done.set()
+        if job.webhook and status in ("COMPLETED", "FAILED"):
+            delivery = asyncio.create_task(self._deliver(job))
+            self._deliveries.add(delivery)
+            delivery.add_done_callback(self._deliveries.discard)
+
+    async def _deliver(self, job: FakeJob):
+        if self.rng.random() < self.config.webhook_drop_rate:
+            self.webhooks_dropped += 1
+            return
+        await asyncio.sleep(self.config.webhook_delay)
+        for attempt in range(self.config.webhook_retries + 1):
+            try:
+                response = await self._client.post(job.webhook, json=job.to_dict())
+                if response.status_code < 400:
+                    self.webhooks_sent += 1
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(self.config.webhook_retry_delay)
+        self.webhooks_failed += 1
+
+    def stats(self) -> dict:
+        statuses: Dict[str, int] = {}
+        for job in self.jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {"jobs": statuses, "webhooks_sent": self.webhooks_sent,
+                "webhooks_dropped": self.webhooks_dropped, "webhooks_failed": self.webhooks_failed}
+
+
+def create_app(config: FakeRunPodConfig) -> FastAPI:
+    fake = FakeRunPod(config)
+    app = FastAPI(title="Fake RunPod")
+    app.state.fake = fake
+
+    @app.on_event("startup")
+    async def startup():
+        await fake.start()
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        await fake.stop()
+
+    @app.post("/{endpoint_id}/run")
+    async def run(endpoint_id: str, request: Request):
+        job = fake.submit(endpoint_id, await request.json(), str(request.base_url).rstrip("/"))
+        return {"id": job.id, "status": job.status}
+
+    @app.post("/{endpoint_id}/runsync")
+    async def runsync(endpoint_id: str, request: Request):
+        payload = await request.json()
+        payload.pop("webhook", None)
+        job = fake.submit(endpoint_id, payload, str(request.base_url).rstrip("/"))
+        await job.done.wait()
+        return job.to_dict()
+
+    @app.get("/{endpoint_id}/status/{job_id}")
+    async def status(endpoint_id: str, job_id: str):
+        recorded = fake.recorded_statuses.get(job_id)
+        if recorded and job_id not in fake.jobs:
+            # The last answer is repeated once the recording runs out
+            return recorded.pop(0) if len(recorded) > 1 else recorded[0]
+        if config.unknown_jobs_running and job_id not in fake.jobs:
+            return {"id": job_id, "status": "IN_PROGRESS"}
+        return fake.job(job_id).to_dict()
+
+    @app.post("/{endpoint_id}/cancel/{job_id}")
+    async def cancel(endpoint_id: str, job_id: str):
+        job = fake.cancel(job_id)
+        return {"id": job.id, "status": job.status}
+
+    @app.get("/{endpoint_id}/stream/{job_id}")
+    async def stream(endpoint_id: str, job_id: str):
+        job = fake.job(job_id)
+        return {"status": job.status, "stream": [{"output": job.output}] if job.output else []}
+
+    @app.get("/{endpoint_id}/health")
+    async def health(endpoint_id: str):
+        return {
+            "jobs": {"inQueue": fake.queue.qsize(), "inProgress": fake.running},
+            "workers": {"idle": config.workers - fake.running, "running": fake.running},
+        }
+
+    @app.get("/outputs/{job_id}.png")
+    async def output(job_id: str):
+        fake.job(job_id)
+        return Response(content=fake.output_bytes, media_type="image/png")
+
+    @app.get("/stats")
+    async def stats():
+        return fake.stats()
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    FakeRunPodConfig.add_arguments(parser)
+    args = parser.parse_args(sys.argv[1:])
+    uvicorn.run(create_app(FakeRunPodConfig.from_args(args)), host=args.host, port=args.port, log_level="warning")
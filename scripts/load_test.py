@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test against a local copy of the API.
+
+The API runs in a child process on a throwaway SQLite database, with object
+storage swapped for a local directory and RunPod pointed at the in-process
+fake from scripts/fake_runpod.py (which calls the webhook back). Clients POST
+/api/images/process-image and poll /api/images/job-status until the job
+finishes, the way the frontend does. Reports throughput, submit and
+end-to-end latency percentiles and the API process's peak RSS.
+Usage: python scripts/load_test.py [--requests 200] [--concurrency 20] [fake RunPod options]
+"""
+
+import os
+import sys
+import time
+import base64
+import shutil
+import signal
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+
+from fake_runpod import FakeRunPodConfig, create_app
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+class LocalStorage:
+    """replit.object_storage.Client backed by a local directory"""
+
+    def __init__(self, *args, **kwargs):
+        self.root = os.environ["LOAD_TEST_STORAGE_DIR"]
+
+    def _path(self, name):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def upload_from_bytes(self, name, data):
+        with open(self._path(name), "wb") as f:
+            f.write(data)
+
+    def upload_from_filename(self, name, filename):
+        shutil.copyfile(filename, self._path(name))
+
+    def upload_from_text(self, name, text):
+        self.upload_from_bytes(name, text.encode())
+
+    def download_as_bytes(self, name):
+        with open(os.path.join(self.root, name), "rb") as f:
+            return f.read()
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(self.root, name))
+
+    def delete(self, name, ignore_not_found=False):
+        try:
+            os.remove(os.path.join(self.root, name))
+        except FileNotFoundError:
+            if not ignore_not_found:
+                raise
+
+
+def serve_api(port):
+    """Child process: the real app with storage replaced"""
+    import replit.object_storage
+    replit.object_storage.Client = LocalStorage
+    sys.path.insert(0, ROOT)
+    # main.py mounts ./static, which only exists in deployments
+    workdir = os.path.dirname(os.environ["LOAD_TEST_STORAGE_DIR"])
+    os.makedirs(os.path.join(workdir, "static"), exist_ok=True)
+    os.chdir(workdir)
+
+    import uvicorn
+    from main import app
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def start_api(port, runpod_port, workdir):
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{workdir}/load.db",
+        "LOAD_TEST_STORAGE_DIR": os.path.join(workdir, "storage"),
+        "BASE_URL": f"http://127.0.0.1:{port}",
+        "RUNPOD_API_BASE": f"http://127.0.0.1:{runpod_port}",
+        "RUNPOD_ENDPOINT_ID": "fake-endpoint",
+        "RUNPOD_API_KEY": "fake-key",
+        # URL outputs come from the fake on this machine
+        "OUTPUT_URL_HOSTS": "127.0.0.1",
+        "OUTPUT_URL_ALLOW_PRIVATE": "true",
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+    }
+    log = open(os.path.join(workdir, "api.log"), "w")
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve-api", "--api-port", str(port)],
+                               env=env, stdout=log, stderr=subprocess.STDOUT)
+    return process, log.name
+
+
+def read_memory(pid, field):
+    """VmRSS/VmHWM of a process in bytes, or None off Linux"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def wait_ready(client, process, log_path, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"API exited during startup; see {log_path}")
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    sys.exit(f"API did not start within {timeout}s; see {log_path}")
+
+
+async def one_job(client, image, args, results):
+    started = time.perf_counter()
+    try:
+        response = await client.post("/api/images/process-image",
+                                     json={"workflow_name": args.workflow, "image": image})
+    except httpx.HTTPError as e:
+        results["errors"].append(repr(e))
+        return
+    submitted = time.perf_counter()
+    if response.status_code != 200:
+        results["errors"].append(f"{response.status_code} {response.text[:200]}")
+        return
+    results["submit"].append(submitted - started)
+    job_id = response.json()["job_id"]
+
+    deadline = started + args.job_timeout
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(args.poll_interval)
+        try:
+            status = (await client.get(f"/api/images/job-status/{job_id}")).json().get("status", "")
+        except (httpx.HTTPError, ValueError):
+            continue
+        if status.upper() in ("COMPLETED", "FAILED", "CANCELLED"):
+            results[status.lower()].append(time.perf_counter() - started)
+            return
+    results["timeouts"] += 1
+
+
+async def run(args):
+    import uvicorn
+
+    workdir = tempfile.mkdtemp(prefix="load-test-")
+    fake_app = create_app(FakeRunPodConfig.from_args(args))
+    fake_server = uvicorn.Server(uvicorn.Config(fake_app, host="127.0.0.1", port=args.runpod_port,
+                                                log_level="warning"))
+    fake_task = asyncio.create_task(fake_server.serve())
+    process, log_path = start_api(args.api_port, args.runpod_port, workdir)
+
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    results = {"submit": [], "completed": [], "failed": [], "cancelled": [], "errors": [], "timeouts": 0}
+    rss_samples = []
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.api_port}", timeout=60.0,
+                                     limits=limits) as client:
+            await wait_ready(client, process, log_path)
+            image = base64.b64encode(os.urandom(args.image_kb * 1024)).decode()
+            baseline_rss = read_memory(process.pid, "VmRSS")
+
+            async def sample_rss():
+                while True:
+                    rss_samples.append(read_memory(process.pid, "VmRSS") or 0)
+                    await asyncio.sleep(0.1)
+
+            sampler = asyncio.create_task(sample_rss())
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def bounded():
+                async with semaphore:
+                    await one_job(client, image, args, results)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(bounded() for _ in range(args.requests)))
+            elapsed = time.perf_counter() - started
+            sampler.cancel()
+            peak_rss = read_memory(process.pid, "VmHWM") or max(rss_samples, default=0)
+    finally:
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        fake_server.should_exit = True
+        await fake_task
+
+    finished = results["completed"] + results["failed"] + results["cancelled"]
+    print(f"{args.requests} jobs, concurrency {args.concurrency}, {args.image_kb} KB input, "
+          f"{args.output_kb} KB output, {args.workers} fake workers")
+    print(f"wall time:        {elapsed:8.2f} s")
+    print(f"throughput:       {len(finished) / elapsed:8.2f} jobs/s")
+    print(f"completed/failed: {len(results['completed'])}/{len(results['failed'])}  "
+          f"cancelled {len(results['cancelled'])}  timeouts {results['timeouts']}  errors {len(results['errors'])}")
+    for name, samples in (("submit", results["submit"]), ("end-to-end", results["completed"])):
+        if samples:
+            print(f"{name + ' ms':<18}" + "  ".join(f"p{p} {percentile(samples, p) * 1000:8.1f}"
+                                                  for p in (50, 95, 99)))
+    if peak_rss:
+        print(f"API RSS:          {(baseline_rss or 0) / 2**20:8.1f} MB idle, {peak_rss / 2**20:.1f} MB peak")
+    print(f"fake RunPod:      {fake_app.state.fake.stats()}")
+    for error in results["errors"][:5]:
+        print(f"error: {error}")
+    print(f"API log:          {log_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--workflow", default="lastnurses_api")
+    parser.add_argument("--image-kb", type=int, default=256)
+    parser.add_argument("--poll-interval", type=float, default=0.25)
+    parser.add_argument("--job-timeout", type=float, default=120.0)
+    parser.add_argument("--api-port", type=int, default=8010)
+    parser.add_argument("--runpod-port", type=int, default=8011)
+    parser.add_argument("--serve-api", action="store_true", help=argparse.SUPPRESS)
+    FakeRunPodConfig.add_arguments(parser)
+    args = parser.parse_args()
+    if args.serve_api:
+        serve_api(args.api_port)
+    else:
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
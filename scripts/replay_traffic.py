@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Replay recorded RunPod webhooks and job-status polls against a local instance.
+
+Takes a file written by the traffic recorder (set TRAFFIC_RECORD_FILE on the
+API), seeds a throwaway SQLite database with a submitted request for every
+job in it, starts the API the way scripts/load_test.py does and re-sends the
+requests on the recorded schedule compressed by --speed. Images come back as
+random base64 of the recorded size. RunPod status answers in the recording
+are served by the fake RunPod, in order, to the API's status lookups and
+pollers; jobs without any are reported IN_PROGRESS. Reports achieved
+throughput, schedule slip and latency percentiles for webhooks (the
+completion path) and polls.
+
+To make a recording without production traffic, run the load test with
+TRAFFIC_RECORD_FILE=/abs/path/traffic.jsonl set.
+Usage: python scripts/replay_traffic.py traffic.jsonl [--speed 10]
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+
+from fake_runpod import FakeRunPodConfig, create_app
+from load_test import percentile, start_api, wait_ready
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+MAX_SPEED = 50
+
+
+def load_recording(path, limit=None):
+    """Inbound requests to re-send, and the RunPod status answers recorded alongside them"""
+    with open(path) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    entries.sort(key=lambda entry: entry["ts"])
+    requests = [entry for entry in entries if entry.get("source") != "runpod"]
+    return (requests[:limit] if limit else requests), [entry for entry in entries if entry.get("source") == "runpod"]
+
+
+def recorded_statuses(answers):
+    """Job id -> RunPod status answers in recorded order, images filled back in"""
+    from app.middleware.recorder import fill_images
+
+    statuses = {}
+    for entry in answers:
+        statuses.setdefault(entry["path"].rsplit("/", 1)[-1], []).append(fill_images(entry["body"]))
+    return statuses
+
+
+def job_id_of(entry):
+    if entry["path"].startswith("/api/images/job-status/"):
+        return entry["path"].rsplit("/", 1)[-1]
+    return (entry.get("body") or {}).get("id")
+
+
+def kind_of(entry):
+    if "webhook" in entry["path"]:
+        return f"webhook {(entry.get('body') or {}).get('status', '?')}"
+    return "job-status"
+
+
+def seed_database(workdir, job_ids):
+    """Submitted requests for every recorded job, so webhooks find their rows"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/load.db"
+    sys.path.insert(0, ROOT)
+    from app.database import SessionLocal
+    from app.repository import runpod as runpod_repo
+
+    db = SessionLocal()
+    try:
+        for job_id in job_ids:
+            request = runpod_repo.create_request(db, workflow_id="lastnurses_api", input_image_url="replay")
+            runpod_repo.update_request_status(db, request.id, "submitted", runpod_job_id=job_id)
+    finally:
+        db.close()
+
+
+async def send(client, entry, scheduled, results):
+    from app.middleware.recorder import fill_images
+
+    await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+    body = fill_images(entry["body"]) if entry.get("body") is not None else None
+    started = time.perf_counter()
+    url = entry["path"] + (f"?{entry['query']}" if entry.get("query") else "")
+    try:
+        response = await client.request(entry["method"], url, json=body)
+        status = response.status_code
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    results.append({"kind": kind_of(entry), "latency": time.perf_counter() - started,
+                    "slip": started - scheduled, "status": status})
+
+
+async def run(args):
+    import uvicorn
+
+    entries, answers = load_recording(args.recording, args.limit)
+    if not entries:
+        sys.exit("Recording is empty")
+    job_ids = {job_id for job_id in map(job_id_of, entries) if job_id}
+
+    workdir = tempfile.mkdtemp(prefix="replay-")
+    seed_database(workdir, job_ids)
+    statuses = recorded_statuses(answers)  # after seeding, which picks the database
+    fake_app = create_app(FakeRunPodConfig(unknown_jobs_running=True))
+    fake_app.state.fake.recorded_statuses = statuses
+    fake_server = uvicorn.Server(uvicorn.Config(fake_app, host="127.0.0.1",
+                                                port=args.runpod_port, log_level="warning"))
+    fake_task = asyncio.create_task(fake_server.serve())
+    process, log_path = start_api(args.api_port, args.runpod_port, workdir)
+
+    results = []
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.api_port}", timeout=60.0,
+                                     limits=httpx.Limits(max_connections=200)) as client:
+            await wait_ready(client, process, log_path)
+            first = entries[0]["ts"]
+            start = time.perf_counter() + 0.5
+            started = time.perf_counter()
+            await asyncio.gather(*(send(client, entry, start + (entry["ts"] - first) / args.speed, results)
+                                   for entry in entries))
+            elapsed = time.perf_counter() - started
+    finally:
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        fake_server.should_exit = True
+        await fake_task
+
+    recorded = entries[-1]["ts"] - first
+    print(f"{len(entries)} requests for {len(job_ids)} jobs, recorded over {recorded:.1f} s, replayed at {args.speed}x; "
+          f"{sum(map(len, statuses.values()))} recorded RunPod status answers to serve")
+    print(f"elapsed:      {elapsed:8.2f} s  ({len(results) / elapsed:.1f} req/s)")
+    print(f"slip:         p99 {percentile([r['slip'] for r in results], 99) * 1000:.1f} ms "
+          f"max {max(r['slip'] for r in results) * 1000:.1f} ms behind schedule")
+    print(f"{'kind':<20} {'count':>6} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for kind in sorted({r["kind"] for r in results}):
+        rows = [r for r in results if r["kind"] == kind]
+        latencies = [r["latency"] for r in rows]
+        errors = sum(1 for r in rows if not isinstance(r["status"], int) or r["status"] >= 400)
+        print(f"{kind:<20} {len(rows):6d} {errors:6d} " + " ".join(
+            f"{percentile(latencies, p) * 1000:9.1f}" for p in (50, 95, 99)))
+    print(f"API log:      {log_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("recording")
+    parser.add_argument("--speed", type=float, default=1.0, help=f"1 to {MAX_SPEED}")
+    parser.add_argument("--limit", type=int, help="replay only the first N requests")
+    parser.add_argument("--api-port", type=int, default=8010)
+    parser.add_argument("--runpod-port", type=int, default=8011)
+    args = parser.parse_args()
+    if not 0 < args.speed <= MAX_SPEED:
+        parser.error(f"--speed must be between 0 and {MAX_SPEED}")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Simulate routing a stream of jobs across several fake RunPod endpoints.
+
+Each fake endpoint has its own worker count, job latency and failure rate.
+The same arrival stream is replayed with three strategies (always the primary
+endpoint, round robin, and EndpointRouter) and the end-to-end latency
+percentiles are compared. Times are scaled down: one simulated second is 10 ms.
+Usage: python scripts/simulate_endpoint_routing.py [jobs]
+"""
+
+import os
+import sys
+import random
+import asyncio
+import itertools
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/sim.db")
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.endpoint_router import EndpointRouter
+
+SCALE = 0.01  # real seconds per simulated second
+ARRIVAL_RATE = 1.2  # jobs per simulated second
+
+# name: (workers, mean latency in simulated seconds, submit failure rate)
+ENDPOINTS = {
+    "primary": (3, 4.0, 0.0),
+    "cold": (1, 15.0, 0.0),
+    "overflow": (2, 5.0, 0.0),
+    "flaky": (4, 3.0, 0.6),
+}
+
+
+class FakeEndpoint:
+
+    def __init__(self, name, workers, latency, failure_rate, rng):
+        self.name = name
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rng = rng
+        self.workers = workers
+        self.queue = asyncio.Queue()
+        self.running = 0
+
+    def start(self):
+        return [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def _worker(self):
+        while True:
+            done = await self.queue.get()
+            self.running += 1
+            execution = self.rng.expovariate(1 / self.latency) * SCALE
+            await asyncio.sleep(execution)
+            self.running -= 1
+            done.set_result(execution)
+
+    def submit(self):
+        if self.rng.random() < self.failure_rate:
+            raise ConnectionError(f"{self.name} unavailable")
+        done = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait(done)
+        return done
+
+    def health(self):
+        return {
+            "jobs": {"inQueue": self.queue.qsize(), "inProgress": self.running},
+            "workers": {"idle": self.workers - self.running, "running": self.running},
+        }
+
+
+async def run(strategy, arrivals):
+    rng = random.Random(7)
+    endpoints = {name: FakeEndpoint(name, *spec, rng) for name, spec in ENDPOINTS.items()}
+    tasks = [t for e in endpoints.values() for t in e.start()]
+    router = EndpointRouter(failure_threshold=2, cooldown=30 * SCALE)
+    round_robin = itertools.cycle(endpoints)
+    latencies = []
+
+    async def refresh_health():
+        while True:
+            for name, endpoint in endpoints.items():
+                router.update_health(name, endpoint.health())
+            await asyncio.sleep(1 * SCALE)
+
+    async def job(job_id):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        if strategy == "router":
+            order = router.ranked(endpoints)
+        elif strategy == "round_robin":
+            first = next(round_robin)
+            order = [first] + [e for e in endpoints if e != first]
+        else:
+            order = list(endpoints)
+        for name in order:
+            try:
+                done = endpoints[name].submit()
+            except ConnectionError:
+                router.submit_failed(name)
+                await asyncio.sleep(0.5 * SCALE)  # Cost of a failed submission
+                continue
+            router.job_submitted(job_id, name)
+            execution = await done
+            router.job_finished(job_id, {"status": "COMPLETED", "executionTime": execution * 1000})
+            latencies.append((loop.time() - start) / SCALE)
+            return
+
+    health = asyncio.create_task(refresh_health())
+    jobs = []
+    for job_id, gap in enumerate(arrivals):
+        await asyncio.sleep(gap * SCALE)
+        jobs.append(asyncio.create_task(job(str(job_id))))
+    await asyncio.gather(*jobs)
+    for task in tasks + [health]:
+        task.cancel()
+    return sorted(latencies)
+
+
+def percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    rng = random.Random(42)
+    arrivals = [rng.expovariate(ARRIVAL_RATE) for _ in range(count)]
+
+    print(f"{count} jobs at {ARRIVAL_RATE}/s across {len(ENDPOINTS)} endpoints (simulated seconds)")
+    print(f"{'strategy':<12} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for strategy in ("primary", "round_robin", "router"):
+        latencies = await run(strategy, arrivals)
+        print(f"{strategy:<12} {percentile(latencies, 50):8.1f} "
+              f"{percentile(latencies, 95):8.1f} {percentile(latencies, 99):8.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
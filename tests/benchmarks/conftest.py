@@ -0,0 +1,204 @@
+"""
+Microbenchmark harness with regression gates.
+
+The `benchmark` fixture times a callable (sync or async) pytest-benchmark
+style and compares its fastest round against tests/benchmarks/baselines.json;
+the minimum is far less sensitive to a noisy machine than the median. A
+benchmark fails when it is more than the threshold (default 100%) slower
+than its baseline. Baselines are scaled by a fixed CPU calibration loop, so
+a slower or faster machine does not read as a regression.
+
+    pytest tests/benchmarks                        # run and gate
+    pytest tests/benchmarks --benchmark-save       # rewrite baselines
+    BENCHMARK_THRESHOLD=0.3 pytest tests/benchmarks
+
+A plain `pytest` leaves this directory out (see pyproject.toml). A run of
+only the benchmarks uses a throwaway SQLite database; if other tests share
+the session, DATABASE_URL is left alone and the benchmarks skip unless it
+is SQLite.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import platform
+import statistics
+import tempfile
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+BASELINES = os.path.join(os.path.dirname(__file__), "baselines.json")
+MIN_ROUNDS = 5
+MAX_ROUNDS = 200
+MIN_TIME = 0.5       # seconds of timed rounds per benchmark
+ROUND_TIME = 0.002   # calls are batched so one round takes at least this long
+
+_results = {}
+_calibration = None
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmark")
+    group.addoption("--benchmark-save", action="store_true", help="write results to baselines.json")
+    group.addoption("--benchmark-threshold", type=float, help="allowed slowdown over baseline, e.g. 0.3")
+
+
+def pytest_configure(config):
+    if all(os.path.abspath(arg.split("::", 1)[0]).startswith(os.path.dirname(os.path.abspath(__file__)))
+           for arg in config.args):
+        # Benchmarks write rows, so never against a configured database
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+
+def _option(config, name, env, default=None):
+    # Options only exist when this directory is on the command line
+    value = config.getoption(name, default=None)
+    return value if value not in (None, False) else os.environ.get(env, default)
+
+
+def pytest_collection_modifyitems(config, items):
+    from app.config import settings
+
+    if os.environ.get("BENCHMARK_SKIP"):
+        skip = pytest.mark.skip(reason="BENCHMARK_SKIP is set")
+    elif not settings.DATABASE_URL.startswith("sqlite"):
+        # Settings were loaded before this file set DATABASE_URL; the benchmarks write rows
+        skip = pytest.mark.skip(reason="benchmarks only run against a throwaway SQLite database")
+    else:
+        return
+    for item in items:
+        if "benchmark" in getattr(item, "fixturenames", ()):
+            item.add_marker(skip)
+
+
+def calibrate() -> float:
+    """Best time of a fixed hashing/dict workload on this machine"""
+    global _calibration
+    if _calibration is None:
+        def work():
+            table = {}
+            for i in range(20000):
+                table[i] = hashlib.sha256(str(i).encode()).digest()
+            return len(table)
+
+        _calibration = min(_time(work, 1) for _ in range(15))
+    return _calibration
+
+
+def _load_baselines() -> dict:
+    if not os.path.exists(BASELINES):
+        return {}
+    with open(BASELINES) as f:
+        return json.load(f)
+
+
+def _time(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return time.perf_counter() - start
+
+
+class Benchmark:
+
+    def __init__(self, name: str, config, loop: asyncio.AbstractEventLoop):
+        self.name = name
+        self.config = config
+        self.loop = loop
+        self.stats = None
+
+    def _runner(self, fn, args, kwargs):
+        """A function that makes `iterations` calls and returns the seconds they took"""
+        if asyncio.iscoroutinefunction(fn):
+            async def batch(iterations):
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    await fn(*args, **kwargs)
+                return time.perf_counter() - start
+
+            return lambda iterations: self.loop.run_until_complete(batch(iterations))
+        return lambda iterations: _time(lambda: fn(*args, **kwargs), iterations)
+
+    def __call__(self, fn, *args, **kwargs):
+        return self._measure(self._runner(fn, args, kwargs))
+
+    def with_setup(self, setup, fn, *args, **kwargs):
+        """Benchmark fn, calling setup() untimed before each call, e.g. to undo what fn changed"""
+        run = self._runner(fn, args, kwargs)
+
+        def each(iterations):
+            total = 0.0
+            for _ in range(iterations):
+                setup()
+                total += run(1)
+            return total
+
+        return self._measure(each)
+
+    def _measure(self, run):
+        first = run(1)  # warm-up, also sizes the batches
+        iterations = max(1, int(ROUND_TIME / max(first, 1e-9)))
+        rounds = []
+        while len(rounds) < MAX_ROUNDS and (len(rounds) < MIN_ROUNDS or sum(rounds) * iterations < MIN_TIME):
+            rounds.append(run(iterations) / iterations)
+        self.stats = {
+            "median": statistics.median(rounds),
+            "min": min(rounds),
+            "mean": statistics.mean(rounds),
+            "rounds": len(rounds),
+            "iterations": iterations,
+        }
+        _results[self.name] = self.stats
+        self._check()
+        return self.stats
+
+    def _check(self):
+        baseline = _load_baselines()
+        expected = baseline.get("benchmarks", {}).get(self.name)
+        if expected is None or _option(self.config, "--benchmark-save", "BENCHMARK_SAVE"):
+            return
+        threshold = float(_option(self.config, "--benchmark-threshold", "BENCHMARK_THRESHOLD", 1.0))
+        scale = calibrate() / baseline["calibration"] if baseline.get("calibration") else 1.0
+        allowed = expected["min"] * scale * (1 + threshold)
+        if self.stats["min"] > allowed:
+            pytest.fail(f"{self.name} regressed: {self.stats['min'] * 1e6:.1f} us per call, baseline "
+                        f"{expected['min'] * 1e6:.1f} us x{scale:.2f} for machine speed "
+                        f"(allowed {allowed * 1e6:.1f} us)")
+
+
+@pytest.fixture
+def benchmark(request):
+    loop = asyncio.new_event_loop()
+    yield Benchmark(request.node.name, request.config, loop)
+    loop.close()
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if not _results or not _option(session.config, "--benchmark-save", "BENCHMARK_SAVE"):
+        return
+    baseline = _load_baselines()
+    baseline["calibration"] = calibrate()
+    baseline["machine"] = f"{platform.machine()} {platform.python_implementation()} {platform.python_version()}"
+    benchmarks = baseline.setdefault("benchmarks", {})
+    for name, stats in _results.items():
+        benchmarks[name] = {"median": stats["median"], "min": stats["min"]}
+    baseline["benchmarks"] = dict(sorted(benchmarks.items()))
+    with open(BASELINES, "w") as f:
+        json.dump(baseline, f, indent=2)
+        f.write("\n")
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _results:
+        return
+    baselines = _load_baselines().get("benchmarks", {})
+    terminalreporter.write_sep("-", "benchmarks (us per call)")
+    terminalreporter.write_line(f"{'':<45} {'min':>10} {'median':>10}")
+    for name, stats in sorted(_results.items()):
+        expected = baselines.get(name)
+        change = f"{(stats['min'] / expected['min'] - 1) * 100:+6.1f}% vs baseline" if expected else "no baseline"
+        terminalreporter.write_line(f"{name:<45} {stats['min'] * 1e6:10.1f} {stats['median'] * 1e6:10.1f}  {change}")
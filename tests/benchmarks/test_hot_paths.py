@@ -0,0 +1,147 @@
+import base64
+import os
+import uuid
+
+import pytest
+from jose import jwt
+from sqlalchemy import update
+
+from app.config import settings
+from app.database import DBRunPodRequest, SessionLocal
+from app.dependencies import create_access_token, get_current_user
+from app.repository import runpod as runpod_repo
+from app.repository import user as user_repo
+from app.services.job_tracker import JobStatus, JobTracker
+from app.utils import storage
+
+# Input photos are usually 0.5-3 MB; ComfyUI outputs are PNGs of a few MB
+IMAGE_SIZES = {"256KB": 256 * 1024, "2MB": 2 * 1024 * 1024, "8MB": 8 * 1024 * 1024}
+
+
+class NullStorage:
+
+    def upload_from_bytes(self, path, data):
+        pass
+
+    def delete(self, path, ignore_not_found=False):
+        pass
+
+
+@pytest.fixture
+def null_storage(monkeypatch):
+    monkeypatch.setattr(storage, "storage", NullStorage())
+
+
+@pytest.fixture(scope="module")
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture(scope="module")
+def user(db):
+    return user_repo.create_facebook_user(db, facebook_id=str(uuid.uuid4()),
+                                          username=f"bench-{uuid.uuid4().hex[:8]}", facebook_token="token")
+
+
+@pytest.fixture(scope="module")
+def requests(db, user):
+    """A user with a realistic history of finished requests"""
+    ids = []
+    for i in range(200):
+        request = runpod_repo.create_request(db, workflow_id="lastnurses_api", input_image_url="bench",
+                                             user_id=user.id)
+        runpod_repo.update_request_status(db, request.id, "completed", output_url="bench",
+                                          runpod_job_id=f"bench-{request.id}")
+        ids.append(request.id)
+    return ids
+
+
+def image_base64(size: int) -> str:
+    return base64.b64encode(os.urandom(size)).decode()
+
+
+@pytest.mark.parametrize("size", IMAGE_SIZES)
+def test_save_base64_image(benchmark, null_storage, size):
+    image = "data:image/png;base64," + image_base64(IMAGE_SIZES[size])
+    benchmark(storage.save_base64_image, image, "uploads", "bench.png")
+
+
+def test_handle_completed_job(benchmark, null_storage):
+    from app.routers.images import handle_completed_job
+
+    data = {"id": "bench-job", "status": "COMPLETED",
+            "output": {"images": [{"image": image_base64(IMAGE_SIZES["2MB"])}]}}
+    benchmark(handle_completed_job, data)
+
+
+def test_job_tracker_at_scale(benchmark, monkeypatch):
+    monkeypatch.setattr(JobTracker, "_jobs", {})
+    for i in range(100_000):
+        JobTracker.set_job(f"job-{i}", JobStatus.PROCESSING)
+
+    def update_and_read():
+        for i in range(0, 100_000, 100):
+            JobTracker.set_job(f"job-{i}", JobStatus.COMPLETED, image_url="bench")
+            JobTracker.get_job(f"job-{i + 1}")
+
+    benchmark(update_and_read)
+
+
+def test_create_access_token(benchmark):
+    benchmark(create_access_token, {"sub": "bench"})
+
+
+def test_decode_access_token(benchmark):
+    token = create_access_token({"sub": "bench"})
+    benchmark(jwt.decode, token, settings.SECRET_KEY, algorithms=["HS256"])
+
+
+def test_get_current_user(benchmark, db, user):
+    token = create_access_token({"sub": user.username})
+    benchmark(get_current_user, token=token, db=db)
+
+
+def test_create_request(benchmark, db):
+    benchmark(runpod_repo.create_request, db, workflow_id="lastnurses_api", input_image_url="bench")
+
+
+def test_update_request_status(benchmark, db, user):
+    # pending -> submitted, the write every job makes; the setup puts the row back to pending
+    request = runpod_repo.create_request(db, workflow_id="lastnurses_api", input_image_url="bench",
+                                         user_id=user.id)
+
+    def reset():
+        db.execute(update(DBRunPodRequest).where(DBRunPodRequest.id == request.id).values(status="pending"))
+        db.commit()
+
+    def submit():
+        assert runpod_repo.update_request_status(db, request.id, "submitted", runpod_job_id=f"bench-{request.id}",
+                                                 endpoint_id="bench")
+
+    benchmark.with_setup(reset, submit)
+
+
+def test_get_request_by_job_id(benchmark, db, requests):
+    benchmark(runpod_repo.get_request_by_job_id, db, f"bench-{requests[-1]}")
+
+
+def test_get_requests_by_user(benchmark, db, user, requests):
+    benchmark(runpod_repo.get_requests_by_user, db, user.id, limit=50)
+
+
+def test_apply_status_transitions(benchmark, db, user):
+    # A status_writer flush completing 50 processing jobs; the setup puts them back to processing
+    ids = [runpod_repo.create_request(db, workflow_id="lastnurses_api", input_image_url="bench",
+                                      user_id=user.id).id for _ in range(50)]
+    updates = {request_id: {"output_image_url": f"bench-{request_id}", "completion_ms": 10} for request_id in ids}
+
+    def reset():
+        db.execute(update(DBRunPodRequest).where(DBRunPodRequest.id.in_(ids)).values(status="processing"))
+        db.commit()
+
+    def complete():
+        assert runpod_repo.apply_status_transitions(db, "completed", updates) == len(ids)
+
+    benchmark.with_setup(reset, complete)
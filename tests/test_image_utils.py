@@ -0,0 +1,22 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import base64
+
+from app.utils.image_utils import BASE64_SLICE_CHARS, base64_start, decode_base64, to_data_url
+
+
+def test_sliced_codecs_match_base64():
+    # Sizes either side of one slice, and several slices with a short tail
+    for size in (0, 1000, BASE64_SLICE_CHARS // 4 * 3, 3 * BASE64_SLICE_CHARS + 5):
+        image = os.urandom(size)
+        data_url = to_data_url(image)
+        assert data_url == "data:image/png;base64," + base64.b64encode(image).decode()
+        assert decode_base64(data_url, base64_start(data_url)) == image
+        assert decode_base64(base64.encodebytes(image).decode()) == image
+
+
+def test_data_url_keeps_existing_prefix():
+    assert to_data_url("data:image/jpeg;base64,AAAA") == "data:image/jpeg;base64,AAAA"
+    assert to_data_url("AAAA") == "data:image/png;base64,AAAA"
@@ -0,0 +1,69 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import base64
+import json
+
+import pytest
+
+from app.utils.json_stream import StreamedImage, StreamingJSONParser, output_parser, replace_streamed
+
+
+def parse(parser, body: bytes, chunk_size: int):
+    for start in range(0, len(body), chunk_size):
+        parser.feed(body[start:start + chunk_size])
+    return parser.close()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 4096])
+def test_matches_json_loads(chunk_size):
+    document = {"id": "job-1", "n": [1, -2.5, 1e10, True, False, None], "nested": {"a": [], "b": {}},
+                "text": "quote \" slash \\ newline \n é ☃ \U0001F600"}
+    for ensure_ascii in (True, False):
+        body = json.dumps(document, ensure_ascii=ensure_ascii).encode()
+        assert parse(StreamingJSONParser(lambda path: None), body, chunk_size) == document
+
+
+@pytest.mark.parametrize("prefix", ["", "data:image/png;base64,"])
+def test_output_image_is_decoded_to_a_file(prefix):
+    image = os.urandom(50001)
+    encoded = prefix + base64.encodebytes(image).decode()  # line breaks, like some workers send
+    body = json.dumps({"id": "job-2", "status": "COMPLETED", "delayTime": 12,
+                       "output": {"images": [{"image": encoded}]}}).replace("/", "\\/").encode()
+
+    data = parse(output_parser(), body, 1000)
+    streamed = data["output"]["images"][0]["image"]
+    assert isinstance(streamed, StreamedImage)
+    assert data["delayTime"] == 12 and streamed.prefix == (prefix or None)
+    with open(streamed.path, "rb") as f:
+        assert f.read() == image
+    streamed.discard()
+    assert not os.path.exists(streamed.path)
+
+
+def test_truncated_body_removes_partial_file():
+    body = json.dumps({"output": {"output_image": base64.b64encode(os.urandom(3000)).decode()}}).encode()
+    parser = output_parser()
+    parser.feed(body[:2000])
+    path = parser._sink._file.name
+    with pytest.raises(ValueError):
+        parser.close()
+    assert not os.path.exists(path)
+
+
+def test_output_url_is_kept_as_text():
+    url = "https://bucket.example.com/outputs/job-3.png?X-Amz-Signature=abc"
+    body = json.dumps({"id": "job-3", "output": {"output_image": url}}).replace("/", "\\/").encode()
+    assert parse(output_parser(), body, 5)["output"]["output_image"] == url
+
+
+def test_replace_streamed_puts_text_back():
+    body = json.dumps({"id": "job-4", "output": {"images": [{"image": base64.b64encode(os.urandom(600)).decode()}],
+                                                 "seed": 7}}).encode()
+    data = parse(output_parser(), body, 100)
+    streamed = data["output"]["images"][0]["image"]
+    replaced = replace_streamed(data, "AAAA")
+    assert replaced["output"] == {"images": [{"image": "AAAA"}], "seed": 7}
+    assert data["output"]["images"][0]["image"] is streamed
+    streamed.discard()
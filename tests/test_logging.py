@@ -0,0 +1,59 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import io
+import json
+import logging
+
+from app.utils.log import configure_logging, shutdown_logging, redact, redact_text
+
+
+def test_redact_collapses_images_and_masks_secrets():
+    payload = {
+        "id": "job-1",
+        "output": {"images": [{"image": "A" * 5000}]},
+        "headers": {"Authorization": "Bearer secret-token"},
+    }
+    redacted = redact(payload)
+    assert redacted["id"] == "job-1"
+    assert redacted["output"]["images"][0]["image"] == "<5000 chars>"
+    assert redacted["headers"]["Authorization"] == "<redacted>"
+
+
+def test_redact_text_handles_inline_payloads():
+    text = redact_text("got data:image/png;base64," + "Q" * 1000 + " with Bearer abc123")
+    assert "QQQQ" not in text
+    assert "abc123" not in text
+    assert redact_text("x" * 50, max_length=10).startswith("x" * 10 + "...")
+
+
+def test_queued_records_are_written_as_json():
+    stream = io.StringIO()
+    configure_logging(stream=stream, level="INFO", levels="app.quiet=WARNING")
+    try:
+        logging.getLogger("app.loud").info("job %s done", "job-1", extra={"payload": {"token": "t"}})
+        logging.getLogger("app.quiet").info("not written")
+    finally:
+        shutdown_logging()
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert len(lines) == 1
+    assert lines[0]["msg"] == "job job-1 done"
+    assert lines[0]["payload"] == {"token": "<redacted>"}
+
+
+def test_only_the_oauth_callback_code_is_redacted():
+    assert redact({"code": 404, "error": {"code": "E42"}}) == {"code": 404, "error": {"code": "E42"}}
+    text = redact_text("GET /api/auth/facebook/callback?state=x&code=AQBsecret123 200")
+    assert "AQBsecret123" not in text and "state=x" in text
+
+
+def test_debug_records_are_not_sampled_by_default():
+    stream = io.StringIO()
+    configure_logging(stream=stream, level="DEBUG")
+    try:
+        for i in range(50):
+            logging.getLogger("app.debugging").debug("step %d", i)
+    finally:
+        shutdown_logging()
+    assert len(stream.getvalue().splitlines()) == 50
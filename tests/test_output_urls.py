@@ -0,0 +1,52 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import io
+
+import httpx
+import pytest
+
+from app.config import settings
+from app.utils import storage
+
+
+def check(url):
+    asyncio.run(storage.check_output_url(url))
+
+
+def test_empty_allowlist_refuses_every_url(monkeypatch):
+    monkeypatch.setattr(settings, "OUTPUT_URL_HOSTS", "")
+    with pytest.raises(ValueError, match="not in OUTPUT_URL_HOSTS"):
+        check("https://bucket.example.com/out.png")
+
+
+@pytest.mark.parametrize("host", ["127.0.0.1", "10.1.2.3", "169.254.169.254", "[::1]", "[::ffff:192.168.0.1]"])
+def test_non_public_addresses_are_refused(monkeypatch, host):
+    monkeypatch.setattr(settings, "OUTPUT_URL_HOSTS", host.strip("[]"))
+    monkeypatch.setattr(settings, "OUTPUT_URL_ALLOW_PRIVATE", False)
+    with pytest.raises(ValueError, match="non-public"):
+        check(f"http://{host}/out.png")
+
+
+def test_redirects_are_checked_on_every_hop(monkeypatch):
+    monkeypatch.setattr(settings, "OUTPUT_URL_HOSTS", "127.0.0.1")
+    monkeypatch.setattr(settings, "OUTPUT_URL_ALLOW_PRIVATE", True)
+
+    def handler(request):
+        if request.url.path == "/moved":
+            return httpx.Response(302, headers={"Location": "/out.png"})
+        if request.url.path == "/escape":
+            return httpx.Response(302, headers={"Location": "http://169.254.169.254/latest/meta-data"})
+        return httpx.Response(200, content=b"png")
+
+    async def fetch(path):
+        monkeypatch.setattr(storage, "_download_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        f = io.BytesIO()
+        await storage._fetch(f"http://127.0.0.1{path}", f)
+        return f.getvalue()
+
+    assert asyncio.run(fetch("/moved")) == b"png"
+    with pytest.raises(ValueError, match="169.254.169.254 is not in OUTPUT_URL_HOSTS"):
+        asyncio.run(fetch("/escape"))
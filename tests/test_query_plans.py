@@ -0,0 +1,56 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.database import engine
+from app.repository import runpod as runpod_repo
+
+pytestmark = pytest.mark.skipif(engine.dialect.name != "postgresql",
+                                reason="query plans are checked against PostgreSQL")
+
+
+def explain(connection, call):
+    """Run a repository call and return the EXPLAIN output of the SQL it issued"""
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    event.listen(connection, "before_cursor_execute", capture)
+    try:
+        call(Session(bind=connection))
+    finally:
+        event.remove(connection, "before_cursor_execute", capture)
+
+    assert len(captured) == 1
+    statement, parameters = captured[0]
+    cursor = connection.connection.cursor()
+    cursor.execute(f"EXPLAIN {statement}", parameters)
+    return "\n".join(row[0] for row in cursor.fetchall())
+
+
+@pytest.fixture
+def connection():
+    with engine.connect() as conn:
+        trans = conn.begin()
+        # Tiny test tables would otherwise always be sequentially scanned
+        conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        yield conn
+        trans.rollback()
+
+
+def test_get_request_by_job_id_uses_index(connection):
+    plan = explain(connection,
+                   lambda db: runpod_repo.get_request_by_job_id(db, "job-123"))
+    assert "ix_runpod_requests_runpod_job_id" in plan
+    assert "Seq Scan" not in plan
+
+
+def test_get_pending_requests_uses_partial_index(connection):
+    plan = explain(connection, runpod_repo.get_pending_requests)
+    assert "ix_runpod_requests_active_status" in plan
+    assert "Seq Scan" not in plan
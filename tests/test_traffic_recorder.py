@@ -0,0 +1,52 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import base64
+import json
+
+from app.middleware.recorder import RunPodStatusRecorder, fill_images, strip_images
+from app.utils.json_stream import StreamedImage
+
+
+def test_images_become_size_markers_and_back():
+    image = base64.b64encode(os.urandom(3000)).decode()
+    payload = {
+        "id": "job-1",
+        "status": "COMPLETED",
+        "output": {"images": [{"image": image}], "message": "data:image/png;base64," + image},
+    }
+    stripped = strip_images(payload)
+    assert stripped["id"] == "job-1"
+    assert stripped["output"]["images"][0]["image"] == f"$synthetic-base64:{len(image)}"
+    assert stripped["output"]["message"].startswith("data:image/png;base64,$synthetic")
+
+    filled = fill_images(stripped)
+    replayed = filled["output"]["images"][0]["image"]
+    assert len(replayed) == len(image) and replayed != image
+    base64.b64decode(replayed, validate=True)
+    assert filled["output"]["message"].startswith("data:image/png;base64,")
+    assert len(filled["output"]["message"]) == len(payload["output"]["message"])
+
+
+def test_short_strings_are_kept():
+    payload = {"id": "job-2", "status": "FAILED", "error": "CUDA out of memory"}
+    assert strip_images(payload) == payload
+
+
+def test_streamed_images_are_recorded_at_their_base64_size(tmp_path):
+    image = StreamedImage(str(tmp_path / "out.png"), 3001, prefix="data:image/png;base64,")
+    recording = tmp_path / "traffic.jsonl"
+
+    async def record():
+        RunPodStatusRecorder(str(recording))("job-3", {"id": "job-3", "status": "COMPLETED",
+                                                        "output": {"images": [{"image": image}]}})
+        await asyncio.sleep(0.1)
+
+    asyncio.run(record())
+    entry = json.loads(recording.read_text())
+    assert entry["source"] == "runpod" and entry["path"] == "status/job-3"
+    replayed = fill_images(entry["body"])["output"]["images"][0]["image"]
+    assert replayed.startswith("data:image/png;base64,")
+    assert len(base64.b64decode(replayed.split(",", 1)[1])) == 3003  # 3001 bytes, padded to whole groups